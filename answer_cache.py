@@ -0,0 +1,164 @@
+import os
+import time
+import sqlite3
+import threading
+import numpy as np
+from vector_registry import get_embeddings
+from tracing import cache_event
+
+CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "./answer_cache.sqlite3")
+SIMILARITY_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))  # cosine, MiniLM space
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+
+def _normalize(vec):
+    v = np.asarray(vec, dtype=np.float32)
+    n = np.linalg.norm(v)
+    return v / n if n else v
+
+
+class _DocIndex:
+    """In-memory view of one document's cached questions for similarity lookup."""
+
+    def __init__(self, rows):
+        self.ids = [r[0] for r in rows]
+        self.exact = {r[1]: r[0] for r in rows}
+        self.answers = {r[0]: r[2] for r in rows}
+        dim = len(np.frombuffer(rows[0][3], dtype=np.float32)) if rows else 0
+        self.matrix = (np.vstack([np.frombuffer(r[3], dtype=np.float32) for r in rows])
+                       if rows else np.zeros((0, dim), dtype=np.float32))
+
+    def add(self, row_id, question, answer, emb):
+        self.ids.append(row_id)
+        self.exact[question] = row_id
+        self.answers[row_id] = answer
+        self.matrix = emb[None, :] if self.matrix.size == 0 else np.vstack([self.matrix, emb])
+
+
+class AnswerCache:
+    """
+    Persistent cache of RHP answers, scoped to one document (its content-derived index key).
+
+    A question hits if it matches a cached one exactly, or if its embedding is at
+    least `threshold` cosine-similar to one, so paraphrases are served too.
+    Least recently used answers are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, path=CACHE_PATH, threshold=SIMILARITY_THRESHOLD, max_entries=MAX_ENTRIES):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, doc_key TEXT NOT NULL, question TEXT NOT NULL,"
+            " embedding BLOB NOT NULL, answer TEXT NOT NULL, created REAL, last_access REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_doc ON answers(doc_key)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS answers_lru ON answers(last_access)")
+        self._db.commit()
+        self._docs = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _doc(self, doc_key):
+        if doc_key not in self._docs:
+            rows = self._db.execute(
+                "SELECT id, question, answer, embedding FROM answers WHERE doc_key = ?", (doc_key,)
+            ).fetchall()
+            self._docs[doc_key] = _DocIndex(rows)
+        return self._docs[doc_key]
+
+    def lookup(self, doc_key, question):
+        """
+        Returns (answer or None, question embedding). Pass the embedding back to
+        store() on a miss so the question is not embedded twice.
+        """
+        with self._lock:
+            doc = self._doc(doc_key)
+            row_id = doc.exact.get(question)
+        emb = None
+        if row_id is None:
+            emb = _normalize(get_embeddings().embed_query(question))
+            with self._lock:
+                doc = self._doc(doc_key)
+                if len(doc.ids):
+                    sims = doc.matrix @ emb
+                    best = int(np.argmax(sims))
+                    if sims[best] >= self.threshold:
+                        row_id = doc.ids[best]
+                        self.semantic_hits += 1
+
+        with self._lock:
+            if row_id is None:
+                self.misses += 1
+                cache_event("answer", "miss")
+                return None, emb
+            self.hits += 1
+            cache_event("answer", "hit" if emb is None else "semantic_hit")
+            self._db.execute("UPDATE answers SET last_access = ? WHERE id = ?", (time.time(), row_id))
+            self._db.commit()
+            return doc.answers[row_id], emb
+
+    def store(self, doc_key, question, answer, emb=None):
+        if emb is None:
+            emb = _normalize(get_embeddings().embed_query(question))
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT INTO answers (doc_key, question, embedding, answer, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_key, question, emb.astype(np.float32).tobytes(), answer, now, now),
+            )
+            self._doc(doc_key).add(cur.lastrowid, question, answer, emb.astype(np.float32))
+            self._evict()
+            self._db.commit()
+
+    def clear(self, doc_key=None):
+        """Drops every cached answer (or one document's) and resets the counters."""
+        with self._lock:
+            if doc_key is None:
+                self._db.execute("DELETE FROM answers")
+                self._docs.clear()
+            else:
+                self._db.execute("DELETE FROM answers WHERE doc_key = ?", (doc_key,))
+                self._docs.pop(doc_key, None)
+            self._db.commit()
+            self.hits = self.semantic_hits = self.misses = 0
+
+    def _evict(self):
+        (count,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+        victims = self._db.execute(
+            "SELECT id, doc_key FROM answers ORDER BY last_access ASC LIMIT ?", (overflow,)
+        ).fetchall()
+        self._db.executemany("DELETE FROM answers WHERE id = ?", [(v[0],) for v in victims])
+        # Affected documents are reloaded from disk on next access
+        for doc_key in {v[1] for v in victims}:
+            self._docs.pop(doc_key, None)
+
+    def stats(self):
+        with self._lock:
+            (entries,) = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_answer_cache():
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = AnswerCache()
+        return _CACHE
@@ -1,5 +1,6 @@
 import streamlit as st
 import os
+import time
 import warnings
 import logging
 
@@ -13,12 +14,17 @@ from langchain_core.messages import HumanMessage, AIMessage
 
 # Libraries
 from tools_library import (
-    fetch_ipo_details, download_pdf_logic, build_vs_logic,
+    fetch_ipo_details, download_pdf_logic, acquire_vs,
     get_all_ipo_names, get_concurrent_ipos
 )
 from brain import execute_brain
 from report_engine import generate_deep_dive_report
 from comparison_engine import execute_peer_comparison
+from ipo_listing import LISTING_TTL
+from stream_events import StatusChunk, TokenChunk, FinalChunk
+from ingest_worker import job_status, DOWNLOADING, INDEXING, READY
+from tracing import span, Span, breakdown, prometheus_text
+from intent_router import router_stats
 
 load_dotenv()
 
@@ -81,17 +87,54 @@ st.markdown("""
 # --- STATE ---
 if "messages" not in st.session_state: st.session_state.messages = []
 if "vector_store" not in st.session_state: st.session_state.vector_store = None
+if "vs_handle" not in st.session_state: st.session_state.vs_handle = None
 if "active_ipo" not in st.session_state: st.session_state.active_ipo = None
 if "active_category" not in st.session_state: st.session_state.active_category = "Mainboard"
 if "last_report" not in st.session_state: st.session_state.last_report = ""
 
 
-@st.cache_data
+@st.cache_data(ttl=LISTING_TTL)
 def load_data(): return get_all_ipo_names()
 
 
 ipo_data = load_data()
 
+
+def follow_ingest_job(ipo_name):
+    """
+    PDF path of a worker-built index for this IPO, waiting on the job if the worker is on it.
+    None when there is no usable job (no worker, still queued, failed, no RHP): the caller
+    builds inline. A queued job isn't waited for, it may sit behind the whole worker queue;
+    the worker later finds the index built (see IndexStore.build_lock).
+    """
+    job = job_status(ipo_name)
+    if job and job.get("status") in (DOWNLOADING, INDEXING):
+        st.write("⏳ Background indexing in progress...")
+        job_bar = st.progress(0.0)
+        while job and job.get("status") in (DOWNLOADING, INDEXING):
+            done, total = job.get("pages_done", 0), job.get("total_pages", 0)
+            job_bar.progress(done / max(total, 1),
+                             text=f"{job['status'].title()} · {done}/{total} pages · {job.get('chunks', 0)} chunks")
+            time.sleep(1)
+            job = job_status(ipo_name)
+    if job and job.get("status") == READY and os.path.exists(job.get("pdf", "")):
+        return job["pdf"]
+    return None
+
+
+def render_timings(trace, where=st):
+    """Collapsible per-phase breakdown of one traced action (nothing when tracing is off)."""
+    if not isinstance(trace, Span):
+        return
+    with where.expander(f"⏱️ Timing Breakdown ({trace.duration:.1f}s)"):
+        lines = ["| Phase | ms | % | Details |", "|---|---:|---:|---|"]
+        for row in breakdown(trace):
+            details = ", ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in row["attrs"].items())
+            indent = "&nbsp;" * 4 * row["depth"]
+            lines.append(f"| {indent}{row['name']} | {row['ms']:.0f} | {row['share']:.0f} | {details} |")
+        st.markdown("\n".join(lines), unsafe_allow_html=True)
+
+
 # --- SIDEBAR ---
 with st.sidebar:
     st.image("https://cdn-icons-png.flaticon.com/512/2534/2534204.png", width=50)
@@ -114,23 +157,49 @@ with st.sidebar:
         st.session_state.active_category = category  # Store for peer logic
         st.session_state.vector_store = None
         st.session_state.last_report = ""
+        if st.session_state.vs_handle:
+            st.session_state.vs_handle.release()
+            st.session_state.vs_handle = None
 
-        with st.status("booting_core_systems...", expanded=True):
+        with span("ui.initialize", ipo=selected_ipo) as init_trace, st.status("booting_core_systems...", expanded=True):
             st.write(f"Targeting: **{selected_ipo}**")
-            details = fetch_ipo_details(selected_ipo)
-
-            if "id" in details:
-                st.write("✅ Metadata Acquired")
-                st.write("📥 Fetching Official RHP...")
-                pdf = download_pdf_logic(details)
-                if pdf:
-                    st.write("🧠 Training Vector Brain...")
-                    st.session_state.vector_store = build_vs_logic(pdf)
-                    st.success("System Online & Ready")
-                else:
-                    st.warning("⚠️ RHP Missing. Using Web Search Fallback.")
+            # The pre-ingestion worker may already have (or be) indexing this RHP
+            prebuilt = follow_ingest_job(selected_ipo)
+
+            if prebuilt:
+                st.write("⚡ Pre-built Index Found")
+                st.session_state.vs_handle = acquire_vs(prebuilt)
+                st.session_state.vector_store = st.session_state.vs_handle.vector_store
+                st.success("System Online & Ready")
             else:
-                st.error("❌ Critical Error: IPO ID Not Found.")
+                details = fetch_ipo_details(selected_ipo)
+
+                if "id" in details:
+                    st.write("✅ Metadata Acquired")
+                    st.write("📥 Fetching Official RHP...")
+                    pdf = download_pdf_logic(details)
+                    if pdf:
+                        st.write("🧠 Training Vector Brain...")
+                        ingest_bar = st.progress(0.0)
+
+                        def show_ingest(pages_done, total_pages, chunks):
+                            ingest_bar.progress(pages_done / max(total_pages, 1),
+                                                text=f"Parsed {pages_done}/{total_pages} pages · {chunks} chunks indexed")
+
+                        st.session_state.vs_handle = acquire_vs(pdf, progress=show_ingest)
+                        st.session_state.vector_store = st.session_state.vs_handle.vector_store
+                        st.success("System Online & Ready")
+                    else:
+                        st.warning("⚠️ RHP Missing. Using Web Search Fallback.")
+                else:
+                    st.error("❌ Critical Error: IPO ID Not Found.")
+        render_timings(init_trace)
+
+    with st.expander("📈 Metrics (Prometheus)"):
+        routing = router_stats()
+        st.caption(f"🧭 Intent router: {routing['hit_rate']:.0%} of {routing['total']} questions skipped the planner "
+                   f"(rules {routing['rule']}, nearest-neighbour {routing['knn']})")
+        st.code(prometheus_text(), language="text")
 
 # --- MAIN PAGE ---
 if not st.session_state.active_ipo:
@@ -173,14 +242,19 @@ with tab_chat:
             status_container = st.status("Thinking...", expanded=True)
             final_ans = ""
 
-            for chunk in execute_brain(prompt, st.session_state.active_ipo, st.session_state.vector_store):
-                if "Executing:" in chunk or "Complete" in chunk or "Synthesizing" in chunk:
-                    status_container.write(chunk)
-                else:
-                    final_ans = chunk
+            with span("ui.chat", ipo=st.session_state.active_ipo) as chat_trace:
+                for chunk in execute_brain(prompt, st.session_state.active_ipo, st.session_state.vector_store):
+                    if isinstance(chunk, StatusChunk):
+                        status_container.write(chunk)
+                    elif isinstance(chunk, TokenChunk):
+                        final_ans += chunk
+                        response_container.markdown(final_ans + "▌")
+                    else:
+                        final_ans = chunk
 
             status_container.update(label="Response Ready", state="complete", expanded=False)
             response_container.markdown(final_ans)
+            render_timings(chat_trace)
             st.session_state.messages.append(AIMessage(content=final_ans))
 
 # === TAB 2: REPORT ===
@@ -191,15 +265,23 @@ with tab_report:
         st.caption("Generates a deep-dive investment memo using Real-time Data + RHP Analysis.")
     with col2:
         if st.button("Generate Report", type="primary", use_container_width=True):
-            with st.status("Compiling Report (This takes ~30s)...", expanded=True) as status:
+            # Full-width placeholder below the header row for the streamed report
+            report_live = tab_report.empty()
+            with span("ui.report", ipo=st.session_state.active_ipo) as report_trace, \
+                    st.status("Compiling Report (This takes ~30s)...", expanded=True) as status:
                 full_text = ""
                 for chunk in generate_deep_dive_report(st.session_state.active_ipo, st.session_state.vector_store):
-                    if "**Phase" in chunk:
+                    if isinstance(chunk, StatusChunk):
                         st.write(chunk)
+                    elif isinstance(chunk, TokenChunk):
+                        full_text += chunk
+                        report_live.markdown(full_text + "▌")
                     else:
                         full_text = chunk
                 st.session_state.last_report = full_text
                 status.update(label="Report Complete", state="complete", expanded=False)
+            report_live.empty()
+            render_timings(report_trace, where=tab_report)
 
     if st.session_state.last_report:
         st.markdown("---")
@@ -233,14 +315,20 @@ with tab_compare:
         )
 
         if st.button("⚔️ Run Comparison", type="primary", disabled=len(selected_peers) == 0):
-            with st.status("Gathering Intelligence...", expanded=True) as status:
-                result_container = st.empty()
+            # Outside the status block so the analysis stays visible while it streams
+            result_container = st.empty()
+            with span("ui.comparison", ipo=st.session_state.active_ipo) as compare_trace, \
+                    st.status("Gathering Intelligence...", expanded=True) as status:
                 full_analysis = ""
                 # Pass the vector_store so we can dig into the RHP
                 for chunk in execute_peer_comparison(st.session_state.active_ipo, selected_peers, st.session_state.vector_store):
-                    if "Phase" in chunk or "Fetching" in chunk:
+                    if isinstance(chunk, StatusChunk):
                         st.write(chunk)
+                    elif isinstance(chunk, TokenChunk):
+                        full_analysis += chunk
+                        result_container.markdown(full_analysis + "▌")
                     else:
                         full_analysis = chunk
                 status.update(label="Analysis Complete", state="complete", expanded=False)
-                result_container.markdown(full_analysis)
\ No newline at end of file
+                result_container.markdown(full_analysis)
+            render_timings(compare_trace)
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""
+Offline benchmark harness: a local ipopremium stand-in, synthetic RHP PDFs and a
+deterministic fake chat model, so ingestion and answering can be timed without
+touching ipopremium.in, Reddit, Google News or Groq. Entry point: python -m bench.run
+"""
@@ -0,0 +1,66 @@
+import time
+import random
+import hashlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import Field
+
+# What the planner "decides" for every query: one step per tool
+DEFAULT_PLAN = {"steps": [
+    {"tool_name": "gmp_tool", "arguments": "details"},
+    {"tool_name": "sentiment_tool", "arguments": "all"},
+    {"tool_name": "rhp_tool", "arguments": "What are the key risk factors and how are the offer proceeds used?"},
+]}
+
+_VOCAB = ("revenue margin growth risk promoter valuation peers subscription demand listing debt capex "
+          "dividend outlook sector fundamentals premium allotment liquidity exposure moderate strong").split()
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model with configurable latency. The answer depends only on the
+    prompt, so repeated benchmark runs do identical downstream work.
+    """
+
+    latency: float = 0.2         # seconds before the first token
+    token_latency: float = 0.0   # seconds per streamed token
+    answer_tokens: int = 150
+    plan: Dict[str, Any] = Field(default_factory=lambda: dict(DEFAULT_PLAN))
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "bench-fake-chat"
+
+    def _answer(self, messages):
+        prompt = "\n".join(str(m.content) for m in messages)
+        digest = hashlib.sha1(prompt.encode()).hexdigest()
+        rng = random.Random(digest)
+        words = [rng.choice(_VOCAB) for _ in range(self.answer_tokens)]
+        return f"**Answer {digest[:8]}:** " + " ".join(words)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.latency + self.token_latency * self.answer_tokens)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        time.sleep(self.latency)
+        for i, word in enumerate(self._answer(messages).split(" ")):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+
+    def with_structured_output(self, schema, **kwargs):
+        def plan(_):
+            self.calls += 1
+            time.sleep(self.latency)
+            return schema.model_validate(self.plan)
+        return RunnableLambda(plan)
@@ -0,0 +1,129 @@
+import re
+import json
+import time
+import hashlib
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from email.utils import formatdate
+
+
+class FakeIpoPremium:
+    """
+    Local stand-in for the endpoints the app calls:
+      /ipo                       listing JSON (with ETag, answers If-None-Match with 304)
+      /view/ipo/{id}/{slug}      IPO page with an RHP link
+      /files/{id}_rhp.pdf        the PDF (supports Range, for resumable downloads)
+      /rss/search?q=...          Google News style RSS feed
+    Every response is delayed by `latency` seconds to mimic network round trips.
+    """
+
+    def __init__(self, ipos, pdf_paths, latency=0.05, host="127.0.0.1", port=0):
+        self.ipos = ipos            # listing rows as ipopremium returns them
+        self.pdf_paths = pdf_paths  # {ipo_id: local pdf path}
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._listing = json.dumps({"data": ipos}).encode()
+        self._etag = '"' + hashlib.sha1(self._listing).hexdigest()[:16] + '"'
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- PAGES ---
+    def _ipo_page(self, ipo_id):
+        row = next((r for r in self.ipos if str(r["id"]) == ipo_id), None)
+        if row is None:
+            return None
+        return (f"<html><body><h1>{row['name']}</h1>"
+                f"<a href='/files/{ipo_id}_drhp.pdf'>DRHP</a> "
+                f"<a href='/files/{ipo_id}_rhp.pdf'>RHP</a> "
+                f"<a href='/files/{ipo_id}_anchor.pdf'>Anchor Investors</a>"
+                f"</body></html>").encode()
+
+    def _rss(self, query):
+        items = "".join(
+            f"<item><title>{query} headline {i}: subscription update</title>"
+            f"<link>http://example.invalid/{i}</link></item>" for i in range(8))
+        return f"<?xml version='1.0'?><rss version='2.0'><channel><title>{query}</title>{items}</channel></rss>".encode()
+
+    def _handler(self):
+        bench = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b"", content_type="text/html", headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                with bench._lock:
+                    bench.requests += 1
+                time.sleep(bench.latency)
+                url = urllib.parse.urlparse(self.path)
+
+                if url.path == "/ipo":
+                    if self.headers.get("If-None-Match") == bench._etag:
+                        return self._send(304)
+                    return self._send(200, bench._listing, "application/json",
+                                      {"ETag": bench._etag, "Last-Modified": formatdate(usegmt=True)})
+
+                m = re.fullmatch(r"/view/ipo/(\w+)/[^/]*", url.path)
+                if m:
+                    page = bench._ipo_page(m.group(1))
+                    return self._send(200, page) if page else self._send(404)
+
+                m = re.fullmatch(r"/files/(\w+)_rhp\.pdf", url.path)
+                if m and m.group(1) in bench.pdf_paths:
+                    return self._send_pdf(bench.pdf_paths[m.group(1)])
+
+                if url.path == "/rss/search":
+                    query = urllib.parse.parse_qs(url.query).get("q", [""])[0]
+                    return self._send(200, bench._rss(query), "application/rss+xml")
+
+                self._send(404)
+
+            def _send_pdf(self, path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                m = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+                if m:
+                    start = int(m.group(1))
+                    if start >= len(data):
+                        return self._send(416, headers={"Content-Range": f"bytes */{len(data)}"})
+                    return self._send(206, data[start:], "application/pdf",
+                                      {"Content-Range": f"bytes {start}-{len(data) - 1}/{len(data)}"})
+                self._send(200, data, "application/pdf")
+
+        return Handler
@@ -0,0 +1,288 @@
+"""
+End-to-end timings of the hot paths against local fakes.
+
+    python -m bench.run                         # run, write bench_results.json, compare with bench/baseline.json
+    python -m bench.run --save-baseline         # ...and store this run as the new baseline
+    python -m bench.run --embeddings fake       # no embedding model needed at all
+
+Everything (PDFs, indexes, caches) lives in a scratch directory, so a run never
+touches the app's own chroma_db_storage/ or pdfs/.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+sys.path.insert(0, REPO_ROOT)
+
+from bench.synthetic_rhp import make_rhp
+from bench.fake_server import FakeIpoPremium
+from bench.fake_llm import FakeChatModel
+
+_COMPANIES = [
+    ("Alpha Precision Engineering Limited", "Open"),
+    ("Bharat Green Energy Limited", "Open"),
+    ("Coastal Logistics Limited", "Upcoming"),
+    ("Deccan Foods SME Limited", "Open"),
+    ("Everest Retail Limited", "Upcoming"),
+    ("Fortune Textiles Limited", "Listed"),
+]
+
+QUESTIONS = [
+    "What are the objects of the offer?",
+    "Summarise the top risk factors.",
+    "What is the revenue trend over the last three years?",
+    "Who are the promoters and what is their shareholding?",
+    "Are there any material outstanding litigations?",
+]
+
+
+def listing_rows(count):
+    rows = []
+    for i, (name, status) in enumerate(_COMPANIES[:count]):
+        ipo_id = str(1001 + i)
+        rows.append({
+            "id": ipo_id, "slug": name.lower().replace(" ", "-"), "name": name,
+            "premium": str(20 + 7 * i), "price": f"{300 + 20 * i}-{320 + 20 * i}",
+            "open": "2026-10-20", "close": "2026-10-22", "allotment": "2026-10-23",
+            "listing": "2026-10-27", "status": status, "size": f"{500 + 100 * i} Cr",
+        })
+    return rows
+
+
+def summarize(runs):
+    return {
+        "median_s": round(statistics.median(runs), 4),
+        "min_s": round(min(runs), 4),
+        "max_s": round(max(runs), 4),
+        "runs": [round(r, 4) for r in runs],
+    }
+
+
+def timed(fn, repeat, before=None):
+    runs = []
+    for r in range(repeat):
+        if before:
+            before(r)
+        start = time.perf_counter()
+        fn(r)
+        runs.append(time.perf_counter() - start)
+    return summarize(runs)
+
+
+def drain(stream, ttft=None):
+    """Consumes an engine generator; records seconds to the first answer token in ttft."""
+    from stream_events import TokenChunk
+    start = time.perf_counter()
+    for chunk in stream:
+        if ttft is not None and not ttft and isinstance(chunk, TokenChunk):
+            ttft.append(time.perf_counter() - start)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# --- BASELINE ---
+def compare(results, baseline, tolerance):
+    """Per metric: current vs baseline median. Ratios above 1 + tolerance are regressions."""
+    rows = []
+    for name, cur in results["metrics"].items():
+        base = baseline.get("metrics", {}).get(name)
+        if not base or not base.get("median_s"):
+            rows.append({"metric": name, "current_s": cur["median_s"], "baseline_s": None, "ratio": None, "status": "new"})
+            continue
+        ratio = cur["median_s"] / base["median_s"]
+        status = "regression" if ratio > 1 + tolerance else "improvement" if ratio < 1 - tolerance else "same"
+        rows.append({"metric": name, "current_s": cur["median_s"], "baseline_s": base["median_s"],
+                     "ratio": round(ratio, 3), "status": status})
+    return rows
+
+
+def print_table(results, comparison):
+    print(f"\n{'metric':<28}{'median s':>10}{'baseline':>10}{'ratio':>8}  status")
+    by_name = {row["metric"]: row for row in comparison}
+    for name, m in results["metrics"].items():
+        row = by_name.get(name, {})
+        base = f"{row['baseline_s']:.3f}" if row.get("baseline_s") else "-"
+        ratio = f"{row['ratio']:.2f}" if row.get("ratio") else "-"
+        print(f"{name:<28}{m['median_s']:>10.3f}{base:>10}{ratio:>8}  {row.get('status', '')}")
+
+
+# --- RUN ---
+def run(args):
+    workdir = args.workdir or tempfile.mkdtemp(prefix="ipo_bench_")
+    rhp_dir = os.path.join(workdir, "rhps")
+    os.makedirs(rhp_dir, exist_ok=True)
+
+    rows = listing_rows(args.ipos)
+    target = rows[0]
+    print(f"[bench] generating {args.ipos} synthetic RHPs ({args.pages} pages) in {workdir}")
+    pdf_paths = {}
+    for row in rows:
+        path = os.path.join(rhp_dir, f"{row['id']}_rhp.pdf")
+        make_rhp(path, row["name"], pages=args.pages)
+        pdf_paths[row["id"]] = path
+    # Content variants of the target, so every cold ingest gets a fresh index key
+    variants = []
+    for r in range(args.repeat):
+        path = os.path.join(rhp_dir, f"variant_{r}.pdf")
+        make_rhp(path, target["name"], pages=args.pages, seed=r + 1)
+        variants.append(path)
+
+    server = FakeIpoPremium(rows, pdf_paths, latency=args.net_latency).start()
+    os.environ.update({
+        "IPOPREMIUM_BASE_URL": server.url,
+        "IPOPREMIUM_ASSETS_URL": server.url,
+        "NEWS_RSS_URL": f"{server.url}/rss/search",
+        "SENTIMENT_SOURCES": "news",
+        "SENTIMENT_TTL": "0",  # every run really fetches
+        "GROQ_API_KEY": "bench",
+        "ANSWER_CACHE_PATH": os.path.join(workdir, "answer_cache.sqlite3"),
+    })
+    # The app's stores use relative paths: keep them inside the scratch directory
+    os.chdir(workdir)
+
+    # Imported only now: these modules read their configuration from the environment
+    import tools_library
+    from vector_registry import set_embeddings
+    from index_store import EMBED_DIM
+    from answer_cache import get_answer_cache
+    from brain import execute_brain
+    from report_engine import generate_deep_dive_report
+    from comparison_engine import execute_peer_comparison
+
+    llm = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency)
+    tools_library.set_llm_factory(lambda model, temperature: llm)
+    if args.embeddings == "fake":
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        set_embeddings(DeterministicFakeEmbedding(size=EMBED_DIM))
+    tools_library.get_embeddings().embed_query("warm up")  # model load is not part of any metric
+
+    details = tools_library.fetch_ipo_details(target["name"])
+    name = details["Company"]
+    metrics = {}
+
+    def fresh_download(_):
+        shutil.rmtree(tools_library.PDF_DIR, ignore_errors=True)
+
+    print("[bench] download_pdf")
+    metrics["download_pdf"] = timed(lambda r: tools_library.download_pdf_logic(details), args.repeat, fresh_download)
+
+    print("[bench] build_vs_logic (cold)")
+    metrics["build_vs_cold"] = timed(lambda r: tools_library.build_vs_logic(variants[r]), args.repeat)
+    pdf = tools_library.download_pdf_logic(details)
+    vs = tools_library.build_vs_logic(pdf)
+    print("[bench] build_vs_logic (warm)")
+    metrics["build_vs_warm"] = timed(lambda r: tools_library.build_vs_logic(pdf), args.repeat)
+
+    cache = get_answer_cache()
+    clear_cache = lambda r: cache.clear()
+    print("[bench] query_rhp")
+    metrics["query_rhp"] = timed(lambda r: tools_library.query_rhp(name, QUESTIONS[r % len(QUESTIONS)], vs),
+                                 args.repeat, clear_cache)
+    tools_library.query_rhp(name, QUESTIONS[0], vs)
+    metrics["query_rhp_cached"] = timed(lambda r: tools_library.query_rhp(name, QUESTIONS[0], vs), args.repeat)
+
+    print("[bench] execute_brain")
+    ttft = []
+
+    def brain(r):
+        first = []
+        drain(execute_brain(QUESTIONS[r % len(QUESTIONS)], name, vs), first)
+        ttft.extend(first)
+
+    metrics["execute_brain"] = timed(brain, args.repeat, clear_cache)
+    if ttft:
+        metrics["execute_brain_first_token"] = summarize(ttft)
+
+    print("[bench] generate_deep_dive_report")
+    metrics["deep_dive_report"] = timed(lambda r: drain(generate_deep_dive_report(name, vs)), args.repeat, clear_cache)
+
+    peers = tools_library.get_concurrent_ipos(name)[:args.peers]
+    print(f"[bench] execute_peer_comparison vs {len(peers)} peers")
+    metrics["peer_comparison"] = timed(lambda r: drain(execute_peer_comparison(name, peers, vs)), args.repeat,
+                                       clear_cache)
+
+    server.stop()
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "pages": args.pages,
+            "ipos": args.ipos,
+            "repeat": args.repeat,
+            "embeddings": args.embeddings,
+            "llm_latency_s": args.llm_latency,
+            "token_latency_s": args.token_latency,
+            "net_latency_s": args.net_latency,
+            "llm_calls": llm.calls,
+            "http_requests": server.requests,
+        },
+        "metrics": metrics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of ingestion and answering.")
+    parser.add_argument("--pages", type=int, default=300, help="pages per synthetic RHP")
+    parser.add_argument("--ipos", type=int, default=len(_COMPANIES), help="IPOs in the fake listing")
+    parser.add_argument("--peers", type=int, default=3, help="peers in the comparison run")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per metric")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake model: seconds to first token")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="fake model: seconds per token")
+    parser.add_argument("--net-latency", type=float, default=0.05, help="fake server: seconds per request")
+    parser.add_argument("--embeddings", choices=["real", "fake"], default="real")
+    parser.add_argument("--workdir", help="scratch directory (default: a new temp dir)")
+    parser.add_argument("--out", default="bench_results.json", help="results file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 when a metric regressed")
+    args = parser.parse_args()
+    args.ipos = max(2, min(args.ipos, len(_COMPANIES)))
+
+    out_path = os.path.abspath(args.out)
+    baseline_path = os.path.abspath(args.baseline)
+    results = run(args)
+
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    comparison = compare(results, baseline, args.tolerance)
+    results["comparison"] = {"baseline_commit": baseline.get("meta", {}).get("commit"), "tolerance": args.tolerance,
+                             "rows": comparison}
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print_table(results, comparison)
+    print(f"\n[bench] results written to {out_path}")
+
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({"meta": results["meta"], "metrics": results["metrics"]}, f, indent=2)
+        print(f"[bench] baseline saved to {baseline_path}")
+
+    if args.fail_on_regression and any(row["status"] == "regression" for row in comparison):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
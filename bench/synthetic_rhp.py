@@ -0,0 +1,101 @@
+import random
+import pymupdf
+
+# Section layout of a typical RHP, as (outline title, share of the document's pages)
+SECTIONS = [
+    ("SECTION I: GENERAL", 0.06),
+    ("SECTION II: RISK FACTORS", 0.14),
+    ("SECTION III: INTRODUCTION - THE OFFER", 0.04),
+    ("CAPITAL STRUCTURE", 0.05),
+    ("OBJECTS OF THE OFFER", 0.04),
+    ("BASIS FOR OFFER PRICE", 0.02),
+    ("SECTION IV: ABOUT THE COMPANY - INDUSTRY OVERVIEW", 0.10),
+    ("OUR BUSINESS", 0.10),
+    ("OUR MANAGEMENT", 0.06),
+    ("SECTION V: FINANCIAL INFORMATION", 0.25),
+    ("OUTSTANDING LITIGATION AND MATERIAL DEVELOPMENTS", 0.08),
+    ("SECTION VI: OFFER INFORMATION - TERMS OF THE OFFER", 0.06),
+]
+
+_WORDS = (
+    "the company revenue from operations increased profit after tax margin borrowings working capital "
+    "promoter group subsidiaries customers supply chain raw material manufacturing facility capacity "
+    "utilisation regulatory approvals litigation proceedings contingent liabilities dividend policy "
+    "net worth return on equity EBITDA fiscal segment export domestic market share competition "
+    "offer proceeds repayment capital expenditure general corporate purposes listed peers valuation"
+).split()
+
+PEER_HEADERS = ["Name of the Company", "Face Value (Rs.)", "Revenue from Operations (Rs. mn)", "EPS Basic (Rs.)",
+                "EPS Diluted (Rs.)", "NAV per share (Rs.)", "P/E", "RoNW (%)"]
+
+
+def _paragraphs(rng, words):
+    out, sentence = [], []
+    for _ in range(words):
+        w = rng.choice(_WORDS)
+        if rng.random() < 0.08:
+            w = f"Rs. {rng.randint(10, 99999):,}.{rng.randint(0, 99):02d} million"
+        sentence.append(w)
+        if len(sentence) > rng.randint(12, 24):
+            out.append(" ".join(sentence).capitalize() + ".")
+            sentence = []
+    return " ".join(out)
+
+
+def _peer_rows(rng, company, peers):
+    rows = [[company, "10", f"{rng.uniform(2000, 20000):,.2f}", f"{rng.uniform(5, 40):.2f}",
+             f"{rng.uniform(5, 40):.2f}", f"{rng.uniform(50, 300):.2f}", "N.A.", f"{rng.uniform(8, 30):.2f}"]]
+    for name in peers:
+        rows.append([name, rng.choice(["1", "2", "10"]), f"{rng.uniform(5000, 90000):,.2f}",
+                     f"{rng.uniform(5, 80):.2f}", f"{rng.uniform(5, 80):.2f}", f"{rng.uniform(50, 600):.2f}",
+                     f"{rng.uniform(12, 90):.2f}", f"{rng.uniform(5, 35):.2f}"])
+    return rows
+
+
+def _draw_table(page, top, rows, widths, row_height=26):
+    # Ruled grid so PyMuPDF's line-based table detection picks it up
+    x0 = 36
+    x_edges = [x0]
+    for w in widths:
+        x_edges.append(x_edges[-1] + w)
+    y_edges = [top + i * row_height for i in range(len(rows) + 1)]
+    for y in y_edges:
+        page.draw_line((x_edges[0], y), (x_edges[-1], y), width=0.6)
+    for x in x_edges:
+        page.draw_line((x, y_edges[0]), (x, y_edges[-1]), width=0.6)
+    for r, row in enumerate(rows):
+        for c, cell in enumerate(row):
+            rect = pymupdf.Rect(x_edges[c] + 2, y_edges[r] + 2, x_edges[c + 1] - 2, y_edges[r + 1] - 2)
+            page.insert_textbox(rect, cell, fontsize=6.5)
+
+
+def make_rhp(path, company, pages=300, peers=("Peer One Limited", "Peer Two Limited", "Peer Three Limited"),
+             seed=0, words_per_page=420):
+    """
+    Writes a synthetic RHP: an outline with the usual sections, dense body text and a
+    ruled 'Comparison with Listed Industry Peers' table under Basis for Offer Price.
+    Returns the number of pages written.
+    """
+    rng = random.Random(f"{company}-{seed}")
+    doc = pymupdf.open()
+    toc, page_no = [], 0
+    for s, (title, share) in enumerate(SECTIONS):
+        count = max(1, round(pages * share)) if s < len(SECTIONS) - 1 else max(1, pages - page_no)
+        toc.append([1, title, page_no + 1])
+        for i in range(count):
+            page = doc.new_page(width=595, height=842)
+            body_top = 60
+            if i == 0:
+                page.insert_text((36, 48), title, fontsize=13)
+            if title == "BASIS FOR OFFER PRICE" and i == 0:
+                page.insert_text((36, 72), "Comparison with Listed Industry Peers", fontsize=10)
+                rows = [PEER_HEADERS] + _peer_rows(rng, company, peers)
+                _draw_table(page, 82, rows, [120, 50, 80, 50, 50, 60, 45, 45])
+                body_top = 82 + 26 * len(rows) + 20
+            page.insert_textbox(pymupdf.Rect(36, body_top, 559, 806), _paragraphs(rng, words_per_page), fontsize=8)
+            page.insert_text((280, 826), f"{page_no + 1}", fontsize=7)
+            page_no += 1
+    doc.set_toc(toc)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return page_no
@@ -1,13 +1,21 @@
 import os
 import json
-from langchain_groq import ChatGroq
+import time
 from pydantic import BaseModel, Field
 from typing import List, Literal
-from tools_library import fetch_ipo_details, fetch_sentiment, query_rhp
+from tools_library import fetch_ipo_details, fetch_sentiment, query_rhp, query_rhp_multi, get_llm
+from context_packer import pack, SYNTHESIS_BUDGET
+from stream_events import StatusChunk, FinalChunk, stream_llm
+from tracing import span
+from fan_out import fan_out
+from intent_router import route
 from dotenv import load_dotenv
 
 load_dotenv()
 
+MAX_PARALLEL_STEPS = int(os.getenv("BRAIN_MAX_PARALLEL_STEPS", "4"))
+STEP_TIMEOUT = float(os.getenv("BRAIN_STEP_TIMEOUT", "60"))  # seconds, for the whole execution stage
+
 
 # 1. Define the Planner Structure
 class ToolCall(BaseModel):
@@ -19,14 +27,96 @@ class Plan(BaseModel):
     steps: List[ToolCall] = Field(description="List of tools to execute")
 
 
-# 2. The Brain Logic
+# 2. The Workers
+def run_step(step, plan, user_query, ipo_name, vector_store):
+    if step.tool_name == "gmp_tool":
+        return str(fetch_ipo_details(ipo_name))
+
+    elif step.tool_name == "sentiment_tool":
+        return fetch_sentiment(ipo_name, source=step.arguments)
+
+    elif step.tool_name == "rhp_tool":
+        # --- FIX IS HERE: RAW QUERY INJECTION ---
+        # If the user is just asking a document question (single step plan),
+        # we use their EXACT query instead of the AI's summarized argument.
+        # This ensures 'rhp_chat.py' level accuracy.
+        search_query = step.arguments
+
+        if len(plan.steps) == 1:
+            search_query = user_query
+
+        # Pass vector_store explicitly (query_rhp reuses the store's RHPQueryEngine)
+        return query_rhp(ipo_name, query=search_query, vector_store=vector_store)
+        # ----------------------------------------
+
+    return ""
+
+
+# 2b. Plan Optimizer
+class StepGroup:
+    """One tool call after optimization: outputs[j] answers the plan steps listed in targets[j]."""
+
+    def __init__(self, tool_name, arguments, targets):
+        self.tool_name = tool_name
+        self.arguments = arguments
+        self.targets = targets
+
+    @property
+    def label(self):
+        return self.tool_name if len(self.arguments) == 1 else f"{self.tool_name} ({len(self.arguments)} questions)"
+
+
+def optimize_plan(plan):
+    """
+    Merges duplicate tool calls before execution:
+    - every gmp_tool step is one fetch (the argument is ignored anyway);
+    - sentiment_tool steps are one fetch of the union of their sources;
+    - rhp_tool steps with the same question share one answer, and different questions
+      are answered together by one multi-query retrieval and one LLM call.
+    """
+    by_tool = {}
+    for i, step in enumerate(plan.steps):
+        by_tool.setdefault(step.tool_name, []).append(i)
+
+    groups = []
+    for tool, idxs in by_tool.items():
+        if tool == "rhp_tool":
+            questions = {}
+            for i in idxs:
+                key = " ".join(plan.steps[i].arguments.lower().split())
+                questions.setdefault(key, (plan.steps[i].arguments, []))[1].append(i)
+            groups.append(StepGroup(tool, [q for q, _ in questions.values()], [t for _, t in questions.values()]))
+        elif tool == "sentiment_tool":
+            sources = {plan.steps[i].arguments.strip().lower() for i in idxs}
+            source = sources.pop() if len(sources) == 1 else "all"
+            groups.append(StepGroup(tool, [source], [idxs]))
+        else:
+            groups.append(StepGroup(tool, [plan.steps[idxs[0]].arguments], [idxs]))
+    return groups
+
+
+def run_group(group, plan, user_query, ipo_name, vector_store):
+    """One output per group argument."""
+    if group.tool_name == "rhp_tool" and len(group.arguments) > 1:
+        return query_rhp_multi(ipo_name, group.arguments, vector_store=vector_store)
+    step = ToolCall(tool_name=group.tool_name, arguments=group.arguments[0])
+    return [run_step(step, plan, user_query, ipo_name, vector_store)]
+
+
+# 3. The Brain Logic
 def execute_brain(user_query, ipo_name, vector_store):
+    # One trace per question: planning, every tool step and the synthesis are child spans
+    with span("brain", ipo=ipo_name):
+        yield from _execute_brain(user_query, ipo_name, vector_store)
+
+
+def _execute_brain(user_query, ipo_name, vector_store):
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
-        yield "❌ Error: GROQ_API_KEY not found in .env file."
+        yield FinalChunk("❌ Error: GROQ_API_KEY not found in .env file.")
         return
 
-    llm = ChatGroq(api_key=api_key, model="llama-3.3-70b-versatile", temperature=0)
+    llm = get_llm("llama-3.3-70b-versatile", temperature=0)
 
     # --- STEP 1: PLANNING ---
     structured_llm = llm.with_structured_output(Plan)
@@ -43,44 +133,62 @@ def execute_brain(user_query, ipo_name, vector_store):
        - IMPORTANT: For the argument, copy the User's specific question about the document verbatim. Do not summarize it to a keyword.
     """
 
-    try:
-        plan = structured_llm.invoke(system_prompt)
-    except Exception as e:
-        yield f"Error in planning: {e}"
-        return
-
-    results = []
+    # Common single-intent questions are planned locally, without a 70B round trip
+    with span("brain.route"):
+        routed = route(user_query)
+    if routed:
+        plan = Plan(steps=[ToolCall(tool_name=tool, arguments=arg) for tool, arg in routed])
+        yield StatusChunk(f"🧭 **Routed:** {', '.join(step.tool_name for step in plan.steps)}")
+    else:
+        try:
+            with span("brain.plan"):
+                plan = structured_llm.invoke(system_prompt)
+        except Exception as e:
+            yield FinalChunk(f"Error in planning: {e}")
+            return
+
+    outputs = [None] * len(plan.steps)
+    groups = optimize_plan(plan)
 
     # --- STEP 2: EXECUTION ---
-    for step in plan.steps:
-        yield f"⚙️ **Executing:** {step.tool_name}..."
-
-        output = ""
-        if step.tool_name == "gmp_tool":
-            output = str(fetch_ipo_details(ipo_name))
-
-        elif step.tool_name == "sentiment_tool":
-            output = fetch_sentiment(ipo_name, source=step.arguments)
-
-        elif step.tool_name == "rhp_tool":
-            # --- FIX IS HERE: RAW QUERY INJECTION ---
-            # If the user is just asking a document question (single step plan),
-            # we use their EXACT query instead of the AI's summarized argument.
-            # This ensures 'rhp_chat.py' level accuracy.
-            search_query = step.arguments
-
-            if len(plan.steps) == 1:
-                search_query = user_query
-
-            # Pass vector_store explicitly
-            output = query_rhp(ipo_name, query=search_query, vector_store=vector_store)
-            # ----------------------------------------
-
-        results.append(f"--- RESULT FROM {step.tool_name.upper()} ---\n{output}\n")
-        yield f"✅ {step.tool_name} Complete."
+    # Groups are independent, so they run side by side on a bounded pool. Workers report
+    # start/finish as they happen (see fan_out), while every output is mapped back to
+    # its plan steps, which keep plan order for synthesis.
+    def run(group):
+        with span("brain.step", tool=group.tool_name, merged_steps=sum(len(t) for t in group.targets)):
+            return run_group(group, plan, user_query, ipo_name, vector_store)
+
+    for kind, g, payload in fan_out(run, groups, MAX_PARALLEL_STEPS, timeout=STEP_TIMEOUT):
+        group = groups[g]
+        if kind == "start":
+            yield StatusChunk(f"⚙️ **Executing:** {group.label}...")
+            continue
+
+        if kind == "done":
+            group_outputs = payload
+            yield StatusChunk(f"✅ {group.label} Complete.")
+        elif kind == "error":
+            group_outputs = [f"Error running {group.tool_name}: {payload}"] * len(group.arguments)
+            yield StatusChunk(f"⚠️ {group.label} Failed: {payload}")
+        else:
+            group_outputs = [f"Timed out after {STEP_TIMEOUT:.0f}s."] * len(group.arguments)
+            yield StatusChunk(f"⚠️ {group.label} Timed out.")
+        for output, targets in zip(group_outputs, group.targets):
+            for i in targets:
+                outputs[i] = output
+
+    # Merged steps share one output: it goes into the synthesis prompt once
+    unique = []
+    for step, output in zip(plan.steps, outputs):
+        if (step.tool_name, output) not in unique:
+            unique.append((step.tool_name, output))
+
+    # Keep the synthesis prompt flat however many tools ran or how long their outputs are
+    packed = pack([output for _, output in unique], SYNTHESIS_BUDGET)
+    results = [f"--- RESULT FROM {tool.upper()} ---\n{output}\n" for (tool, _), output in zip(unique, packed)]
 
     # --- STEP 3: SYNTHESIS ---
-    yield "🧠 **Synthesizing Final Answer...**"
+    yield StatusChunk("🧠 **Synthesizing Final Answer...**")
 
     final_prompt = f"""
     User Query: {user_query}
@@ -91,5 +199,6 @@ def execute_brain(user_query, ipo_name, vector_store):
     Answer the user's query professionally based ONLY on the data above.
     """
 
-    final_response = llm.invoke(final_prompt).content
-    yield final_response
\ No newline at end of file
+    # Tokens stream to the UI as they are generated; the FinalChunk carries the full answer
+    with span("brain.synthesis"):
+        yield from stream_llm(llm, final_prompt)
\ No newline at end of file
@@ -1,22 +1,61 @@
 import os
 import json
-from langchain_groq import ChatGroq
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from tools_library import fetch_ipo_details, fetch_sentiment, query_rhp
+from tools_library import fetch_ipo_details_batch, fetch_sentiment, get_rhp_engine, get_llm
+from peer_table import valuation_metrics, gmp_frame, upper_price_band, frame_to_markdown
+from context_packer import pack, compact_json, trim_to_tokens, COMPARISON_BUDGET
+from stream_events import StatusChunk, stream_llm
+from tracing import span, bind
+from fan_out import fan_out
 
+PEER_MAX_WORKERS = int(os.getenv("PEER_MAX_WORKERS", "6"))
+PEER_TIMEOUT = float(os.getenv("PEER_TIMEOUT", "20"))  # seconds per company
+VALUATION_COLUMNS = ["company", "eps_diluted", "nav", "pe", "ronw", "pe_discount_pct", "ronw_vs_median"]
 
-def execute_peer_comparison(target_ipo, selected_peers, vector_store):
+
+def _scout_companies(companies, max_workers, timeout):
+    """
+    Fetches sentiment for every company concurrently (bounded by max_workers).
+    Yields (index, sentiment, status) as each company finishes or hits its own timeout.
+    """
+    def scout(company):
+        with span("comparison.scout", company=company):
+            return fetch_sentiment(company, source="all")
+
+    for kind, i, payload in fan_out(scout, companies, max_workers, item_timeout=timeout, thread_name_prefix="scout"):
+        if kind == "done":
+            yield i, payload, "ok"
+        elif kind == "error":
+            yield i, f"Sentiment unavailable: {payload}", "error"
+        elif kind == "timeout":
+            yield i, f"Timed out fetching sentiment after {timeout:.0f}s.", "timeout"
+
+
+def execute_peer_comparison(target_ipo, selected_peers, vector_store,
+                            max_workers=PEER_MAX_WORKERS, company_timeout=PEER_TIMEOUT):
     """
     Generates a vast, multi-dimensional comparison report.
+    Phase 1 (RHP) and Phase 2 (market data) are independent and run at the same time.
     """
-    yield "🔄 **Phase 1: Analyzing Target's Competitive Landscape (RHP)...**"
+    with span("comparison", ipo=target_ipo, peers=len(selected_peers)):
+        yield from _compare(target_ipo, selected_peers, vector_store, max_workers, company_timeout)
+
+
+def _compare(target_ipo, selected_peers, vector_store, max_workers, company_timeout):
+    yield StatusChunk("🔄 **Phase 1: Analyzing Target's Competitive Landscape (RHP)...**")
 
     # 1. Extract Fundamental Comparison from Target RHP
     # The RHP always has a section comparing the company to peers. We extract that.
     rhp_fundamentals = "Target RHP not loaded. Fundamental comparison limited."
-    if vector_store:
-        yield "📖 Reading 'Industry Comparison' section from RHP..."
+    rhp_job = None
+    peer_df = getattr(vector_store, "peer_table", None) if vector_store else None
+    if peer_df is not None:
+        # Parsed at ingest from the 'Basis for Issue Price' table; priced once market data is in
+        yield StatusChunk("📐 Using the peer ratio table extracted from the RHP...")
+    elif vector_store:
+        yield StatusChunk("📖 Reading 'Industry Comparison' section from RHP...")
         q = """
         Extract the 'Comparison with Listed Industry Peers' or 'Basis for Issue Price' table.
         List the Peer Companies mentioned and their key financial ratios:
@@ -25,31 +64,61 @@ def execute_peer_comparison(target_ipo, selected_peers, vector_store):
         - RoNW (Return on Net Worth)
         - NAV (Net Asset Value)
         """
-        rhp_fundamentals = query_rhp(target_ipo, q, vector_store=vector_store)
+        # Only search the pages of the 'Basis for Issue Price' section (global search if it wasn't detected).
+        # Runs in the background while Phase 2 scouts the market.
+        rhp_pool = ThreadPoolExecutor(max_workers=1)
+        rhp_job = rhp_pool.submit(bind(get_rhp_engine(vector_store).query), q, section="basis_for_issue_price")
+        rhp_pool.shutdown(wait=False)
 
     # 2. Gather Live Market Data for ALL (Target + Peers)
-    yield "📊 **Phase 2: Gathering Live Market Intelligence...**"
+    yield StatusChunk("📊 **Phase 2: Gathering Live Market Intelligence...**")
 
-    market_data = {}
     companies_to_analyze = [target_ipo] + selected_peers
+    roles = ["TARGET" if c == target_ipo else "PEER" for c in companies_to_analyze]
+
+    # Resolve every company against the listing in a single batch (in-memory snapshot)
+    all_details = fetch_ipo_details_batch(companies_to_analyze)
+    all_sentiment = [None] * len(companies_to_analyze)
 
-    for company in companies_to_analyze:
-        role = "TARGET" if company == target_ipo else "PEER"
-        yield f"🕵️ Scouting: **{company}** ({role})..."
+    for i, sentiment, status in _scout_companies(companies_to_analyze, max_workers, company_timeout):
+        all_sentiment[i] = sentiment
+        mark = {"ok": "✅", "timeout": "⏱️"}.get(status, "⚠️")
+        yield StatusChunk(f"🕵️ Scouting: **{companies_to_analyze[i]}** ({roles[i]})... {mark}")
 
-        details = fetch_ipo_details(company)
-        sentiment = fetch_sentiment(company, source="all")
+    # Sentiment gets half the prompt budget, shared fairly across companies (repeated headlines dropped)
+    all_sentiment = pack(all_sentiment, COMPARISON_BUDGET // 2)
 
+    # Assembled in the original order regardless of completion order
+    market_data = {}
+    for company, role, details, sentiment in zip(companies_to_analyze, roles, all_details, all_sentiment):
         market_data[company] = {
             "Role": role,
             "Market Details": details,
             "Sentiment Summary": sentiment
         }
 
+    if rhp_job is not None:
+        rhp_fundamentals = rhp_job.result()
+
     # 3. Synthesis
-    yield "⚖️ **Phase 3: Calculating Valuation & Rankings...**"
+    yield StatusChunk("⚖️ **Phase 3: Calculating Valuation & Rankings...**")
 
-    llm = ChatGroq(api_key=os.getenv("GROQ_API_KEY"), model="llama-3.3-70b-versatile", temperature=0.1)
+    # Exact numbers are computed here; the LLM only writes the narrative around them
+    with span("comparison.valuation"):
+        if peer_df is not None:
+            issue_price = upper_price_band(market_data[target_ipo]["Market Details"].get("Price Band"))
+            valuation = valuation_metrics(peer_df, issue_price=issue_price)
+            rhp_fundamentals = (
+                "[Source: RHP 'Basis for Issue Price' peer table; issuer P/E at the upper price band; "
+                "pe_discount_pct > 0 = cheaper than peer median]\n" + frame_to_markdown(valuation, VALUATION_COLUMNS)
+            )
+
+        demand = gmp_frame({c: d["Market Details"] for c, d in market_data.items()
+                            if isinstance(d["Market Details"], dict)})
+        leaderboard = frame_to_markdown(demand.sort_values("gmp_rank"),
+                                        ["company", "gmp", "price_upper", "gmp_pct", "gmp_rank"])
+
+    llm = get_llm("llama-3.3-70b-versatile", temperature=0.1)
 
     system_prompt = """
     You are a Senior Sector Analyst. You have:
@@ -75,11 +144,13 @@ def execute_peer_comparison(target_ipo, selected_peers, vector_store):
 
     ### 4. The Leaderboard (Rank 1 to Last)
     - Rank them based on a mix of Valuation (Cheaper is better) and GMP (Higher is better).
+    - Use the precomputed GMP % and valuation figures exactly as given; do not recalculate them.
     - **Verdict:** Justify why #1 is the best buy.
     """
 
-    # Prepare inputs safely
-    market_json = json.dumps(market_data, indent=2, default=str)
+    # Prepare inputs safely (compact JSON: no indentation, empty/N/A fields dropped)
+    market_json = compact_json(market_data)
+    rhp_fundamentals = trim_to_tokens(rhp_fundamentals, COMPARISON_BUDGET // 2)
 
     prompt = ChatPromptTemplate.from_messages([
         ("system", system_prompt),
@@ -90,15 +161,18 @@ def execute_peer_comparison(target_ipo, selected_peers, vector_store):
         **Live Market Data (GMP & Sentiment):**
         {market_data}
 
+        **Precomputed GMP Leaderboard (GMP as % of upper price band):**
+        {leaderboard}
+
         Generate the Detailed Comparison Report now.
         """)
     ])
 
     chain = prompt | llm | StrOutputParser()
 
-    analysis = chain.invoke({
-        "rhp_data": rhp_fundamentals,
-        "market_data": market_json
-    })
-
-    yield analysis
\ No newline at end of file
+    with span("comparison.analysis"):
+        yield from stream_llm(chain, {
+            "rhp_data": rhp_fundamentals,
+            "market_data": market_json,
+            "leaderboard": leaderboard
+        })
\ No newline at end of file
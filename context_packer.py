@@ -0,0 +1,109 @@
+import os
+import re
+import json
+
+# Per-call prompt budgets (tokens of packed context, excluding instructions)
+SYNTHESIS_BUDGET = int(os.getenv("SYNTHESIS_TOKEN_BUDGET", "3000"))
+SECTION_BUDGET = int(os.getenv("SECTION_TOKEN_BUDGET", "3500"))
+VERDICT_BUDGET = int(os.getenv("VERDICT_TOKEN_BUDGET", "3000"))
+COMPARISON_BUDGET = int(os.getenv("COMPARISON_TOKEN_BUDGET", "3500"))
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n")
+_EMPTY_VALUES = (None, "", "N/A", [], {})
+# Lines the digest keeps first: headings, table rows, figures and verdict words
+_SALIENT = re.compile(r"^\s*(#|\|)|\d|₹|%|risk|strength|weak|litigation|avoid|apply", re.IGNORECASE)
+
+
+def count_tokens(text):
+    """Cheap tokenizer-free estimate: word/punctuation pieces, long words counted as several."""
+    if not text:
+        return 0
+    return sum(1 + len(t) // 8 for t in _TOKEN_RE.findall(text))
+
+
+def trim_to_tokens(text, budget):
+    """Cuts text at a sentence or line boundary so it fits the budget."""
+    if count_tokens(text) <= budget:
+        return text
+    kept, used = [], 0
+    for piece in _SENTENCE_END.split(text):
+        cost = count_tokens(piece)
+        if used + cost > budget:
+            break
+        kept.append(piece)
+        used += cost
+    if not kept:
+        # One huge sentence: fall back to a character cut (~4 chars per token)
+        return text[:budget * 4].rstrip() + " …"
+    return "\n".join(kept).rstrip() + " …"
+
+
+def compact_json(obj):
+    """Minified JSON with empty / N/A fields dropped."""
+    def strip(o):
+        if isinstance(o, dict):
+            return {k: strip(v) for k, v in o.items() if v not in _EMPTY_VALUES}
+        if isinstance(o, list):
+            return [strip(v) for v in o]
+        return o
+    return json.dumps(strip(obj), separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def dedupe_lines(texts, min_len=24):
+    """
+    Drops lines already seen in an earlier text (repeated headlines, boilerplate).
+    Short lines and table rows are structural and always kept.
+    """
+    seen, out = set(), []
+    for text in texts:
+        lines = []
+        for line in text.splitlines():
+            key = " ".join(line.lower().split())
+            if len(key) >= min_len and not key.startswith("|"):
+                if key in seen:
+                    continue
+                seen.add(key)
+            lines.append(line)
+        out.append("\n".join(lines))
+    return out
+
+
+def pack(texts, budget, priorities=None):
+    """
+    Fits several context pieces into one budget, keeping their order.
+    Small pieces are kept whole and the remainder is shared fairly among the large
+    ones; with priorities, higher-priority pieces are served first.
+    """
+    texts = dedupe_lines(texts)
+    costs = [count_tokens(t) for t in texts]
+    if sum(costs) <= budget:
+        return texts
+
+    order = sorted(range(len(texts)), key=lambda i: (-(priorities[i] if priorities else 0), costs[i]))
+    allowance = [0] * len(texts)
+    remaining = budget
+    for n, i in enumerate(order):
+        share = remaining // (len(order) - n)
+        allowance[i] = min(costs[i], share)
+        remaining -= allowance[i]
+    return [t if allowance[i] >= costs[i] else trim_to_tokens(t, allowance[i]) for i, t in enumerate(texts)]
+
+
+def digest(markdown, budget):
+    """
+    Short digest of a report chapter: headings, table rows and lines with figures or
+    verdict keywords come first, then the remaining lines, in document order.
+    """
+    if count_tokens(markdown) <= budget:
+        return markdown
+    lines = [l for l in markdown.splitlines() if l.strip()]
+    ranked = sorted(range(len(lines)), key=lambda i: (0 if _SALIENT.search(lines[i]) else 1, i))
+    keep, used = set(), 0
+    for i in ranked:
+        cost = count_tokens(lines[i])
+        if used + cost > budget:
+            continue
+        keep.add(i)
+        used += cost
+    return "\n".join(lines[i] for i in sorted(keep))
@@ -0,0 +1,62 @@
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from tracing import bind
+
+
+def fan_out(fn, items, max_workers, timeout=None, item_timeout=None, thread_name_prefix=""):
+    """
+    Runs fn(item) for every item on a bounded pool and yields (kind, index, payload) as it happens:
+    ("start", i, None) when a worker picks item i up, then exactly one of ("done", i, result),
+    ("error", i, exception) or ("timeout", i, None).
+
+    timeout bounds the whole fan-out; item_timeout bounds each item from its start (items that
+    never got a worker, because the others hung, time out with the first one that does).
+    Late results are dropped: the pool is not waited on, so a hung call can't hold up the caller.
+    Spans opened in fn nest under the caller's current span.
+    """
+    items = list(items)
+    events = queue.Queue()
+
+    def run(i, item):
+        events.put(("start", i, None))
+        try:
+            events.put(("done", i, fn(item)))
+        except Exception as e:
+            events.put(("error", i, e))
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))), thread_name_prefix=thread_name_prefix)
+    for i, item in enumerate(items):
+        pool.submit(bind(run), i, item)
+    pool.shutdown(wait=False)
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    started = {}
+    pending = set(range(len(items)))
+    while pending:
+        now = time.monotonic()
+        limits = [deadline] if deadline is not None else []
+        if item_timeout is not None:
+            running = [started[i] + item_timeout for i in pending if i in started]
+            limits.append(min(running) if running else now + item_timeout)
+        try:
+            kind, i, payload = events.get(timeout=max(0.0, min(limits) - now) if limits else None)
+        except queue.Empty:
+            now = time.monotonic()
+            for i in sorted(pending):
+                expired = deadline is not None and now >= deadline
+                if item_timeout is not None and started.get(i, now - item_timeout) + item_timeout <= now:
+                    expired = True
+                if expired:
+                    pending.discard(i)
+                    yield "timeout", i, None
+            continue
+
+        if i not in pending:
+            continue  # already timed out
+        if kind == "start":
+            started[i] = time.monotonic()
+            yield kind, i, None
+        else:
+            pending.discard(i)
+            yield kind, i, payload
@@ -0,0 +1,21 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+USER_AGENT = "Mozilla/5.0"
+TIMEOUT = (5, 30)  # (connect, read) seconds
+
+
+def _build_session():
+    session = requests.Session()
+    session.headers.update({"User-Agent": USER_AGENT})
+    # Keep-alive pool shared by every worker; idempotent GETs are retried on transient errors
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+                  allowed_methods=("GET", "HEAD"), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+SESSION = _build_session()
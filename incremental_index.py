@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import shutil
+import pymupdf
+from collections import defaultdict
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from index_store import CHUNK_SIZE, CHUNK_OVERLAP
+from ingest_pipeline import page_hash, EMBED_BATCH_SIZE
+from lexical_index import chunk_id, LEXICAL_FILE
+from peer_table import PEER_TABLE_FILE
+from tracing import current
+
+PAGE_LOG_FILE = "pages.json"  # [{"hash", "chunks"}] per page of the indexed PDF
+
+
+def save_page_log(index_dir, page_log):
+    """page_log: {page: {"hash", "chunks"}} as filled by ingest_pdf."""
+    pages = [page_log.get(i, {"hash": None, "chunks": []}) for i in range(max(page_log, default=-1) + 1)]
+    with open(os.path.join(index_dir, PAGE_LOG_FILE), "w", encoding="utf-8") as f:
+        json.dump(pages, f)
+
+
+def load_page_log(index_dir):
+    try:
+        with open(os.path.join(index_dir, PAGE_LOG_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# --- STORE ADAPTERS ---
+# Moved pages keep their vectors: they are read back and re-added under the new page's ids.
+def _fetch(vector_store, ids):
+    """(vectors, texts, metadatas) of the given ids, in that order."""
+    if not ids:
+        return [], [], []
+    if hasattr(vector_store, "get_records"):
+        return vector_store.get_records(ids)
+    got = vector_store._collection.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+    order = {row_id: n for n, row_id in enumerate(got["ids"])}
+    return ([got["embeddings"][order[i]] for i in ids], [got["documents"][order[i]] for i in ids],
+            [dict(got["metadatas"][order[i]]) for i in ids])
+
+
+def _put(vector_store, ids, vectors, texts, metadatas):
+    if not ids:
+        return
+    if hasattr(vector_store, "add_embeddings"):
+        vector_store.add_embeddings(texts, vectors, metadatas, ids)
+    else:
+        vector_store._collection.upsert(ids=ids, embeddings=[list(map(float, v)) for v in vectors],
+                                        documents=texts, metadatas=metadatas)
+
+
+def clone_index(base_dir, index_dir, base_key, key, backend):
+    """Copies a built index as the starting point of a new version."""
+    # Everything but the vectors is rebuilt for the new version
+    shutil.copytree(base_dir, index_dir, dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns(LEXICAL_FILE, PEER_TABLE_FILE, PAGE_LOG_FILE))
+    if backend == "chroma":
+        # Chroma stores the collection under the base's key; rename it to the new one
+        import chromadb
+        client = chromadb.PersistentClient(path=index_dir)
+        client.get_collection(base_key).modify(name=key)
+
+
+# --- DIFF ---
+def diff_pages(old_log, new_hashes):
+    """
+    Matches pages by content hash, so pages that only shifted (inserted or removed pages
+    before them) are recognised. Returns (mapping new page -> old page, new pages, removed old pages).
+    """
+    by_hash = defaultdict(list)
+    for j, entry in enumerate(old_log):
+        by_hash[entry["hash"]].append(j)
+    mapping, added = {}, []
+    for i, h in enumerate(new_hashes):
+        candidates = by_hash.get(h)
+        if candidates:
+            j = i if i in candidates else candidates[0]
+            candidates.remove(j)
+            mapping[i] = j
+        else:
+            added.append(i)
+    removed = sorted(set(range(len(old_log))) - set(mapping.values()))
+    return mapping, added, removed
+
+
+def update_index(pdf_path, vector_store, old_log, section_map, chunk_filter, lexical, progress=None,
+                 batch_size=EMBED_BATCH_SIZE):
+    """
+    Brings a copy of the previous version's index up to date with pdf_path.
+
+    Unchanged pages keep their chunks, shifted pages keep their vectors under new ids,
+    chunks of removed or changed pages are deleted, and only new or changed pages are
+    split and embedded. Every surviving chunk is added to the lexical builder.
+    Returns (pages, chunks, page_log, diff stats).
+    """
+    with pymupdf.open(pdf_path) as doc:
+        texts = [chunk_filter.clean_page(page.get_text()) for page in doc]
+    total_pages = len(texts)
+    new_hashes = [page_hash(t) for t in texts]
+    mapping, added, removed = diff_pages(old_log, new_hashes)
+
+    page_log = {i: {"hash": new_hashes[i], "chunks": list(old_log[j]["chunks"])} for i, j in mapping.items()}
+    survivors = [(chunk_id({"page": j, "chunk": n}), i, n) for i, j in sorted(mapping.items())
+                 for n in old_log[j]["chunks"]]
+    vectors, kept_texts, metas = _fetch(vector_store, [old_id for old_id, _, _ in survivors])
+    # Shifted pages, and pages whose section changed (a new TOC), are re-keyed with their old vectors
+    moved = [k for k, (old_id, i, n) in enumerate(survivors)
+             if old_id != chunk_id({"page": i, "chunk": n}) or metas[k].get("section") != section_map.section_for(i)]
+
+    # Delete before re-adding: a shifted page may take over the ids of a removed one
+    stale = [chunk_id({"page": j, "chunk": n}) for j in removed for n in old_log[j]["chunks"]]
+    if stale or moved:
+        vector_store.delete(ids=stale + [survivors[k][0] for k in moved])
+    for k in moved:
+        _, i, n = survivors[k]
+        metas[k].update({"page": i, "chunk": n, "section": section_map.section_for(i), "total_pages": total_pages,
+                         "source": pdf_path, "file_path": pdf_path})
+    _put(vector_store, [chunk_id(metas[k]) for k in moved], [vectors[k] for k in moved],
+         [kept_texts[k] for k in moved], [metas[k] for k in moved])
+
+    surviving = [Document(page_content=t, metadata=m) for t, m in zip(kept_texts, metas)]
+    for d in surviving:
+        chunk_filter.remember(d.page_content)
+    lexical.add(surviving)
+
+    # Only new or changed pages are split and embedded
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    trace = current()
+    fresh = []
+    for i in added:
+        page_log[i] = {"hash": new_hashes[i], "chunks": []}
+        page_doc = Document(page_content=texts[i], metadata={
+            "source": pdf_path, "file_path": pdf_path, "page": i, "total_pages": total_pages,
+            "section": section_map.section_for(i)})
+        for n, chunk in enumerate(splitter.split_documents([page_doc])):
+            chunk.metadata["chunk"] = n
+            if chunk_filter.keep(chunk):
+                fresh.append(chunk)
+                page_log[i]["chunks"].append(n)
+    for lo in range(0, len(fresh), batch_size):
+        batch = fresh[lo:lo + batch_size]
+        start = time.perf_counter()
+        vector_store.add_documents(batch, ids=[chunk_id(d.metadata) for d in batch])
+        trace.add("embed_s", time.perf_counter() - start)
+        trace.add("embed_batches")
+        if progress:
+            progress(total_pages, total_pages, len(surviving) + lo + len(batch))
+    lexical.add(fresh)
+
+    moved_pages = len({survivors[k][1] for k in moved})
+    stats = {"pages_unchanged": len(mapping) - moved_pages, "pages_moved": moved_pages, "pages_added": len(added),
+             "pages_removed": len(removed), "chunks_reused": len(surviving), "chunks_embedded": len(fresh),
+             "chunks_deleted": len(stale)}
+    if progress:
+        progress(total_pages, total_pages, len(surviving) + len(fresh))
+    return total_pages, len(surviving) + len(fresh), page_log, stats
@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import shutil
+import glob
+import hashlib
+import threading
+import contextlib
+from collections import Counter
+
+# --- INDEX SETTINGS ---
+# Anything that changes the vectors of a document must be part of the cache key,
+# otherwise an old collection would be served for a differently built index.
+INDEX_ROOT = "./chroma_db_storage"
+EMBED_MODEL = "all-MiniLM-L6-v2"
+EMBED_DIM = 384
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+INDEX_SCHEMA = 7  # bump when stored artifacts change (2: section tags, 3: peer table, 4: BM25 index, 5: chunk filter,
+                  # 6: page log, 7: chunk dedupe keeps figures)
+DISK_BUDGET_MB = int(os.getenv("INDEX_DISK_BUDGET_MB", "2048"))
+# "chroma" (HNSW collection) or "numpy" (memory-mapped exact search, see numpy_store)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float16")  # numpy backend only: float16 or int8
+
+
+def file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def index_key(doc_hash, model=EMBED_MODEL, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, schema=INDEX_SCHEMA,
+              backend="chroma", dtype=VECTOR_DTYPE):
+    """
+    Cache key of one built index: the PDF content plus every ingest setting.
+    Also used as the Chroma collection name (3-63 chars, alphanumeric).
+    """
+    parts = [doc_hash, model, chunk_size, chunk_overlap, schema]
+    if backend != "chroma":
+        parts += [backend, dtype]  # Chroma keys stay as they were before other backends existed
+    settings = json.dumps(parts)
+    return "rhp_" + hashlib.sha256(settings.encode()).hexdigest()[:32]
+
+
+def _settings(backend):
+    # Indexes built with other settings can't be patched into the current layout
+    return [EMBED_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, INDEX_SCHEMA, backend, VECTOR_DTYPE if backend != "chroma" else None]
+
+
+def _lock(f, blocking=True):
+    """Exclusive OS-level lock on an open file; False if blocking=False and another holder has it."""
+    if os.name == "nt":
+        import msvcrt
+        while True:  # LK_LOCK gives up after ~10 s; keep waiting
+            try:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+    import fcntl
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _unlock(f):
+    if os.name == "nt":
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Exclusive lock on a lock file, held while the block runs. Unlike threading locks it is
+    also seen by other processes (the pre-ingestion worker, other app instances).
+    Not re-entrant, even within one process.
+    """
+    with open(path, "a+b") as f:
+        _lock(f)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class IndexStore:
+    """
+    Persistent, content-addressed store of built RHP indexes.
+
+    Every document gets its own directory (and Chroma collection) named after its
+    index key, so re-opening an RHP we already embedded is just opening a folder.
+    A small JSON manifest tracks readiness, size and last access for LRU eviction.
+
+    The app and the pre-ingestion worker share the store: manifest updates are serialized
+    with a lock file, and a pinned key holds a locked lease file ({key}.pin.{pid}) that
+    eviction in any process respects until the pin is released or its process dies.
+    """
+
+    def __init__(self, root=INDEX_ROOT, budget_mb=DISK_BUDGET_MB):
+        self.root = root
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self.manifest_path = os.path.join(root, "index_manifest.json")
+        self._lock = threading.RLock()
+        self._pinned = Counter()  # key -> holders; the registry and incremental builds pin independently
+        self._leases = {}         # key -> open, locked lease file while pinned
+        self._manifest_mtime = None
+        os.makedirs(root, exist_ok=True)
+        self._manifest = self._load()
+
+    # --- MANIFEST ---
+    def _load(self):
+        try:
+            self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            data.setdefault("indexes", {})
+            data.setdefault("files", {})
+            return data
+        except (OSError, ValueError):
+            return {"indexes": {}, "files": {}}
+
+    def _sync(self):
+        # The pre-ingestion worker runs in its own process: pick up its commits
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._manifest_mtime:
+            self._manifest = self._load()
+
+    @contextlib.contextmanager
+    def _update(self):
+        """Read-modify-write of the manifest, serialized with other processes; saved on exit."""
+        with self._lock, file_lock(self.manifest_path + ".lock"):
+            self._manifest = self._load()  # always re-read: mtimes can be too coarse to see a write
+            yield self._manifest
+            self._save()
+
+    def _save(self):
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+        self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+
+    # --- KEYS ---
+    def doc_hash(self, pdf_path):
+        """Content hash of a PDF, memoized on (path, size, mtime) to skip re-reading big files."""
+        st = os.stat(pdf_path)
+        abs_path = os.path.abspath(pdf_path)
+        with self._lock:
+            self._sync()
+            seen = self._manifest["files"].get(abs_path)
+            if seen and seen["size"] == st.st_size and seen["mtime"] == st.st_mtime:
+                return seen["sha256"]
+        digest = file_sha256(pdf_path)
+        with self._update() as manifest:
+            manifest["files"][abs_path] = {"size": st.st_size, "mtime": st.st_mtime, "sha256": digest}
+        return digest
+
+    def key_for(self, pdf_path, backend=None):
+        return index_key(self.doc_hash(pdf_path), backend=backend or VECTOR_BACKEND)
+
+    def path_for(self, key):
+        return os.path.join(self.root, key)
+
+    # --- LIFECYCLE ---
+    def is_ready(self, key):
+        with self._lock:
+            self._sync()
+            entry = self._manifest["indexes"].get(key)
+            return bool(entry and entry.get("ready") and os.path.isdir(self.path_for(key)))
+
+    def build_lock(self, key):
+        """
+        Cross-process lock of one index key. Builds hold it from the readiness check to
+        commit(), so a second process waits for the build instead of wiping its directory.
+        """
+        return file_lock(os.path.join(self.root, f"{key}.lock"))
+
+    def begin(self, key, pdf_path):
+        """
+        Reserve a clean directory for a new build. Half-built leftovers are discarded,
+        so callers must hold build_lock(key).
+        """
+        with self._update() as manifest:
+            path = self.path_for(key)
+            if os.path.exists(path):
+                shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path, exist_ok=True)
+            manifest["indexes"][key] = {
+                "ready": False,
+                "source": os.path.abspath(pdf_path),
+                "created": time.time(),
+                "last_access": time.time(),
+                "size_bytes": 0,
+            }
+            return path
+
+    def commit(self, key, **meta):
+        """Mark a build as complete, record its size and enforce the disk budget."""
+        size = _dir_size(self.path_for(key))  # walked before taking the manifest lock
+        with self._update() as manifest:
+            entry = manifest["indexes"].setdefault(key, {})
+            entry.update(meta)
+            entry["settings"] = _settings(meta.get("backend", "chroma"))
+            entry["ready"] = True
+            entry["last_access"] = time.time()
+            entry["size_bytes"] = size
+            self._evict(manifest, keep={key})
+
+    def entry(self, key):
+        with self._lock:
+            self._sync()
+            return dict(self._manifest["indexes"].get(key, {}))
+
+    def base_for(self, pdf_path, key, backend="chroma"):
+        """
+        Key of the newest ready index built from an earlier version of the file at pdf_path
+        (same path, other content) with the current settings, or None.
+        """
+        source = os.path.abspath(pdf_path)
+        settings = _settings(backend)
+        with self._lock:
+            self._sync()
+            candidates = [(e.get("created", 0), k) for k, e in self._manifest["indexes"].items()
+                          if k != key and e.get("ready") and e.get("source") == source
+                          and e.get("settings") == settings and os.path.isdir(self.path_for(k))]
+        return max(candidates)[1] if candidates else None
+
+    def _lease_path(self, key, pid):
+        return os.path.join(self.root, f"{key}.pin.{pid}")
+
+    def pin(self, key):
+        """Protect an index that is open in memory from disk eviction, in every process."""
+        with self._lock:
+            self._pinned[key] += 1
+            if key not in self._leases:
+                # Under the manifest lock: an evict() running elsewhere either sees the lease or is done
+                with file_lock(self.manifest_path + ".lock"):
+                    lease = open(self._lease_path(key, os.getpid()), "a+b")
+                    _lock(lease)
+                self._leases[key] = lease
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned[key] -= 1
+            if self._pinned[key] <= 0:
+                del self._pinned[key]
+                lease = self._leases.pop(key, None)
+                if lease is not None:
+                    _unlock(lease)
+                    lease.close()
+                    try:
+                        os.remove(lease.name)
+                    except OSError:
+                        pass
+
+    def _pinned_anywhere(self, key):
+        if key in self._pinned:
+            return True
+        own = self._lease_path(key, os.getpid())
+        for path in glob.glob(glob.escape(self._lease_path(key, "")) + "*"):
+            if path == own:
+                continue
+            try:
+                with open(path, "a+b") as lease:
+                    if not _lock(lease, blocking=False):
+                        return True  # held by a live process
+                    _unlock(lease)
+                os.remove(path)  # left behind by a process that died
+            except OSError:
+                return True
+        return False
+
+    def touch(self, key):
+        with self._update() as manifest:
+            entry = manifest["indexes"].get(key)
+            if entry:
+                entry["last_access"] = time.time()
+
+    def remove(self, key):
+        with self._update() as manifest:
+            manifest["indexes"].pop(key, None)
+            shutil.rmtree(self.path_for(key), ignore_errors=True)
+
+    def evict(self, keep=()):
+        """Drop least recently used indexes until the store fits in its disk budget."""
+        with self._update() as manifest:
+            return self._evict(manifest, keep)
+
+    def _evict(self, manifest, keep):
+        # Caller holds the manifest lock
+        entries = manifest["indexes"]
+        total = sum(e.get("size_bytes", 0) for e in entries.values())
+        evicted = []
+        for key, entry in sorted(entries.items(), key=lambda kv: kv[1].get("last_access", 0)):
+            if total <= self.budget_bytes:
+                break
+            if key in keep or self._pinned_anywhere(key):
+                continue
+            total -= entry.get("size_bytes", 0)
+            evicted.append(key)
+        for key in evicted:
+            entries.pop(key, None)
+            shutil.rmtree(self.path_for(key), ignore_errors=True)
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            self._sync()
+            entries = self._manifest["indexes"]
+            return {
+                "indexes": len(entries),
+                "size_bytes": sum(e.get("size_bytes", 0) for e in entries.values()),
+                "budget_bytes": self.budget_bytes,
+            }
+
+
+# Shared by every caller in this process
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_index_store():
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = IndexStore()
+        return _STORE
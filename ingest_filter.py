@@ -0,0 +1,148 @@
+import re
+import zlib
+import hashlib
+from collections import Counter
+import numpy as np
+import pymupdf
+
+# --- FILTER SETTINGS ---
+BOILERPLATE_SAMPLE = 80   # pages sampled (evenly spread) to learn repeating header/footer lines
+EDGE_LINES = 4            # lines at the top and bottom of a page that may be header/footer
+REPEAT_SHARE = 0.3        # an edge line on at least this share of sampled pages is boilerplate
+MIN_REPEATS = 3
+MIN_CHUNK_CHARS = 50      # chunks shorter than this after cleaning carry no content
+NEAR_DUP_THRESHOLD = 0.9  # estimated Jaccard similarity above which a chunk is a near duplicate
+SHINGLE_WORDS = 5
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16        # LSH: 16 bands x 4 rows
+
+_BLANK = re.compile(r"\[?\s*this page (?:has been |is )?(?:intentionally )?(?:left|kept) blank\s*\]?", re.IGNORECASE)
+_DIGITS = re.compile(r"\d+")
+_MERSENNE = (1 << 61) - 1
+
+
+def normalize_line(line):
+    """Case, spacing and numbers folded, so 'Page 12' and 'Page 13' are the same line."""
+    return " ".join(_DIGITS.sub("#", line.lower()).split())
+
+
+def normalize_text(text):
+    """Case and spacing folded; figures are kept (FY2024 and FY2023 tables are different chunks)."""
+    return " ".join(text.lower().split())
+
+
+def _figures(text):
+    return hashlib.sha1(" ".join(_DIGITS.findall(text)).encode()).digest()
+
+
+def _edge_lines(text):
+    lines = [l for l in (normalize_line(l) for l in text.splitlines()) if l]
+    return set(lines[:EDGE_LINES] + lines[-EDGE_LINES:])
+
+
+def detect_boilerplate(pdf_path, sample=BOILERPLATE_SAMPLE):
+    """Normalized header/footer lines that repeat across the sampled pages of the PDF."""
+    with pymupdf.open(pdf_path) as doc:
+        total = doc.page_count
+        if total == 0:
+            return frozenset()
+        step = max(total / sample, 1)
+        pages = sorted({int(i * step) for i in range(min(sample, total))})
+        counts = Counter()
+        for i in pages:
+            counts.update(_edge_lines(doc[i].get_text()))
+    needed = max(MIN_REPEATS, int(REPEAT_SHARE * len(pages)))
+    return frozenset(line for line, n in counts.items() if n >= needed)
+
+
+class IngestFilter:
+    """
+    Per-build chunk filter: strips repeating header/footer lines and blank-page notices
+    from page text, then drops chunks that are exact or near duplicates (MinHash + LSH)
+    of a chunk already kept. A near duplicate must also carry the same figures, so
+    tables that differ only in their numbers are all kept.
+    Not thread-safe; ingestion calls it from one thread.
+    """
+
+    def __init__(self, boilerplate=frozenset(), threshold=NEAR_DUP_THRESHOLD):
+        self.boilerplate = boilerplate
+        self.threshold = threshold
+        rng = np.random.default_rng(0)  # fixed permutations: the same PDF always yields the same chunks
+        self._a = rng.integers(1, 1 << 31, MINHASH_PERMUTATIONS, dtype=np.uint64)  # a * h stays below 2^63
+        self._b = rng.integers(0, _MERSENNE, MINHASH_PERMUTATIONS, dtype=np.uint64)
+        self._rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+        self._exact = set()
+        self._buckets = {}     # (band, band signature) -> (signature, figures digest) of kept chunks
+        self.stats = {"pages": 0, "blank_pages": 0, "lines_removed": 0, "chars_removed": 0,
+                      "chunks_in": 0, "chunks_kept": 0, "short": 0, "exact_dups": 0, "near_dups": 0}
+
+    # --- PAGES ---
+    def clean_page(self, text):
+        self.stats["pages"] += 1
+        kept = []
+        for line in text.splitlines():
+            if self.boilerplate and normalize_line(line) in self.boilerplate:
+                self.stats["lines_removed"] += 1
+            else:
+                kept.append(line)
+        cleaned = _BLANK.sub("", "\n".join(kept))
+        self.stats["chars_removed"] += len(text) - len(cleaned)
+        if text.strip() and not cleaned.strip():
+            self.stats["blank_pages"] += 1
+        return cleaned
+
+    # --- CHUNKS ---
+    def _signature(self, words):
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(len(words) - SHINGLE_WORDS + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE).min(axis=1)
+
+    def keep(self, chunk):
+        """False for chunks that are too short, or duplicate one already kept."""
+        self.stats["chunks_in"] += 1
+        text = chunk.page_content
+        if len(text.strip()) < MIN_CHUNK_CHARS:
+            self.stats["short"] += 1
+            return False
+        normalized = normalize_text(text)
+        digest = hashlib.sha1(normalized.encode()).digest()
+        if digest in self._exact:
+            self.stats["exact_dups"] += 1
+            return False
+
+        sig = self._signature(normalized.split())
+        figures = _figures(normalized)
+        bands = self._bands(sig)
+        for band in bands:
+            for other, other_figures in self._buckets.get(band, ()):
+                if other_figures == figures and np.mean(sig == other) >= self.threshold:
+                    self.stats["near_dups"] += 1
+                    return False
+
+        self._add(digest, sig, figures, bands)
+        self.stats["chunks_kept"] += 1
+        return True
+
+    def remember(self, text):
+        """Registers a chunk that is already indexed (incremental updates) without counting it."""
+        normalized = normalize_text(text)
+        sig = self._signature(normalized.split())
+        self._add(hashlib.sha1(normalized.encode()).digest(), sig, _figures(normalized), self._bands(sig))
+
+    def _bands(self, sig):
+        return [(b, sig[b * self._rows:(b + 1) * self._rows].tobytes()) for b in range(MINHASH_BANDS)]
+
+    def _add(self, digest, sig, figures, bands):
+        self._exact.add(digest)
+        for band in bands:
+            self._buckets.setdefault(band, []).append((sig, figures))
+
+    def summary(self):
+        s = dict(self.stats)
+        s["chunks_removed"] = s["chunks_in"] - s["chunks_kept"]
+        s["removed_share"] = round(s["chunks_removed"] / s["chunks_in"], 3) if s["chunks_in"] else 0.0
+        return s
+
+
+def build_ingest_filter(pdf_path):
+    return IngestFilter(detect_boilerplate(pdf_path))
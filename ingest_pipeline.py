@@ -0,0 +1,134 @@
+import os
+import time
+import hashlib
+import pymupdf
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from index_store import CHUNK_SIZE, CHUNK_OVERLAP
+from rhp_sections import OTHER
+from tracing import current
+
+# --- PIPELINE SETTINGS ---
+PAGES_PER_TASK = 16      # page range handed to one parser process
+EMBED_BATCH_SIZE = 64    # chunks per embedding/upsert call
+MAX_PENDING_BATCHES = 2  # embed batches in flight before parsing results are held back
+
+
+def page_hash(text):
+    """
+    Content hash of one page's cleaned text (page numbers and headers already stripped),
+    so a page that only moved keeps its hash across document versions.
+    """
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def _extract_pages(pdf_path, start, stop):
+    """Runs in a worker process: plain text of pages [start, stop)."""
+    pages = []
+    with pymupdf.open(pdf_path) as doc:
+        for i in range(start, stop):
+            pages.append((i, doc[i].get_text()))
+    return pages
+
+
+def _page_documents(pdf_path, pages, total_pages, section_map=None, chunk_filter=None):
+    return [
+        Document(page_content=chunk_filter.clean_page(text) if chunk_filter else text, metadata={
+            "source": pdf_path, "file_path": pdf_path, "page": i, "total_pages": total_pages,
+            "section": section_map.section_for(i) if section_map else OTHER
+        })
+        for i, text in pages
+    ]
+
+
+def ingest_pdf(pdf_path, vector_store, progress=None, workers=None, batch_size=EMBED_BATCH_SIZE, section_map=None,
+               lexical=None, chunk_filter=None, page_log=None):
+    """
+    Parse -> split -> embed as overlapping stages.
+
+    Page ranges are parsed in a process pool; every range is split as soon as it
+    arrives and its chunks are embedded and upserted in fixed-size batches on a
+    background thread while later pages are still being parsed.
+
+    progress(pages_done, total_pages, chunks_indexed) is always called from the
+    calling thread, so it is safe to drive Streamlit widgets with it.
+    With a section_map every chunk is tagged with its RHP section; with a
+    LexicalIndexBuilder every embedded chunk is also added to it. With an
+    IngestFilter, page boilerplate is stripped and duplicate chunks are skipped.
+    A page_log dict is filled with {page: {"hash", "chunks"}} for incremental re-indexing.
+    Returns (pages, chunks).
+    """
+    with pymupdf.open(pdf_path) as doc:
+        total_pages = doc.page_count
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    workers = workers or os.cpu_count() or 1
+    ranges = [(s, min(s + PAGES_PER_TASK, total_pages)) for s in range(0, total_pages, PAGES_PER_TASK)]
+
+    pages_done = 0
+    chunks_done = 0
+    buffer = []
+    pending_embeds = set()
+    trace = current()  # embed time is summed onto the caller's span
+
+    def report():
+        if progress:
+            progress(pages_done, total_pages, chunks_done)
+
+    def settle(max_in_flight):
+        # Collect finished embed batches, blocking only while more than max_in_flight are running
+        nonlocal chunks_done, pending_embeds
+        done = {f for f in pending_embeds if f.done()}
+        while len(pending_embeds) - len(done) > max_in_flight:
+            finished, _ = wait(pending_embeds - done, return_when=FIRST_COMPLETED)
+            done |= finished
+        for f in done:
+            chunks_done += f.result()
+        pending_embeds -= done
+
+    def embed(batch):
+        # Deterministic ids make the upsert idempotent if ingestion is retried
+        ids = [f"p{d.metadata['page']}-c{d.metadata['chunk']}" for d in batch]
+        start = time.perf_counter()
+        vector_store.add_documents(batch, ids=ids)
+        trace.add("embed_s", time.perf_counter() - start)
+        trace.add("embed_batches")
+        return len(batch)
+
+    with ProcessPoolExecutor(max_workers=min(workers, max(1, len(ranges)))) as parsers, \
+            ThreadPoolExecutor(max_workers=1) as embedder:
+        parse_jobs = {parsers.submit(_extract_pages, pdf_path, s, e) for s, e in ranges}
+
+        while parse_jobs:
+            done, parse_jobs = wait(parse_jobs, return_when=FIRST_COMPLETED)
+            for f in done:
+                pages = f.result()
+                for page_doc in _page_documents(pdf_path, pages, total_pages, section_map, chunk_filter):
+                    if page_log is not None:
+                        page_log[page_doc.metadata["page"]] = {"hash": page_hash(page_doc.page_content), "chunks": []}
+                    for n, chunk in enumerate(splitter.split_documents([page_doc])):
+                        chunk.metadata["chunk"] = n
+                        if chunk_filter is None or chunk_filter.keep(chunk):
+                            buffer.append(chunk)
+                            if page_log is not None:
+                                page_log[page_doc.metadata["page"]]["chunks"].append(n)
+                pages_done += len(pages)
+
+                while len(buffer) >= batch_size:
+                    batch, buffer = buffer[:batch_size], buffer[batch_size:]
+                    if lexical is not None:
+                        lexical.add(batch)
+                    settle(MAX_PENDING_BATCHES - 1)
+                    pending_embeds.add(embedder.submit(embed, batch))
+            settle(MAX_PENDING_BATCHES)
+            report()
+
+        if buffer:
+            if lexical is not None:
+                lexical.add(buffer)
+            pending_embeds.add(embedder.submit(embed, buffer))
+        settle(0)
+        report()
+
+    return total_pages, chunks_done
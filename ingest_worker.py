@@ -0,0 +1,253 @@
+"""
+Headless pre-ingestion worker: keeps an RHP index ready for every active IPO.
+
+    python ingest_worker.py            # poll the listing forever
+    python ingest_worker.py --once     # one pass, then exit when the queue is drained
+
+Job state is persisted to ingest_jobs.json next to the indexes, so the Streamlit app
+(a different process) can attach to a ready index or show a running job's progress.
+"""
+import os
+import json
+import time
+import queue
+import hashlib
+import logging
+import argparse
+import threading
+
+from index_store import INDEX_ROOT
+
+JOBS_PATH = os.path.join(INDEX_ROOT, "ingest_jobs.json")
+POLL_INTERVAL = int(os.getenv("INGEST_POLL_INTERVAL", "600"))  # seconds between listing polls
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))  # each ingest already uses a process pool
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+RETRY_AFTER = int(os.getenv("INGEST_RETRY_AFTER", "1800"))  # seconds before a failed job is retried
+DRHP_RECHECK_INTERVAL = int(os.getenv("DRHP_RECHECK_INTERVAL", "21600"))  # a draft-only job is re-run this often
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TIMEOUT = 60  # a worker silent for longer is considered dead
+
+QUEUED, DOWNLOADING, INDEXING, READY, FAILED, NO_RHP = "queued", "downloading", "indexing", "ready", "failed", "no_rhp"
+RUNNING = (QUEUED, DOWNLOADING, INDEXING)
+
+log = logging.getLogger("ingest_worker")
+
+# Listing fields that identify one version of an IPO's documents (GMP moves every hour)
+_FINGERPRINT_FIELDS = ("id", "slug", "Price Band", "Open Date", "Close Date", "Issue Size")
+
+
+def fingerprint(details):
+    data = json.dumps([details.get(f) for f in _FINGERPRINT_FIELDS], default=str)
+    return hashlib.sha1(data.encode()).hexdigest()[:16]
+
+
+# --- JOB STATE ---
+class JobBook:
+    """
+    Job state per IPO name, persisted as one JSON file.
+    Only the worker writes it; the app reads it with read_jobs().
+    """
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = read_jobs(path)
+        self._dirty_at = 0.0
+
+    def get(self, name):
+        with self._lock:
+            return dict(self._data["jobs"].get(name, {}))
+
+    def update(self, name, flush=True, **fields):
+        with self._lock:
+            job = self._data["jobs"].setdefault(name, {})
+            job.update(fields)
+            job["updated"] = time.time()
+            if flush or time.time() - self._dirty_at > 1.0:
+                self._save()
+
+    def heartbeat(self):
+        with self._lock:
+            self._data["worker"] = {"pid": os.getpid(), "heartbeat": time.time()}
+            self._save()
+
+    def recover(self):
+        """Jobs left running by a crashed worker go back to the queue."""
+        with self._lock:
+            for job in self._data["jobs"].values():
+                if job.get("status") in RUNNING:
+                    job["status"] = QUEUED
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(tmp, self.path)
+        self._dirty_at = time.time()
+
+
+def read_jobs(path=JOBS_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data.setdefault("jobs", {})
+        return data
+    except (OSError, ValueError):
+        return {"jobs": {}, "worker": {}}
+
+
+def worker_alive(data):
+    beat = (data.get("worker") or {}).get("heartbeat", 0)
+    return time.time() - beat < HEARTBEAT_TIMEOUT
+
+
+def job_status(ipo_name, path=JOBS_PATH):
+    """
+    The job for one IPO as seen from another process, or None.
+    Running jobs of a dead worker are reported as None so the caller builds inline.
+    """
+    data = read_jobs(path)
+    job = data["jobs"].get(ipo_name)
+    if not job:
+        return None
+    if job.get("status") in RUNNING and not worker_alive(data):
+        return None
+    return job
+
+
+# --- WORKER ---
+class PreIngestWorker:
+    """
+    Polls the listing, queues new or changed active IPOs into a bounded queue and
+    downloads + indexes them into the persistent index store.
+    """
+
+    def __init__(self, workers=INGEST_WORKERS, queue_size=INGEST_QUEUE_SIZE, jobs_path=JOBS_PATH):
+        self.jobs = JobBook(jobs_path)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.workers = max(1, workers)
+        self._stop = threading.Event()
+        self._queued = set()
+        self._queued_lock = threading.Lock()
+
+    def _needs_work(self, name, details):
+        job = self.jobs.get(name)
+        if not job:
+            return True
+        if job.get("fingerprint") != fingerprint(details):
+            return True  # listing changed (price band, dates, new document)
+        if job.get("status") in (FAILED, NO_RHP):
+            return time.time() - job.get("updated", 0) > RETRY_AFTER
+        if job.get("status") == READY:
+            from index_store import get_index_store
+            if job.get("document") != "rhp" and time.time() - job.get("finished", 0) > DRHP_RECHECK_INTERVAL:
+                return True  # indexed from the draft: see whether the final RHP is out
+            return not get_index_store().is_ready(job.get("index_key", ""))  # evicted since
+        return job.get("status") == QUEUED  # recovered after a crash
+
+    def poll(self):
+        """One listing pass. Returns the number of IPOs queued."""
+        from tools_library import get_all_ipo_names, fetch_ipo_details_batch
+
+        names = [n for group in get_all_ipo_names().values() for n in group]
+        queued = 0
+        for name, details in zip(names, fetch_ipo_details_batch(names) if names else []):
+            if "id" not in details or "listed" in str(details.get("Status", "")).lower():
+                continue
+            with self._queued_lock:
+                if name in self._queued or not self._needs_work(name, details):
+                    continue
+                try:
+                    self.queue.put_nowait((name, details))
+                except queue.Full:
+                    break  # the rest is picked up on the next poll
+                self._queued.add(name)
+            self.jobs.update(name, status=QUEUED, fingerprint=fingerprint(details), ipo_id=details["id"])
+            queued += 1
+        return queued
+
+    def _run_job(self, name, details):
+        from tools_library import download_pdf_logic, build_vs_logic, pdf_version
+        from vector_registry import close_store
+
+        self.jobs.update(name, status=DOWNLOADING, error=None, started=time.time())
+        pdf = download_pdf_logic(details)
+        if not pdf:
+            self.jobs.update(name, status=NO_RHP)
+            return
+
+        self.jobs.update(name, status=INDEXING, pdf=os.path.abspath(pdf), pages_done=0, total_pages=0, chunks=0,
+                         document=pdf_version(details["id"]).get("kind"))
+
+        def report(pages_done, total_pages, chunks):
+            # Throttled: at most one file write per second
+            self.jobs.update(name, flush=False, pages_done=pages_done, total_pages=total_pages, chunks=chunks)
+
+        vs = build_vs_logic(pdf, progress=report)
+        self.jobs.update(name, status=READY, index_key=vs.doc_key, finished=time.time())
+        # Only the files are needed: don't keep every index ever built loaded in this long-lived process
+        close_store(vs)
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                name, details = self.queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self._run_job(name, details)
+            except Exception as e:
+                log.warning("ingest of %s failed: %s", name, e)
+                self.jobs.update(name, status=FAILED, error=str(e))
+            finally:
+                with self._queued_lock:
+                    self._queued.discard(name)
+                self.queue.task_done()
+
+    def _beat(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            self.jobs.heartbeat()
+
+    def run(self, poll_interval=POLL_INTERVAL, once=False):
+        self.jobs.recover()
+        self.jobs.heartbeat()
+        threads = [threading.Thread(target=self._beat, daemon=True)]
+        threads += [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        try:
+            while True:
+                try:
+                    log.info("queued %d IPO(s)", self.poll())
+                except Exception as e:
+                    log.warning("poll failed: %s", e)
+                if once:
+                    self.queue.join()
+                    break
+                if self._stop.wait(poll_interval):
+                    break
+        finally:
+            self._stop.set()
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-ingest the RHPs of all active IPOs.")
+    parser.add_argument("--once", action="store_true", help="single pass, exit when done")
+    parser.add_argument("--interval", type=int, default=POLL_INTERVAL, help="seconds between listing polls")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="concurrent ingest jobs")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s %(message)s")
+    logging.getLogger("chromadb").setLevel(logging.ERROR)
+    PreIngestWorker(workers=args.workers).run(poll_interval=args.interval, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
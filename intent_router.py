@@ -0,0 +1,154 @@
+"""
+Local intent router in front of the brain's planner LLM.
+
+Short, factual single-intent questions ("what is the GMP?", "listing date?", "what
+are the risks?") are mapped straight to a plan: first by keyword rules, then by nearest
+neighbours among labelled example queries embedded with the already-loaded MiniLM model.
+Anything else (long or open-ended questions, opinions and comparisons, several intents,
+weak or close matches) returns None, and the caller falls back to the LLM planner.
+"""
+import os
+import re
+import threading
+import numpy as np
+
+from vector_registry import get_embeddings
+from tracing import count, current
+
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "1") != "0"
+MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.72"))  # cosine of the nearest example
+MIN_MARGIN = float(os.getenv("ROUTER_MIN_MARGIN", "0.08"))  # over the best example of another intent
+MAX_WORDS = int(os.getenv("ROUTER_MAX_WORDS", "12"))  # longer questions always go to the planner
+
+# Advice, judgement and comparison wording: a keyword in such a question ("should I subscribe?",
+# "GMP vs fundamentals") names a topic, not the one lookup that answers it
+_OPEN_ENDED = re.compile(r"\b(should|would|could|worth|compared?|comparison|comparing|versus|vs\.?|relative|against|"
+                         r"better|worse|good|bad|recommend\w*|subscribe|apply|buy|sell|avoid|"
+                         r"over-?priced|under-?priced|over-?valued|under-?valued|fair(ly)?|expensive|cheap|"
+                         r"valuation|why|opinion|verdict|analy[sz]e|evaluate|pros|cons)\b", re.IGNORECASE)
+
+# Keyword rules: a short factual query that matches exactly one intent is routed without embedding it
+_RULES = {
+    "gmp": re.compile(r"\b(gmp|grey market|premium|price band|lot size|listing (date|day|gain|price)|"
+                      r"open(s|ing)? date|clos(e|es|ing) date|allotment|subscri\w+|issue (date|size))\b",
+                      re.IGNORECASE),
+    "sentiment": re.compile(r"\b(sentiment|hype|buzz|mood|reddit|news|what are people saying|investors? think)\b",
+                            re.IGNORECASE),
+    "rhp": re.compile(r"\b(rhp|drhp|prospectus|risks?|risk factors|promoters?|objects? of the (issue|offer)|"
+                      r"revenue|profit|ebitda|margins?|debt|borrowings|litigation|peers?|financials?|"
+                      r"shareholding|business model|customers|competitors|use of proceeds|ofs|offer for sale)\b",
+                      re.IGNORECASE),
+}
+
+# Labelled examples for the nearest-neighbour stage
+EXAMPLES = {
+    "gmp": [
+        "what is the gmp", "gmp today", "current grey market premium", "what is the price band",
+        "listing date?", "when does the ipo open", "when does it close", "when is the allotment",
+        "what is the lot size", "how much is the issue size", "is the ipo open now", "what is the status of the ipo",
+        "expected listing gain", "how much is it subscribed", "what are the important dates",
+    ],
+    "sentiment": [
+        "what is the market sentiment", "is there hype around this ipo", "what are people saying about it",
+        "what does reddit think", "any news about this company", "what is the buzz", "how is the market mood",
+        "are investors excited about it", "latest news on this ipo",
+    ],
+    "rhp": [
+        "what are the key risks", "summarise the risk factors", "who are the promoters",
+        "what are the objects of the issue", "how will the money raised be used", "what is the revenue trend",
+        "how profitable is the company", "what is the debt level", "are there any pending litigations",
+        "who are the listed peers", "what does the company do", "explain the business model",
+        "what is the promoter shareholding after the issue", "who are the major customers",
+        "what are the financials for the last three years", "how much is offer for sale",
+    ],
+}
+
+_SENTIMENT_SOURCE = re.compile(r"\b(reddit|news)\b", re.IGNORECASE)
+
+
+def _steps(intent, query):
+    # Same arguments the planner is told to use (rhp_tool gets the question verbatim)
+    if intent == "gmp":
+        return [("gmp_tool", "details")]
+    if intent == "sentiment":
+        sources = {m.lower() for m in _SENTIMENT_SOURCE.findall(query)}
+        return [("sentiment_tool", sources.pop() if len(sources) == 1 else "all")]
+    return [("rhp_tool", query)]
+
+
+class IntentRouter:
+    def __init__(self, examples=EXAMPLES, min_similarity=MIN_SIMILARITY, min_margin=MIN_MARGIN, max_words=MAX_WORDS):
+        self.examples = examples
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        self.max_words = max_words
+        self._matrix = None
+        self._labels = None
+        self._lock = threading.Lock()
+        self.stats = {"rule": 0, "knn": 0, "fallback": 0}
+
+    def _index(self):
+        # Examples are embedded once, on first use, with the shared MiniLM model
+        with self._lock:
+            if self._matrix is None:
+                labels, texts = [], []
+                for intent, queries in self.examples.items():
+                    labels += [intent] * len(queries)
+                    texts += queries
+                matrix = np.asarray(get_embeddings().embed_documents(texts), dtype=np.float32)
+                self._matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+                self._labels = np.array(labels)
+            return self._matrix, self._labels
+
+    def classify(self, query):
+        """(intent, source, score) or (None, "fallback", score)."""
+        if len(query.split()) > self.max_words or _OPEN_ENDED.search(query):
+            return None, "fallback", 0.0  # the planner decides which facts an opinion needs
+
+        matched = [intent for intent, rule in _RULES.items() if rule.search(query)]
+        if len(matched) == 1:
+            return matched[0], "rule", 1.0
+        if len(matched) > 1:
+            return None, "fallback", 0.0  # a multi-part question needs the planner
+
+        matrix, labels = self._index()
+        q = np.asarray(get_embeddings().embed_query(query), dtype=np.float32)
+        sims = matrix @ (q / max(np.linalg.norm(q), 1e-12))
+        best = {intent: float(sims[labels == intent].max()) for intent in self.examples}
+        ranked = sorted(best.items(), key=lambda kv: -kv[1])
+        (intent, top), runner_up = ranked[0], (ranked[1][1] if len(ranked) > 1 else -1.0)
+        if top >= self.min_similarity and top - runner_up >= self.min_margin:
+            return intent, "knn", top
+        return None, "fallback", top
+
+    def route(self, query):
+        """Plan steps [(tool_name, arguments)] for a confident single-intent query, else None."""
+        intent, source, score = self.classify(query)
+        with self._lock:
+            self.stats[source] += 1
+        count("ipo_router_decisions_total", route=source)
+        current().set(route=source, intent=intent, route_score=round(score, 3))
+        return _steps(intent, query) if intent else None
+
+    def hit_rate(self):
+        with self._lock:
+            total = sum(self.stats.values())
+            hits = self.stats["rule"] + self.stats["knn"]
+            return {**self.stats, "total": total, "hit_rate": round(hits / total, 3) if total else 0.0}
+
+
+_ROUTER = IntentRouter()
+
+
+def route(query):
+    """Module-level router shared by every session; None when disabled or unsure."""
+    if not ROUTER_ENABLED:
+        return None
+    try:
+        return _ROUTER.route(query)
+    except Exception:
+        return None  # routing is only a shortcut: the planner can always take over
+
+
+def router_stats():
+    return _ROUTER.hit_rate()
@@ -0,0 +1,162 @@
+import os
+import time
+import threading
+import numpy as np
+from bs4 import BeautifulSoup
+from rapidfuzz import process, fuzz, utils
+from http_client import SESSION
+from tracing import span, cache_event
+
+BASE_URL = os.getenv("IPOPREMIUM_BASE_URL", "https://www.ipopremium.in").rstrip("/")
+ASSETS_URL = os.getenv("IPOPREMIUM_ASSETS_URL", "https://assets.ipopremium.in").rstrip("/")
+LISTING_URL = f"{BASE_URL}/ipo"
+LISTING_TTL = int(os.getenv("IPO_LISTING_TTL", "300"))  # seconds
+MATCH_THRESHOLD = 80
+AMBIGUITY_MARGIN = 3  # runner-up within this many points of the best match => ambiguous
+
+
+def clean_name(raw):
+    return BeautifulSoup(raw or "", "html.parser").get_text(" ", strip=True)
+
+
+class Listing:
+    """
+    One parsed copy of the ipopremium listing.
+    names keeps the site's order; by_name maps clean name -> raw row (first row wins).
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.names = []
+        self.by_name = {}
+        for row in rows:
+            name = clean_name(row.get("name", ""))
+            row["clean_name"] = name
+            if name not in self.by_name:
+                self.by_name[name] = row
+                self.names.append(name)
+        self._resolver = None
+        self._resolver_lock = threading.Lock()
+
+    @property
+    def resolver(self):
+        with self._resolver_lock:
+            if self._resolver is None:
+                self._resolver = NameResolver(self)
+            return self._resolver
+
+
+class Resolution:
+    def __init__(self, query, name=None, ipo_id=None, score=0.0, ambiguous=False, runner_up=None):
+        self.query = query
+        self.name = name          # None when nothing cleared the threshold
+        self.id = ipo_id
+        self.score = score
+        self.ambiguous = ambiguous
+        self.runner_up = runner_up
+
+    def __repr__(self):
+        return f"Resolution({self.query!r} -> {self.name!r}, score={self.score:.1f}, ambiguous={self.ambiguous})"
+
+
+class NameResolver:
+    """
+    Fuzzy-matches many queries against the listing in one rapidfuzz cdist call.
+    Choice strings are preprocessed once when the resolver is built.
+    """
+
+    def __init__(self, listing):
+        self.listing = listing
+        self.names = listing.names
+        self._choices = [utils.default_process(n) for n in self.names]
+
+    def resolve(self, queries, threshold=MATCH_THRESHOLD, margin=AMBIGUITY_MARGIN, workers=-1):
+        queries = list(queries)
+        if not queries or not self.names:
+            return [Resolution(q) for q in queries]
+
+        processed = [utils.default_process(q) for q in queries]
+        scores = process.cdist(processed, self._choices, scorer=fuzz.QRatio, workers=workers)
+
+        best = scores.argmax(axis=1)
+        results = []
+        for row, (query, col) in enumerate(zip(queries, best)):
+            score = float(scores[row, col])
+            if score <= threshold:
+                results.append(Resolution(query, score=score))
+                continue
+
+            runner_up = None
+            if scores.shape[1] > 1:
+                others = scores[row].copy()
+                others[col] = -1
+                second = int(np.argmax(others))
+                if score - float(others[second]) < margin:
+                    runner_up = self.names[second]
+
+            name = self.names[col]
+            results.append(Resolution(query, name, self.listing.by_name[name].get("id"), score,
+                                      ambiguous=runner_up is not None, runner_up=runner_up))
+        return results
+
+
+class ListingSnapshot:
+    """
+    Serves the IPO listing from memory and refreshes it at most once per TTL.
+    Refreshes are conditional (ETag / Last-Modified), so an unchanged listing
+    costs a 304 and no re-parsing. If a refresh fails the stale copy is served.
+    """
+
+    def __init__(self, url=LISTING_URL, ttl=LISTING_TTL):
+        self.url = url
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._listing = None
+        self._fetched_at = 0.0
+        self._etag = None
+        self._last_modified = None
+
+    def get(self):
+        with self._lock:
+            if self._listing is not None and time.time() - self._fetched_at < self.ttl:
+                cache_event("listing", "hit")
+            else:
+                try:
+                    with span("listing.refresh"):
+                        self._refresh()
+                except Exception:
+                    if self._listing is None:
+                        raise
+                    # Keep the stale copy, but don't hammer the site on every call
+                    self._fetched_at = time.time()
+            return self._listing
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = 0.0
+
+    def _refresh(self):
+        headers = {}
+        if self._listing is not None:
+            if self._etag: headers["If-None-Match"] = self._etag
+            if self._last_modified: headers["If-Modified-Since"] = self._last_modified
+
+        r = SESSION.get(self.url, headers=headers, timeout=10)
+        if r.status_code == 304 and self._listing is not None:
+            cache_event("listing", "not_modified")
+            self._fetched_at = time.time()
+            return
+        r.raise_for_status()
+
+        cache_event("listing", "refresh")
+        self._listing = Listing(r.json().get("data", []))
+        self._etag = r.headers.get("ETag")
+        self._last_modified = r.headers.get("Last-Modified")
+        self._fetched_at = time.time()
+
+
+_SNAPSHOT = ListingSnapshot()
+
+
+def get_listing():
+    return _SNAPSHOT.get()
@@ -0,0 +1,217 @@
+import os
+import re
+import numpy as np
+from typing import Any, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+LEXICAL_FILE = "lexical_index.npz"
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Reciprocal rank fusion: score = sum(weight / (RRF_K + rank)) over both result lists
+RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))  # candidates taken from each retriever before fusion
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with "
+    "what who how when where does did do our we you your".split()
+)
+
+
+def tokenize(text):
+    """Lower-cased alphanumeric terms without stopwords (chunks and queries go through the same path)."""
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+def chunk_id(metadata):
+    return f"p{metadata.get('page', 0)}-c{metadata.get('chunk', 0)}"
+
+
+class LexicalIndexBuilder:
+    """Collects chunks during ingestion; build() turns them into an inverted index."""
+
+    def __init__(self):
+        self._docs = []
+
+    def add(self, documents):
+        for d in documents:
+            self._docs.append((chunk_id(d.metadata), d.page_content, d.metadata.get("page", 0),
+                               d.metadata.get("section", "")))
+
+    def build(self):
+        vocab = {}
+        postings = {}  # term id -> {doc: tf}
+        lengths = np.zeros(len(self._docs), dtype=np.float32)
+        for n, (_, text, _, _) in enumerate(self._docs):
+            terms = tokenize(text)
+            lengths[n] = len(terms)
+            for t in terms:
+                tid = vocab.setdefault(t, len(vocab))
+                row = postings.setdefault(tid, {})
+                row[n] = row.get(n, 0) + 1
+
+        # CSR layout: postings of term i live in [offsets[i], offsets[i + 1])
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        docs, tfs = [], []
+        for tid in range(len(vocab)):
+            row = postings[tid]
+            docs.extend(row.keys())
+            tfs.extend(row.values())
+            offsets[tid + 1] = len(docs)
+
+        return LexicalIndex(
+            terms=np.array(sorted(vocab, key=vocab.get), dtype=str),
+            offsets=offsets,
+            post_docs=np.array(docs, dtype=np.int32),
+            post_tfs=np.array(tfs, dtype=np.float32),
+            lengths=lengths,
+            ids=np.array([d[0] for d in self._docs], dtype=str),
+            texts=np.array([d[1] for d in self._docs], dtype=str),
+            pages=np.array([d[2] for d in self._docs], dtype=np.int32),
+            sections=np.array([d[3] for d in self._docs], dtype=str),
+        )
+
+
+class LexicalIndex:
+    """
+    BM25 over the chunks of one RHP. Stored next to the vectors as a compressed .npz
+    (plain arrays, no pickling), and keeps the chunk texts so hits need no vector-store round trip.
+    """
+
+    def __init__(self, terms, offsets, post_docs, post_tfs, lengths, ids, texts, pages, sections):
+        self.terms = terms
+        self.vocab = {t: i for i, t in enumerate(terms.tolist())}
+        self.offsets = offsets
+        self.post_docs = post_docs
+        self.post_tfs = post_tfs
+        self.lengths = lengths
+        self.ids = ids
+        self.texts = texts
+        self.pages = pages
+        self.sections = sections
+        n = max(len(ids), 1)
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        self.avg_len = float(lengths.mean()) if len(lengths) else 1.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def save(self, path):
+        np.savez_compressed(path, terms=self.terms, offsets=self.offsets, post_docs=self.post_docs,
+                            post_tfs=self.post_tfs, lengths=self.lengths, ids=self.ids, texts=self.texts,
+                            pages=self.pages, sections=self.sections)
+
+    def search(self, query, k=FETCH_K, sections=None):
+        """Top-k (row, score) pairs, optionally restricted to chunks of the given sections."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths / max(self.avg_len, 1e-9))
+        for term in set(tokenize(query)):
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            lo, hi = self.offsets[tid], self.offsets[tid + 1]
+            docs, tf = self.post_docs[lo:hi], self.post_tfs[lo:hi]
+            scores[docs] += self.idf[tid] * tf * (BM25_K1 + 1) / (tf + norm[docs])
+        if sections:
+            scores[~np.isin(self.sections, list(sections))] = 0
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def document(self, row):
+        return Document(page_content=str(self.texts[row]), metadata={
+            "page": int(self.pages[row]), "section": str(self.sections[row]), "chunk_id": str(self.ids[row])})
+
+
+def load_lexical_index(path):
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            return LexicalIndex(**{name: z[name] for name in z.files})
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+# --- FUSION ---
+def doc_key(document):
+    """
+    Chunk id of a retrieved document. Lexical-only hits carry it as metadata["chunk_id"]
+    (they have no "chunk" number); vector hits get it from page and chunk.
+    """
+    if document.metadata.get("chunk_id"):
+        return document.metadata["chunk_id"]
+    return chunk_id(document.metadata) if "page" in document.metadata else document.page_content
+
+
+def merge_rankings(ranked_lists, limit):
+    """
+    Round-robin over several rankings of documents so every list keeps its best hits,
+    skipping chunks already taken. Returns at most limit documents.
+    """
+    seen, merged = set(), []
+    for rank in range(max((len(docs) for docs in ranked_lists), default=0)):
+        for docs in ranked_lists:
+            if rank < len(docs) and len(merged) < limit:
+                key = doc_key(docs[rank])
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(docs[rank])
+    return merged
+
+
+def rrf_fuse(ranked_lists, weights, rrf_k=RRF_K):
+    """Reciprocal rank fusion of several ranked key lists. Returns keys, best first."""
+    scores = {}
+    for keys, weight in zip(ranked_lists, weights):
+        for rank, key in enumerate(keys):
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank + 1)
+    return sorted(scores, key=lambda key: -scores[key])
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Vector search + BM25 over the same chunks, fused with weighted reciprocal rank
+    fusion. Exact terms (EPS, RoNW, 'Offer for Sale', promoter names) that MiniLM
+    misses are caught lexically, so a smaller k still lands the right chunk.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: Any
+    lexical: Any
+    k: int = 4
+    fetch_k: int = FETCH_K
+    vector_weight: float = VECTOR_WEIGHT
+    lexical_weight: float = LEXICAL_WEIGHT
+    rrf_k: int = RRF_K
+    where: Optional[dict] = None            # Chroma metadata filter for the vector side
+    sections: Optional[Tuple[str, ...]] = None  # the same restriction for the lexical side
+
+    def _get_relevant_documents(self, query, *, run_manager=None) -> List[Document]:
+        kwargs = {"filter": self.where} if self.where else {}
+        vector_docs = self.vector_store.similarity_search(query, k=self.fetch_k, **kwargs)
+        lexical_hits = self.lexical.search(query, k=self.fetch_k, sections=self.sections)
+
+        by_key = {}
+        vector_keys = []
+        for d in vector_docs:
+            key = chunk_id(d.metadata)
+            by_key.setdefault(key, d)
+            vector_keys.append(key)
+        lexical_keys = []
+        for row, _ in lexical_hits:
+            key = str(self.lexical.ids[row])
+            by_key.setdefault(key, None)
+            lexical_keys.append((key, row))
+
+        rows = dict(lexical_keys)
+        fused = rrf_fuse([vector_keys, [key for key, _ in lexical_keys]],
+                         [self.vector_weight, self.lexical_weight], self.rrf_k)
+        return [by_key[key] or self.lexical.document(rows[key]) for key in fused[:self.k]]
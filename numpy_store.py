@@ -0,0 +1,239 @@
+import os
+import json
+import uuid
+import threading
+import numpy as np
+from typing import Any, Iterable, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+VECTORS_FILE = "vectors.npy"
+SCALES_FILE = "scales.npy"    # per-row dequantization scales (int8 only)
+CHUNKS_FILE = "chunks.jsonl"  # one {"id", "text", "metadata"} per row, same order as the vectors
+SEARCH_BLOCK = 8192           # rows converted to float32 per matmul block
+DTYPES = ("float16", "int8")
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors, dtype):
+    """Normalized float32 rows -> (stored rows, per-row scales or None)."""
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def _matches(metadata, where):
+    # The subset of Chroma's filter syntax the app uses: {"key": value} and {"key": {"$in": [...]}}
+    for key, cond in where.items():
+        value = metadata.get(key)
+        if isinstance(cond, dict):
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$eq" in cond and value != cond["$eq"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact cosine search over one document's chunks.
+
+    Normalized embeddings are stored as float16 or int8 (with per-row scales) in a .npy
+    file that is memory-mapped on open, so opening is near-instant and processes serving
+    the same RHP share its pages through the OS cache. A few thousand rows make brute-force
+    block matmuls faster than HNSW, with no recall loss.
+
+    Writes (add_texts) are buffered in memory until save().
+    """
+
+    def __init__(self, embedding, path, dtype="float16"):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}")
+        self._embedding = embedding
+        self.path = path
+        self.dtype = dtype
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((0, 0), dtype=dtype)
+        self._scales = None
+        self._ids, self._texts, self._metadatas = [], [], []
+        self._pending = []  # float32 batches not yet saved
+
+    # --- PERSISTENCE ---
+    @classmethod
+    def load(cls, embedding, path):
+        """Opens a saved store; the vectors are memory-mapped read-only."""
+        store = cls.__new__(cls)
+        store._embedding = embedding
+        store.path = path
+        store._lock = threading.Lock()
+        store._pending = []
+        store._vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        store.dtype = str(store._vectors.dtype)
+        scales = os.path.join(path, SCALES_FILE)
+        store._scales = np.load(scales, mmap_mode="r") if os.path.exists(scales) else None
+        store._ids, store._texts, store._metadatas = [], [], []
+        with open(os.path.join(path, CHUNKS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                store._ids.append(row["id"])
+                store._texts.append(row["text"])
+                store._metadatas.append(row["metadata"])
+        return store
+
+    def save(self):
+        """Writes buffered rows (vectors + chunk file) and re-opens the vectors memory-mapped."""
+        with self._lock:
+            matrix = self._all_rows()
+            stored, scales = quantize(matrix, self.dtype)
+            os.makedirs(self.path, exist_ok=True)
+
+            vectors_path = os.path.join(self.path, VECTORS_FILE)
+            out = np.lib.format.open_memmap(vectors_path + ".tmp", mode="w+", dtype=stored.dtype, shape=stored.shape)
+            out[:] = stored
+            out.flush()
+            del out
+            os.replace(vectors_path + ".tmp", vectors_path)
+            if scales is not None:
+                np.save(os.path.join(self.path, SCALES_FILE), scales)
+
+            chunks_path = os.path.join(self.path, CHUNKS_FILE)
+            with open(chunks_path + ".tmp", "w", encoding="utf-8") as f:
+                for row_id, text, meta in zip(self._ids, self._texts, self._metadatas):
+                    f.write(json.dumps({"id": row_id, "text": text, "metadata": meta}, ensure_ascii=False) + "\n")
+            os.replace(chunks_path + ".tmp", chunks_path)
+
+            self._pending = []
+            self._vectors = np.load(vectors_path, mmap_mode="r")
+            scales_path = os.path.join(self.path, SCALES_FILE)
+            self._scales = np.load(scales_path, mmap_mode="r") if scales is not None else None
+
+    def _dequantized(self):
+        matrix = np.asarray(self._vectors, dtype=np.float32)
+        return matrix * self._scales[:, None] if self._scales is not None else matrix
+
+    @property
+    def mem_bytes(self):
+        """Rough resident size: mapped vectors plus chunk texts held in memory."""
+        return int(self._vectors.nbytes + sum(len(t) for t in self._texts) * 2 + 200 * len(self._texts))
+
+    def __len__(self):
+        return len(self._ids)
+
+    # --- VectorStore interface ---
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        vectors = _normalize(self._embedding.embed_documents(texts))
+        with self._lock:
+            self._pending.append(vectors)
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metadatas.extend(dict(m) for m in metadatas)
+        return ids
+
+    def add_embeddings(self, texts, embeddings, metadatas, ids):
+        """Adds rows whose vectors are already known (e.g. carried over from another index)."""
+        with self._lock:
+            self._pending.append(_normalize(embeddings))
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metadatas.extend(dict(m) for m in metadatas)
+        return list(ids)
+
+    def get_records(self, ids):
+        """(float32 vectors, texts, metadatas) of the given ids, in that order."""
+        row = {row_id: i for i, row_id in enumerate(self._ids)}
+        rows = [row[i] for i in ids]
+        with self._lock:
+            matrix = self._all_rows()
+        return matrix[rows], [self._texts[i] for i in rows], [dict(self._metadatas[i]) for i in rows]
+
+    def delete(self, ids=None, **kwargs):
+        """Removes rows by id; like add_texts, the change is written by save()."""
+        drop = set(ids or ())
+        with self._lock:
+            keep = np.array([row_id not in drop for row_id in self._ids], dtype=bool)
+            matrix = self._all_rows()[keep] if len(keep) else np.zeros((0, 0), dtype=np.float32)
+            self._vectors = np.zeros((0, 0), dtype=self.dtype)
+            self._scales = None
+            self._pending = [matrix] if len(matrix) else []
+            self._ids = [r for r, k in zip(self._ids, keep) if k]
+            self._texts = [t for t, k in zip(self._texts, keep) if k]
+            self._metadatas = [m for m, k in zip(self._metadatas, keep) if k]
+        return True
+
+    def _all_rows(self):
+        parts = ([self._dequantized()] if len(self._vectors) else []) + self._pending
+        return np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, path=None, dtype="float16", **kwargs):
+        store = cls(embedding, path=path, dtype=dtype)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        if path:
+            store.save()
+        return store
+
+    def _scores(self, queries):
+        """(n_queries, n_rows) cosine scores, computed block by block in float32."""
+        n = len(self._vectors)
+        scores = np.empty((len(queries), n), dtype=np.float32)
+        for lo in range(0, n, SEARCH_BLOCK):
+            block = np.asarray(self._vectors[lo:lo + SEARCH_BLOCK], dtype=np.float32)
+            part = queries @ block.T
+            if self._scales is not None:
+                part *= self._scales[lo:lo + SEARCH_BLOCK]
+            scores[:, lo:lo + SEARCH_BLOCK] = part
+        return scores
+
+    def _top_k(self, scores, k, where):
+        if where:
+            mask = np.array([_matches(m, where) for m in self._metadatas], dtype=bool)
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(Document(id=self._ids[i], page_content=self._texts[i], metadata=dict(self._metadatas[i])),
+                 float(scores[i])) for i in top]
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None) -> List[Tuple[Document, float]]:
+        if self._pending:
+            raise RuntimeError("NumpyVectorStore has unsaved rows; call save() first")
+        query = _normalize(np.asarray(embedding, dtype=np.float32)[None, :])
+        return self._top_k(self._scores(query)[0], k, filter)
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score_by_vector(embedding, k, filter)]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs) -> List[Document]:
+        return [d for d, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1) / 2  # cosine -> [0, 1]
+
+    def batch_similarity_search(self, queries, k=4, filter=None) -> List[List[Document]]:
+        """Several queries in one embedding call and one matmul per block."""
+        if not queries:
+            return []
+        matrix = _normalize(self._embedding.embed_documents(list(queries)))
+        scores = self._scores(matrix)
+        return [[d for d, _ in self._top_k(row, k, filter)] for row in scores]
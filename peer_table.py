@@ -0,0 +1,189 @@
+import re
+import numpy as np
+import pandas as pd
+import pymupdf
+
+PEER_TABLE_FILE = "peer_table.csv"
+METRIC_COLUMNS = ["face_value", "cmp", "revenue", "eps_basic", "eps_diluted", "nav", "pe", "ronw"]
+
+_PEER_MARKERS = ("comparison with listed industry peers", "listed peers", "peer group", "industry peers")
+
+# Header keyword -> column; checked in order, first hit wins for each table column.
+# P/E comes first: its header often names its inputs ("P/E (based on Diluted EPS)", "... closing price").
+_HEADER_RULES = [
+    ("pe", ["p/e", "p / e", "pe ratio", "price earning", "price to earning"]),
+    ("face_value", ["face value"]),
+    ("cmp", ["closing price", "market price", "cmp", "share price"]),
+    ("revenue", ["revenue", "total income"]),
+    ("eps_diluted", ["diluted"]),
+    ("eps_basic", ["eps", "earnings per share", "basic"]),
+    ("nav", ["nav", "net asset value", "book value"]),
+    ("ronw", ["ronw", "return on net worth", "return on equity"]),
+]
+
+_NUMBER = re.compile(r"-?\d[\d,]*\.?\d*")
+_PRICE = re.compile(r"\d[\d,]*(?:\.\d+)?")  # unsigned: the '-' in '95-100' separates a range
+# A data cell: one figure with optional currency, sign, brackets, % and footnote marks ('₹ 1,234.5', '(12.3)%', '8.9*')
+_FIGURE = re.compile(r"\(?-?\s*(?:₹|rs\.?|inr)?\s*\d[\d,]*(?:\.\d+)?\s*%?\)?\s*(?:[*#^†]+|\(\d\))?", re.IGNORECASE)
+
+
+def parse_number(cell):
+    """'₹ 1,234.5' -> 1234.5, '(12.3)' -> -12.3, 'N.A.' / '-' -> NaN."""
+    if cell is None:
+        return np.nan
+    text = str(cell).replace("\n", " ").strip()
+    m = _NUMBER.search(text)
+    if not m:
+        return np.nan
+    value = float(m.group().replace(",", ""))
+    if text.startswith("(") and text.rstrip().endswith(")"):
+        value = -abs(value)
+    return value
+
+
+def _is_figure(cell):
+    # Header text may contain numbers too ('Closing price on March 31, 2025', 'Fiscal 2024')
+    return bool(_FIGURE.fullmatch(" ".join(str(cell or "").split())))
+
+
+def _classify_header(text):
+    t = " ".join(str(text or "").lower().split())
+    for column, keys in _HEADER_RULES:
+        if any(k in t for k in keys):
+            return column
+    return None
+
+
+def _table_to_frame(rows):
+    if len(rows) < 3:
+        return None
+    # Header = leading rows without figures in the data columns (RHP tables often use 2 header rows)
+    n_header = 0
+    while n_header < min(3, len(rows)) and not any(_is_figure(c) for c in rows[n_header][1:]):
+        n_header += 1
+    if n_header == 0:
+        return None
+
+    width = max(len(r) for r in rows)
+    headers = [" ".join(str(rows[h][c] or "") for h in range(n_header) if c < len(rows[h])) for c in range(width)]
+    columns = {}
+    for c, text in enumerate(headers[1:], start=1):
+        name = _classify_header(text)
+        if name and name not in columns:
+            columns[name] = c
+    if "pe" not in columns or not ({"eps_basic", "eps_diluted", "ronw", "nav"} & set(columns)):
+        return None
+
+    records = []
+    for row in rows[n_header:]:
+        company = " ".join(str(row[0] or "").split())
+        if not company:
+            continue
+        rec = {"company": company}
+        for name in METRIC_COLUMNS:
+            c = columns.get(name)
+            rec[name] = parse_number(row[c]) if c is not None and c < len(row) else np.nan
+        records.append(rec)
+    if not records:
+        return None
+
+    df = pd.DataFrame.from_records(records, columns=["company"] + METRIC_COLUMNS)
+    df[METRIC_COLUMNS] = df[METRIC_COLUMNS].astype("float64")
+    # RHPs list the issuer first, then the listed peers
+    df["is_issuer"] = False
+    df.loc[df.index[0], "is_issuer"] = True
+    return df
+
+
+def extract_peer_table(pdf_path, section_map=None):
+    """
+    Finds the 'Comparison with Listed Industry Peers' table (Basis for Issue Price)
+    with PyMuPDF table detection. Returns a typed DataFrame or None.
+    """
+    with pymupdf.open(pdf_path) as doc:
+        pages = []
+        if section_map is not None:
+            pages = [i for i in range(doc.page_count) if section_map.section_for(i) == "basis_for_issue_price"]
+        if not pages:
+            pages = [p.number for p in doc if any(m in p.get_text().lower() for m in _PEER_MARKERS)]
+
+        for i in pages:
+            page = doc[i]
+            try:
+                tables = page.find_tables()
+            except Exception:
+                continue
+            for table in tables:
+                df = _table_to_frame(table.extract())
+                if df is not None:
+                    df.attrs["page"] = i
+                    return df
+    return None
+
+
+def load_peer_table(path):
+    try:
+        df = pd.read_csv(path)
+    except (OSError, ValueError):
+        return None
+    df[METRIC_COLUMNS] = df[METRIC_COLUMNS].astype("float64")
+    df["is_issuer"] = df["is_issuer"].astype(bool)
+    return df
+
+
+# --- VECTORIZED METRICS ---
+def valuation_metrics(df, issue_price=None):
+    """
+    Adds relative valuation columns against the median of the listed peers:
+    pe_discount_pct > 0 means cheaper than the peer median.
+    The issuer's P/E is usually 'N.A.' in the RHP, so it is priced at issue_price / EPS.
+    """
+    out = df.copy()
+    if issue_price and issue_price > 0:
+        eps = out["eps_diluted"].fillna(out["eps_basic"])
+        at_issue = np.where(eps > 0, issue_price / eps, np.nan)
+        fill = out["is_issuer"] & out["pe"].isna()
+        out.loc[fill, "pe"] = at_issue[fill.to_numpy()]
+    peers = out.loc[~out["is_issuer"]]
+    median_pe = peers["pe"].where(peers["pe"] > 0).median()
+    median_ronw = peers["ronw"].median()
+
+    out["pe_discount_pct"] = (median_pe - out["pe"]) / median_pe * 100 if median_pe and median_pe > 0 else np.nan
+    out["ronw_vs_median"] = out["ronw"] - median_ronw
+    out["earnings_yield_pct"] = np.where(out["pe"] > 0, 100.0 / out["pe"], np.nan)
+    out["pe_rank"] = out["pe"].where(out["pe"] > 0).rank(method="min")
+    return out
+
+
+def gmp_frame(details_by_company):
+    """
+    Market details dicts -> frame with GMP % of the upper price band, computed in one pass.
+    """
+    names = list(details_by_company)
+    gmp = np.array([parse_number(details_by_company[n].get("GMP")) for n in names], dtype="float64")
+    upper = np.array([upper_price_band(details_by_company[n].get("Price Band")) for n in names], dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gmp_pct = np.where(upper > 0, gmp / upper * 100, np.nan)
+    df = pd.DataFrame({"company": names, "gmp": gmp, "price_upper": upper, "gmp_pct": gmp_pct})
+    df["gmp_rank"] = df["gmp_pct"].rank(ascending=False, method="min")
+    return df
+
+
+def upper_price_band(band):
+    """'₹95-100 per share' -> 100.0; NaN when the band has no number."""
+    nums = [float(n.replace(",", "")) for n in _PRICE.findall(str(band or ""))]
+    return max(nums) if nums else np.nan
+
+
+def frame_to_markdown(df, columns, floatfmt="{:.2f}"):
+    """Small dependency-free Markdown table (pandas.to_markdown needs tabulate)."""
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    for _, row in df[columns].iterrows():
+        cells = []
+        for v in row:
+            if isinstance(v, (float, np.floating)):
+                cells.append("N/A" if np.isnan(v) else floatfmt.format(v))
+            else:
+                cells.append(str(v))
+        lines.append("| " + " | ".join(cells) + " |")
+    return "\n".join(lines)
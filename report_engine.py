@@ -1,24 +1,30 @@
 import os
 import time
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from tools_library import fetch_ipo_details, fetch_sentiment, query_rhp
+from tools_library import fetch_ipo_details, fetch_sentiment, get_rhp_engine, get_llm
+from context_packer import pack, digest, compact_json, trim_to_tokens, SECTION_BUDGET, VERDICT_BUDGET
+from stream_events import StatusChunk, TokenChunk, FinalChunk, stream_llm
+from tracing import span
+from fan_out import fan_out
 
+REPORT_MAX_WORKERS = int(os.getenv("REPORT_MAX_WORKERS", "4"))
+CHAPTER_TIMEOUT = float(os.getenv("REPORT_CHAPTER_TIMEOUT", "180"))  # seconds per chapter
 
-def generate_section(section_title, specific_questions, vector_store, ipo_name, llm):
+
+def generate_section(section_title, specific_questions, vector_store, ipo_name, llm, rhp_sections=None):
     """
     Helper function to generate a single detailed chapter of the report.
+    rhp_sections limits retrieval to those parts of the RHP (see rhp_sections.py).
     """
     if not vector_store:
         return f"## {section_title}\n*RHP Document not available for analysis.*\n"
 
     # 1. Gather Raw Data for this section
-    raw_context = []
-    for q in specific_questions:
-        # We query the RHP for specific details (e.g. "What is the EPS?")
-        ans = query_rhp(ipo_name, q, vector_store=vector_store)
-        raw_context.append(f"Q: {q}\nA: {ans}")
+    # We query the RHP for specific details (e.g. "What is the EPS?"), all questions in one batch
+    answers = get_rhp_engine(vector_store).batch(specific_questions, section=rhp_sections)
+    answers = pack(answers, SECTION_BUDGET)
+    raw_context = [f"Q: {q}\nA: {ans}" for q, ans in zip(specific_questions, answers)]
 
     context_str = "\n\n".join(raw_context)
 
@@ -50,108 +56,153 @@ def generate_section(section_title, specific_questions, vector_store, ipo_name,
     return chain.invoke({})
 
 
-def generate_deep_dive_report(ipo_name, vector_store):
-    """
-    Orchestrates the creation of a massive, multi-chapter report.
-    """
-    llm = ChatGroq(api_key=os.getenv("GROQ_API_KEY"), model="llama-3.3-70b-versatile", temperature=0.2)
+# Define the chapters and the specific questions to ask the PDF for each
+REPORT_CHAPTERS = {
+    "1. Executive Summary & Market Sentiment": {
+        "questions": [],  # This uses external data, see generate_intro
+        "type": "intro"
+    },
+    "2. Company Overview & Business Model": {
+        "questions": [
+            "What is the core business model and history of the company?",
+            "What products or services does the company offer?",
+            "Who are the key clients and what is the revenue model?",
+            "What is the industry overview and market size?"
+        ],
+        "type": "rhp",
+        "sections": ["business", "industry"]
+    },
+    "3. Financial Health (The Numbers)": {
+        "questions": [
+            "Provide the summary of financial statements (Balance Sheet, P&L) for the last 3 years.",
+            "What is the Total Revenue, PAT (Profit After Tax), and EBITDA trends?",
+            "What are the key ratios: EPS, RoNW, NAV per share?",
+            "Details of Capital Structure and Debt/Borrowings."
+        ],
+        "type": "rhp",
+        "sections": ["financial_information", "basis_for_issue_price", "capital_structure"]
+    },
+    "4. Objects of the Issue & Promoters": {
+        "questions": [
+            "What are the Objects of the Issue? How will the raised capital be used?",
+            "Who are the Promoters and Management? Give their profiles.",
+            "Details of Offer for Sale (OFS) vs Fresh Issue."
+        ],
+        "type": "rhp",
+        "sections": ["objects_of_issue", "management", "offer_structure", "capital_structure"]
+    },
+    "5. Risk Factors & Litigation (Critical)": {
+        "questions": [
+            "List the top 5 internal risk factors mentioned in the RHP.",
+            "Are there any outstanding criminal or civil litigations against the company or promoters?",
+            "What are the regulatory and industry-specific risks?"
+        ],
+        "type": "rhp",
+        "sections": ["risk_factors", "outstanding_litigation"]
+    },
+    "6. Peer Comparison & Competitive Landscape": {
+        "questions": [
+            "Who are the listed peers and competitors mentioned?",
+            "Compare the company with its competitors on financial metrics.",
+            "What is the company's market positioning?"
+        ],
+        "type": "rhp",
+        "sections": ["basis_for_issue_price", "industry", "business"]
+    }
+}
 
-    yield "📊 **Initializing Deep Dive Analysis...**"
 
-    # --- PHASE 1: EXTERNAL DATA ---
+def generate_intro(ipo_name, llm):
+    """
+    Executive Summary built from live market data and sentiment (no RHP needed).
+    """
     market_data = fetch_ipo_details(ipo_name)
     sentiment_data = fetch_sentiment(ipo_name, source="all")
 
-    full_report = [f"# 📑 Investment Research Report: {ipo_name}\n---\n"]
+    intro_prompt = f"""
+    Write the **Executive Summary** and **Market Sentiment** section.
 
-    # --- PHASE 2: GENERATE SECTIONS (The Loop) ---
-
-    # Define the chapters and the specific questions to ask the PDF for each
-    chapters = {
-        "1. Executive Summary & Market Sentiment": {
-            "questions": [],  # This uses external data, handled separately below
-            "type": "intro"
-        },
-        "2. Company Overview & Business Model": {
-            "questions": [
-                "What is the core business model and history of the company?",
-                "What products or services does the company offer?",
-                "Who are the key clients and what is the revenue model?",
-                "What is the industry overview and market size?"
-            ],
-            "type": "rhp"
-        },
-        "3. Financial Health (The Numbers)": {
-            "questions": [
-                "Provide the summary of financial statements (Balance Sheet, P&L) for the last 3 years.",
-                "What is the Total Revenue, PAT (Profit After Tax), and EBITDA trends?",
-                "What are the key ratios: EPS, RoNW, NAV per share?",
-                "Details of Capital Structure and Debt/Borrowings."
-            ],
-            "type": "rhp"
-        },
-        "4. Objects of the Issue & Promoters": {
-            "questions": [
-                "What are the Objects of the Issue? How will the raised capital be used?",
-                "Who are the Promoters and Management? Give their profiles.",
-                "Details of Offer for Sale (OFS) vs Fresh Issue."
-            ],
-            "type": "rhp"
-        },
-        "5. Risk Factors & Litigation (Critical)": {
-            "questions": [
-                "List the top 5 internal risk factors mentioned in the RHP.",
-                "Are there any outstanding criminal or civil litigations against the company or promoters?",
-                "What are the regulatory and industry-specific risks?"
-            ],
-            "type": "rhp"
-        },
-        "6. Peer Comparison & Competitive Landscape": {
-            "questions": [
-                "Who are the listed peers and competitors mentioned?",
-                "Compare the company with its competitors on financial metrics.",
-                "What is the company's market positioning?"
-            ],
-            "type": "rhp"
-        }
-    }
+    **IPO Details:** {compact_json(market_data)}
+    **Sentiment Analysis:** {trim_to_tokens(sentiment_data, 600)}
 
-    # Iterate through chapters
-    for title, config in chapters.items():
-        yield f"✍️ **Drafting Section: {title.split('.')[1].strip()}...**"
+    Include:
+    - Current GMP and Price Band.
+    - Opening/Closing Dates.
+    - Public Demand (Subscription status if available).
+    - Summary of online sentiment (Bullish/Bearish).
+    """
+    return llm.invoke(intro_prompt).content
 
-        if config["type"] == "intro":
-            # Special handling for Intro using API/Sentiment data
-            intro_prompt = f"""
-            Write the **Executive Summary** and **Market Sentiment** section.
 
-            **IPO Details:** {str(market_data)}
-            **Sentiment Analysis:** {sentiment_data}
+def generate_deep_dive_report(ipo_name, vector_store, max_workers=REPORT_MAX_WORKERS, chapter_timeout=CHAPTER_TIMEOUT):
+    """
+    Orchestrates the creation of a massive, multi-chapter report.
+    Chapters are independent until the verdict, so they are drafted concurrently
+    (max_workers=1 drafts them one by one) and assembled in canonical order.
+    A chapter that takes longer than chapter_timeout seconds is reported as timed out.
+    """
+    with span("report", ipo=ipo_name):
+        yield from _generate_report(ipo_name, vector_store, max_workers, chapter_timeout)
 
-            Include:
-            - Current GMP and Price Band.
-            - Opening/Closing Dates.
-            - Public Demand (Subscription status if available).
-            - Summary of online sentiment (Bullish/Bearish).
-            """
-            response = llm.invoke(intro_prompt).content
-            full_report.append(f"## {title}\n{response}\n")
 
-        elif config["type"] == "rhp":
-            # Deep retrieval for RHP sections
-            section_content = generate_section(title, config["questions"], vector_store, ipo_name, llm)
-            full_report.append(f"## {title}\n{section_content}\n")
+def _generate_report(ipo_name, vector_store, max_workers, chapter_timeout):
+    llm = get_llm("llama-3.3-70b-versatile", temperature=0.2)
+
+    yield StatusChunk("📊 **Initializing Deep Dive Analysis...**")
 
-        yield f"✅ {title.split('.')[1].strip()} Complete."
+    full_report = [f"# 📑 Investment Research Report: {ipo_name}\n---\n"]
+
+    # --- PHASE 1 + 2: GENERATE SECTIONS (Fan-out) ---
+    # The Executive Summary fetches its own market data, so it runs alongside the RHP chapters.
+    titles = list(REPORT_CHAPTERS)
+    sections = {}
+
+    def draft(title):
+        config = REPORT_CHAPTERS[title]
+        with span("report.chapter", chapter=title):
+            if config["type"] == "intro":
+                return generate_intro(ipo_name, llm)
+            # Deep retrieval for RHP sections
+            return generate_section(title, config["questions"], vector_store, ipo_name, llm,
+                                    rhp_sections=config.get("sections"))
+
+    # A hung chapter call becomes an error chapter instead of holding up the report.
+    # Chapters stream in report order: each one as soon as it and every earlier chapter are in.
+    streamed = 0
+    for kind, c, payload in fan_out(draft, titles, max_workers, item_timeout=chapter_timeout):
+        title = titles[c]
+        short = title.split('.')[1].strip()
+        if kind == "start":
+            yield StatusChunk(f"✍️ **Drafting Section: {short}...**")
+        elif kind == "done":
+            sections[title] = payload
+            yield StatusChunk(f"✅ {short} Complete.")
+        elif kind == "error":
+            sections[title] = f"*Section could not be generated: {payload}*"
+            yield StatusChunk(f"⚠️ {short} Failed.")
+        else:
+            sections[title] = f"*Section timed out after {chapter_timeout:.0f}s.*"
+            yield StatusChunk(f"⏱️ {short} Timed out.")
+
+        while len(full_report) - 1 < len(titles) and titles[len(full_report) - 1] in sections:
+            title = titles[len(full_report) - 1]
+            full_report.append(f"## {title}\n{sections[title]}\n")
+        if len(full_report) > streamed:
+            yield TokenChunk("\n".join(full_report[streamed:]) + "\n")
+            streamed = len(full_report)
+
+    # The verdict reads a per-chapter digest, not the whole report
+    chapter_budget = VERDICT_BUDGET // len(titles)
+    report_digest = "".join(f"## {title}\n{digest(sections[title], chapter_budget)}\n" for title in titles)
 
     # --- PHASE 3: FINAL VERDICT ---
-    yield "⚖️ **Formulating Final Investment Verdict...**"
+    yield StatusChunk("⚖️ **Formulating Final Investment Verdict...**")
 
     verdict_prompt = f"""
     Based on the entire report generated so far, write a **Final Verdict**.
 
-    **Report Context:**
-    {"".join(full_report)}
+    **Report Context (chapter digests):**
+    {report_digest}
 
     **Instructions:**
     1. Highlight the biggest Strength.
@@ -159,9 +210,17 @@ def generate_deep_dive_report(ipo_name, vector_store):
     3. Provide a conclusion: "Apply for Long Term", "Apply for Listing Gains", or "Avoid".
     4. Add a standard financial disclaimer.
     """
-    verdict = llm.invoke(verdict_prompt).content
+    # The chapters are already on screen; the verdict streams token by token
+    yield TokenChunk("## 7. Final Verdict\n")
+    verdict = ""
+    with span("report.verdict"):
+        for chunk in stream_llm(llm, verdict_prompt):
+            if isinstance(chunk, FinalChunk):
+                verdict = str(chunk)
+            else:
+                yield chunk
     full_report.append(f"## 7. Final Verdict\n{verdict}")
 
     # Return the full joined string
     final_markdown = "\n".join(full_report)
-    yield final_markdown
\ No newline at end of file
+    yield FinalChunk(final_markdown)
\ No newline at end of file
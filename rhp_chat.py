@@ -8,7 +8,8 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage
 
 # Reuse the robust logic we already built
-from tools_library import fetch_ipo_details, download_pdf_logic, build_vs_logic
+from tools_library import fetch_ipo_details, download_pdf_logic, acquire_vs, HYBRID_TOP_K
+from lexical_index import HybridRetriever
 
 load_dotenv()
 
@@ -17,6 +18,7 @@ st.set_page_config(page_title="RHP Document Chat", page_icon="📄", layout="cen
 # --- STATE MANAGEMENT ---
 if "messages" not in st.session_state: st.session_state.messages = []
 if "vector_store" not in st.session_state: st.session_state.vector_store = None
+if "vs_handle" not in st.session_state: st.session_state.vs_handle = None
 if "current_ipo" not in st.session_state: st.session_state.current_ipo = None
 
 # --- SIDEBAR: SETUP ---
@@ -28,6 +30,9 @@ with st.sidebar:
         st.session_state.messages = []
         st.session_state.vector_store = None
         st.session_state.current_ipo = ipo_input
+        if st.session_state.vs_handle:
+            st.session_state.vs_handle.release()
+            st.session_state.vs_handle = None
 
         with st.status("Processing Document...", expanded=True):
             st.write("1️⃣ Fetching Metadata...")
@@ -44,8 +49,9 @@ with st.sidebar:
 
                 if pdf_path:
                     st.write("3️⃣ Building Vector Index...")
-                    # This uses the persistent client logic we fixed earlier
-                    st.session_state.vector_store = build_vs_logic(pdf_path)
+                    # Shared, refcounted store: other sessions on this IPO reuse the same index
+                    st.session_state.vs_handle = acquire_vs(pdf_path)
+                    st.session_state.vector_store = st.session_state.vs_handle.vector_store
                     st.success("Document Ready!")
                 else:
                     st.error("❌ Failed to download PDF.")
@@ -87,7 +93,12 @@ if prompt := st.chat_input("Ask about Peers, Risks, Financials..."):
                 temperature=0.1
             )
 
-            retriever = st.session_state.vector_store.as_retriever(search_kwargs={"k": 5})
+            # Same hybrid BM25 + vector retrieval as the main app when the index has a lexical side
+            vs = st.session_state.vector_store
+            if getattr(vs, "lexical", None) is not None:
+                retriever = HybridRetriever(vector_store=vs, lexical=vs.lexical, k=HYBRID_TOP_K)
+            else:
+                retriever = vs.as_retriever(search_kwargs={"k": 5})
 
             system_prompt = """
             You are a financial analyst assistant. 
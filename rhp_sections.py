@@ -0,0 +1,95 @@
+import re
+import bisect
+import pymupdf
+
+OTHER = "other"
+
+# Canonical RHP sections, checked in order (more specific titles first).
+SECTION_PATTERNS = [
+    ("risk_factors", ["risk factors"]),
+    ("objects_of_issue", ["objects of the issue", "objects of the offer"]),
+    ("basis_for_issue_price", ["basis for issue price", "basis for offer price", "basis for the issue price",
+                               "basis for the offer price"]),
+    ("outstanding_litigation", ["outstanding litigation", "litigation and material developments"]),
+    ("financial_information", ["financial information", "financial statements", "restated financial",
+                               "financial indebtedness", "management's discussion and analysis"]),
+    ("capital_structure", ["capital structure"]),
+    ("industry", ["industry overview"]),
+    ("business", ["our business", "business overview"]),
+    ("management", ["our management", "our promoter", "promoter group", "key managerial"]),
+    ("offer_structure", ["the offer", "the issue", "offer structure", "issue structure", "terms of the offer",
+                         "terms of the issue"]),
+]
+
+_PREFIX = re.compile(r"^\s*(section\s+[ivxlc\d]+\s*[:.\-–—]?\s*)", re.IGNORECASE)
+HEADING_MAX_LEN = 90
+HEADING_BAND = 0.18  # top fraction of a page scanned for headings when there is no outline
+
+
+def classify_title(title):
+    """Canonical section name for a heading, or None."""
+    t = _PREFIX.sub("", title or "").lower()
+    t = re.sub(r"[^a-z' ]+", " ", t)
+    t = " ".join(t.split())
+    for name, patterns in SECTION_PATTERNS:
+        if any(p in t for p in patterns):
+            return name
+    return None
+
+
+class SectionMap:
+    """Page -> canonical section lookup built from (start_page, section) marks."""
+
+    def __init__(self, marks, source):
+        marks = sorted(marks, key=lambda m: m[0])
+        self._starts = [m[0] for m in marks]
+        self._names = [m[1] for m in marks]
+        self.source = source  # "toc", "headings" or "none"
+
+    def section_for(self, page):
+        i = bisect.bisect_right(self._starts, page) - 1
+        return self._names[i] if i >= 0 else OTHER
+
+    @property
+    def sections(self):
+        return sorted(set(self._names) - {OTHER})
+
+
+def _from_toc(toc):
+    # A TOC entry that doesn't name a known section inherits its parent's section
+    marks, stack = [], []
+    for level, title, page in toc:
+        while stack and stack[-1][0] >= level:
+            stack.pop()
+        name = classify_title(title) or (stack[-1][1] if stack else OTHER)
+        stack.append((level, name))
+        marks.append((max(page - 1, 0), name))
+    return marks
+
+
+def _from_headings(doc):
+    # No outline: look for short heading-like lines at the top of each page.
+    # Pages naming several sections are contents/index pages and are skipped.
+    marks, current = [], None
+    for page in doc:
+        band = pymupdf.Rect(page.rect.x0, page.rect.y0, page.rect.x1, page.rect.y0 + page.rect.height * HEADING_BAND)
+        lines = [l.strip() for l in page.get_text("text", clip=band).splitlines() if l.strip()]
+        found = {classify_title(l) for l in lines if len(l) <= HEADING_MAX_LEN and l.upper() == l}
+        found.discard(None)
+        if len(found) == 1:
+            name = found.pop()
+            if name != current:
+                marks.append((page.number, name))
+                current = name
+    return marks
+
+
+def detect_sections(pdf_path):
+    with pymupdf.open(pdf_path) as doc:
+        toc = doc.get_toc(simple=True)
+        if toc:
+            marks = _from_toc(toc)
+            if any(name != OTHER for _, name in marks):
+                return SectionMap(marks, "toc")
+        marks = _from_headings(doc)
+    return SectionMap(marks, "headings" if marks else "none")
@@ -0,0 +1,31 @@
+"""
+Chunk types yielded by the engine generators (brain, report, comparison).
+
+They subclass str, so older callers that treat every chunk as text keep working;
+the UI tells them apart with isinstance instead of matching on their wording.
+"""
+
+
+class StatusChunk(str):
+    """A progress line for the status panel."""
+
+
+class TokenChunk(str):
+    """A piece of the answer, yielded as the model produces it."""
+
+
+class FinalChunk(str):
+    """The complete answer. Replaces whatever was streamed through TokenChunks."""
+
+
+def stream_llm(runnable, inputs):
+    """
+    Streams a chat model or chain: yields TokenChunks, then one FinalChunk with the full text.
+    """
+    parts = []
+    for piece in runnable.stream(inputs):
+        text = piece if isinstance(piece, str) else getattr(piece, "content", "")
+        if text:
+            parts.append(text)
+            yield TokenChunk(text)
+    yield FinalChunk("".join(parts))
@@ -0,0 +1,49 @@
+import time
+import threading
+
+from fan_out import fan_out
+
+
+def _finished(events):
+    return {i: (kind, payload) for kind, i, payload in events if kind != "start"}
+
+
+def test_every_item_starts_and_finishes_once():
+    events = list(fan_out(lambda x: x * 2, [1, 2, 3], max_workers=2))
+    assert sorted(i for kind, i, _ in events if kind == "start") == [0, 1, 2]
+    assert _finished(events) == {0: ("done", 2), 1: ("done", 4), 2: ("done", 6)}
+
+
+def test_errors_are_reported_per_item():
+    def fn(x):
+        if x == 2:
+            raise ValueError("boom")
+        return x
+
+    finished = _finished(fan_out(fn, [1, 2], max_workers=2))
+    assert finished[0] == ("done", 1)
+    assert finished[1][0] == "error" and str(finished[1][1]) == "boom"
+
+
+def test_item_timeout_does_not_wait_for_a_hung_call():
+    release = threading.Event()
+
+    def fn(x):
+        if x == "hung":
+            release.wait(10)
+        return x
+
+    start = time.monotonic()
+    finished = _finished(fan_out(fn, ["ok", "hung"], max_workers=2, item_timeout=0.3))
+    release.set()
+    assert time.monotonic() - start < 5
+    assert finished == {0: ("done", "ok"), 1: ("timeout", None)}
+
+
+def test_overall_timeout_covers_items_that_never_started():
+    release = threading.Event()
+    start = time.monotonic()
+    finished = _finished(fan_out(lambda x: release.wait(10), [1, 2, 3], max_workers=1, timeout=0.3))
+    release.set()
+    assert time.monotonic() - start < 5
+    assert [kind for kind, _ in finished.values()] == ["timeout"] * 3
@@ -0,0 +1,94 @@
+import os
+import threading
+import multiprocessing
+
+from index_store import IndexStore, file_lock
+
+
+def _hold(path, locked, release):
+    with file_lock(path):
+        locked.set()
+        release.wait(10)
+
+
+def test_file_lock_is_seen_by_other_processes(tmp_path):
+    path = str(tmp_path / "key.lock")
+    ctx = multiprocessing.get_context("spawn")
+    locked, release = ctx.Event(), ctx.Event()
+    holder = ctx.Process(target=_hold, args=(path, locked, release))
+    holder.start()
+    try:
+        assert locked.wait(30)
+        acquired = threading.Event()
+
+        def take():
+            with file_lock(path):
+                acquired.set()
+
+        waiter = threading.Thread(target=take)
+        waiter.start()
+        assert not acquired.wait(0.5)  # blocked while the other process holds it
+        release.set()
+        assert acquired.wait(10)
+        waiter.join()
+    finally:
+        release.set()
+        holder.join(10)
+
+
+def test_pins_are_counted(tmp_path):
+    store = IndexStore(root=str(tmp_path), budget_mb=0)
+    for key in ("rhp_a", "rhp_b"):
+        store.begin(key, __file__)
+        with open(os.path.join(store.path_for(key), "data"), "wb") as f:
+            f.write(b"x" * 1024)
+    store.pin("rhp_a")  # loaded by the registry
+    store.pin("rhp_a")  # copied as the base of an incremental build
+    store.unpin("rhp_a")
+    store.commit("rhp_b")  # over budget: evicts everything it may
+    assert os.path.isdir(store.path_for("rhp_a"))
+    store.unpin("rhp_a")
+    assert "rhp_a" in store.evict()
+
+
+def _pin_in_child(root, key, pinned, release):
+    store = IndexStore(root=root, budget_mb=0)
+    store.pin(key)
+    pinned.set()
+    release.wait(10)
+    store.unpin(key)
+
+
+def _build(store, key, size=1024):
+    store.begin(key, __file__)
+    with open(os.path.join(store.path_for(key), "data"), "wb") as f:
+        f.write(b"x" * size)
+    store.commit(key)
+
+
+def test_pins_are_seen_by_other_processes(tmp_path):
+    root = str(tmp_path)
+    store = IndexStore(root=root, budget_mb=1)
+    _build(store, "rhp_a")
+    store.budget_bytes = 0
+
+    ctx = multiprocessing.get_context("spawn")
+    pinned, release = ctx.Event(), ctx.Event()
+    child = ctx.Process(target=_pin_in_child, args=(root, "rhp_a", pinned, release))
+    child.start()
+    try:
+        assert pinned.wait(30)
+        assert store.evict() == []  # the worker can't remove an index the app has open
+    finally:
+        release.set()
+        child.join(10)
+    assert store.evict() == ["rhp_a"]
+
+
+def test_commits_from_two_stores_keep_each_others_entries(tmp_path):
+    # Two IndexStore objects on one root stand in for the app and the worker process
+    app, worker = IndexStore(root=str(tmp_path)), IndexStore(root=str(tmp_path))
+    _build(app, "rhp_a")
+    _build(worker, "rhp_b")
+    app.touch("rhp_a")
+    assert app.is_ready("rhp_b") and worker.is_ready("rhp_a")
@@ -0,0 +1,55 @@
+from langchain_core.documents import Document
+
+from ingest_filter import IngestFilter, normalize_line
+
+_PNL = """Restated Statement of Profit and Loss (₹ in million)
+Particulars Fiscal {year}
+Revenue from operations {revenue}
+Other income {other}
+Total income {total}
+Cost of materials consumed {materials}
+Employee benefits expense {employees}
+Finance costs {finance}
+Depreciation and amortisation expense {depreciation}
+Profit before tax {pbt}
+Restated profit for the year {pat}
+Basic and diluted EPS (₹) {eps}"""
+
+
+def _chunk(**figures):
+    return Document(page_content=_PNL.format(**figures))
+
+
+def test_tables_that_differ_only_in_figures_are_kept():
+    chunk_filter = IngestFilter()
+    fy2024 = _chunk(year=2024, revenue="12,345.6", other="210.4", total="12,556.0", materials="7,001.2",
+                    employees="1,204.9", finance="310.5", depreciation="402.7", pbt="1,845.3", pat="1,380.2",
+                    eps="13.80")
+    fy2023 = _chunk(year=2023, revenue="10,112.4", other="188.0", total="10,300.4", materials="5,990.1",
+                    employees="1,050.3", finance="295.0", depreciation="377.1", pbt="1,390.8", pat="1,040.6",
+                    eps="10.41")
+    assert chunk_filter.keep(fy2024)
+    assert chunk_filter.keep(fy2023)
+    assert not chunk_filter.keep(fy2024)  # a true repeat is still dropped
+    assert chunk_filter.summary()["exact_dups"] == 1
+
+
+def test_one_changed_figure_is_not_a_near_duplicate():
+    chunk_filter = IngestFilter()
+    figures = dict(year=2024, revenue="12,345.6", other="210.4", total="12,556.0", materials="7,001.2",
+                   employees="1,204.9", finance="310.5", depreciation="402.7", pbt="1,845.3", pat="1,380.2",
+                   eps="13.80")
+    assert chunk_filter.keep(_chunk(**figures))
+    assert chunk_filter.keep(_chunk(**{**figures, "pat": "1,312.9"}))  # consolidated vs standalone
+
+
+def test_near_duplicate_text_is_dropped():
+    chunk_filter = IngestFilter()
+    words = [a + b for a in "abcdefghijklmnop" for b in "qrstuvwxyz"]
+    assert chunk_filter.keep(Document(page_content=" ".join(words)))
+    assert not chunk_filter.keep(Document(page_content=" ".join(words[:80] + ["changed"] + words[81:])))
+    assert chunk_filter.summary()["near_dups"] == 1
+
+
+def test_header_lines_still_fold_page_numbers():
+    assert normalize_line("Page 12") == normalize_line("page  13")
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("langchain_huggingface")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import vector_registry
+from intent_router import IntentRouter
+
+# question -> intent the router may answer on its own (None: the planner must decide)
+LABELLED = [
+    ("What is the GMP?", "gmp"),
+    ("listing date?", "gmp"),
+    ("What is the price band and lot size?", "gmp"),
+    ("What are the risks?", "rhp"),
+    ("Who are the promoters?", "rhp"),
+    ("What does reddit say about it?", "sentiment"),
+    ("Any news on this IPO?", "sentiment"),
+    ("Should I subscribe to this IPO?", None),
+    ("How does the GMP compare with the fundamentals?", None),
+    ("Is the company over-priced vs peers?", None),
+    ("Is this a good investment at the current GMP?", None),
+    ("Is it worth applying given the risks?", None),
+    ("What is the GMP and what are the key risks?", None),
+    ("Give me the grey market premium, the listing date, the promoter holding and any litigation", None),
+]
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(vector_registry, "_EMBEDDINGS", DeterministicFakeEmbedding(size=384))
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("query, intent", LABELLED)
+def test_router_decisions(router, query, intent):
+    assert router.classify(query)[0] == intent
+
+
+def test_example_queries_route_by_nearest_neighbour(router):
+    assert router.classify("what does the company do") == ("rhp", "knn", pytest.approx(1.0))
@@ -0,0 +1,37 @@
+from langchain_core.documents import Document
+
+from lexical_index import LexicalIndexBuilder, doc_key, merge_rankings
+
+
+def _vector_hit(page, chunk, text):
+    return Document(page_content=text, metadata={"page": page, "chunk": chunk, "section": "risk_factors"})
+
+
+def _lexical_index(docs):
+    builder = LexicalIndexBuilder()
+    builder.add(docs)
+    return builder.build()
+
+
+def test_lexical_hits_keep_their_chunk_id():
+    docs = [_vector_hit(3, n, f"promoter holding disclosure number {n}") for n in range(3)]
+    lexical = _lexical_index(docs)
+    keys = {doc_key(lexical.document(row)) for row in range(len(lexical))}
+    assert keys == {"p3-c0", "p3-c1", "p3-c2"}
+
+
+def test_merge_rankings_with_mixed_vector_and_lexical_hits():
+    docs = [_vector_hit(3, n, f"promoter holding disclosure number {n}") for n in range(3)]
+    lexical = _lexical_index(docs)
+    by_id = {doc_key(lexical.document(row)): lexical.document(row) for row in range(len(lexical))}
+
+    # Question 1 ranked vector hits, question 2 lexical-only hits of other chunks on the same page
+    first = [docs[0]]
+    second = [by_id["p3-c1"], by_id["p3-c2"], by_id["p3-c0"]]
+    merged = merge_rankings([first, second], limit=10)
+    assert [doc_key(d) for d in merged] == ["p3-c0", "p3-c1", "p3-c2"]
+
+
+def test_merge_rankings_respects_limit():
+    docs = [_vector_hit(p, 0, f"page {p}") for p in range(5)]
+    assert merge_rankings([docs[:3], docs[2:]], limit=3) == [docs[0], docs[2], docs[1]]
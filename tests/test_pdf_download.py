@@ -0,0 +1,92 @@
+import json
+import pytest
+
+tools_library = pytest.importorskip("tools_library", exc_type=ImportError)
+
+URL = "https://example.com/rhp.pdf"
+
+
+def _pdf(label):
+    return b"%PDF-1.7\n" + label * 4096 + b"\n%%EOF\n"
+
+
+class _Response:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._body = body
+
+    def iter_content(self, size):
+        for lo in range(0, len(self._body), size):
+            yield self._body[lo:lo + size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Server:
+    """Serves one document with an ETag, honouring Range + If-Range like a real server."""
+
+    def __init__(self, body, etag):
+        self.body, self.etag = body, etag
+        self.requests = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        headers = headers or {}
+        self.requests.append(headers)
+        rng = headers.get("Range")
+        if rng and headers.get("If-Range", self.etag) == self.etag:
+            start = int(rng[len("bytes="):-1])
+            if start >= len(self.body):
+                return _Response(416, headers={"Content-Range": f"bytes */{len(self.body)}"})
+            return _Response(206, self.body[start:], {
+                "ETag": self.etag, "Content-Range": f"bytes {start}-{len(self.body) - 1}/{len(self.body)}"})
+        return _Response(200, self.body, {"ETag": self.etag, "Content-Length": str(len(self.body))})
+
+
+def _leave_part(save_path, data, url=URL, validator='"v1"'):
+    with open(save_path + ".part", "wb") as f:
+        f.write(data)
+    if url is not None:
+        with open(save_path + ".part.json", "w", encoding="utf-8") as f:
+            json.dump({"url": url, "validator": validator}, f)
+
+
+@pytest.fixture
+def save_path(tmp_path):
+    return str(tmp_path / "42.pdf")
+
+
+def _download(monkeypatch, server, save_path):
+    monkeypatch.setattr(tools_library, "SESSION", server)
+    return tools_library._stream_to_file(URL, save_path)
+
+
+def test_resumes_a_part_of_the_same_document(monkeypatch, save_path):
+    body = _pdf(b"R")
+    _leave_part(save_path, body[:1000])
+    server = _Server(body, '"v1"')
+    assert _download(monkeypatch, server, save_path) == save_path
+    assert server.requests[0] == {"Range": "bytes=1000-", "If-Range": '"v1"'}
+    assert open(save_path, "rb").read() == body
+
+
+def test_stale_part_of_a_changed_document_is_restarted(monkeypatch, save_path):
+    # The DRHP was half-downloaded from the same URL; the server now serves the RHP
+    _leave_part(save_path, _pdf(b"D")[:1000])
+    body = _pdf(b"R")
+    assert _download(monkeypatch, _Server(body, '"v2"'), save_path) == save_path
+    assert open(save_path, "rb").read() == body
+
+
+@pytest.mark.parametrize("url", ["https://example.com/drhp.pdf", None])
+def test_part_from_another_url_or_without_metadata_is_discarded(monkeypatch, save_path, url):
+    _leave_part(save_path, _pdf(b"D")[:1000], url=url)
+    body = _pdf(b"R")
+    server = _Server(body, '"v1"')
+    assert _download(monkeypatch, server, save_path) == save_path
+    assert "Range" not in server.requests[0]
+    assert open(save_path, "rb").read() == body
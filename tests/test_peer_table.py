@@ -0,0 +1,64 @@
+import math
+import pytest
+
+from peer_table import _classify_header, _table_to_frame, parse_number, upper_price_band
+
+
+@pytest.mark.parametrize("band, expected", [
+    ("95-100", 100.0),
+    ("Rs.95-100 per share", 100.0),
+    ("₹ 1,000 - ₹ 1,050", 1050.0),
+    ("₹ 285 to ₹ 300", 300.0),
+    ("120", 120.0),
+    ("12.5-13.75", 13.75),
+])
+def test_upper_price_band(band, expected):
+    assert upper_price_band(band) == expected
+
+
+@pytest.mark.parametrize("band", [None, "", "TBA"])
+def test_upper_price_band_without_numbers(band):
+    assert math.isnan(upper_price_band(band))
+
+
+def test_parse_number_keeps_sign():
+    assert parse_number("-12.3") == -12.3
+    assert parse_number("(12.3)") == -12.3
+    assert parse_number("₹ 1,234.5") == 1234.5
+    assert math.isnan(parse_number("N.A."))
+
+
+@pytest.mark.parametrize("header, column", [
+    ("P/E (based on Diluted EPS)", "pe"),
+    ("P/E ratio (based on closing market price)", "pe"),
+    ("Closing price on March 31, 2025 (₹)", "cmp"),
+    ("EPS (₹) Basic", "eps_basic"),
+    ("EPS (₹) Diluted", "eps_diluted"),
+    ("Face value (₹ per share)", "face_value"),
+    ("Revenue from operations for Fiscal 2024 (₹ in million)", "revenue"),
+    ("NAV per equity share (₹)", "nav"),
+    ("RoNW (%)", "ronw"),
+])
+def test_classify_header(header, column):
+    assert _classify_header(header) == column
+
+
+def test_basis_for_issue_price_table():
+    # Two header rows as PyMuPDF extracts them: EPS spans its Basic / Diluted sub-columns
+    rows = [
+        ["Name of the company", "Revenue from operations for Fiscal 2024 (₹ in million)", "Face value (₹ per share)",
+         "Closing price on March 31, 2025 (₹)", "EPS (₹)", None, "NAV per equity share (₹)",
+         "P/E (based on Diluted EPS)", "RoNW (%)"],
+        ["", "", "", "", "Basic", "Diluted", "", "", ""],
+        ["Issuer Limited*", "12,345.67", "10", "N.A.", "12.34", "12.10", "85.20", "N.A.", "14.5"],
+        ["Peer One Limited", "45,678.90", "2", "1,234.50", "30.10", "30.00", "210.40", "41.15", "14.30%"],
+        ["Peer Two Limited", "8,765.43", "5", "456.70", "(2.10)", "(2.10)", "95.00", "N.A.", "(2.2)"],
+    ]
+    df = _table_to_frame(rows)
+    assert df is not None
+    assert list(df["company"]) == ["Issuer Limited*", "Peer One Limited", "Peer Two Limited"]
+    peer = df.iloc[1]
+    assert (peer["revenue"], peer["cmp"], peer["eps_basic"], peer["eps_diluted"], peer["pe"], peer["ronw"]) == \
+        (45678.90, 1234.50, 30.10, 30.00, 41.15, 14.30)
+    assert df.iloc[2]["eps_diluted"] == -2.10
+    assert math.isnan(df.iloc[0]["pe"]) and df.iloc[0]["is_issuer"]
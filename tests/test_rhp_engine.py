@@ -0,0 +1,31 @@
+import gc
+import weakref
+import pytest
+
+tools_library = pytest.importorskip("tools_library", exc_type=ImportError)
+
+
+class _Store:
+    pass
+
+
+class _Engine:
+    def __init__(self, vector_store):
+        self.vector_store = vector_store
+
+
+def test_engine_is_cached_per_store(monkeypatch):
+    monkeypatch.setattr(tools_library, "RHPQueryEngine", _Engine)
+    store = _Store()
+    assert tools_library.get_rhp_engine(store) is tools_library.get_rhp_engine(store)
+    assert tools_library.get_rhp_engine(_Store()) is not tools_library.get_rhp_engine(store)
+
+
+def test_store_and_engine_are_collected_after_release(monkeypatch):
+    monkeypatch.setattr(tools_library, "RHPQueryEngine", _Engine)
+    store = _Store()
+    engine = tools_library.get_rhp_engine(store)
+    store_ref, engine_ref = weakref.ref(store), weakref.ref(engine)
+    del store, engine
+    gc.collect()
+    assert store_ref() is None and engine_ref() is None
@@ -0,0 +1,48 @@
+import os
+import pytest
+
+pytest.importorskip("langchain_huggingface")
+
+import vector_registry
+from index_store import IndexStore
+from vector_registry import VectorStoreRegistry
+
+
+class _Store:
+    mem_bytes = 1024
+
+
+@pytest.fixture
+def index_store(tmp_path, monkeypatch):
+    store = IndexStore(root=str(tmp_path / "indexes"))
+    monkeypatch.setattr(vector_registry, "get_index_store", lambda: store)
+    return store
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "rhp.pdf"
+    path.write_bytes(b"%PDF-1.7\n%%EOF\n")
+    return str(path)
+
+
+def test_closed_store_leaves_no_pin(index_store, pdf_path):
+    registry = VectorStoreRegistry(loader=lambda path, **kw: _Store(), budget_mb=0)
+    first, second = registry.acquire(pdf_path), registry.acquire(pdf_path)
+    assert first.vector_store is second.vector_store
+    assert sum(index_store._pinned.values()) == 1
+    first.release()
+    second.release()  # idle and over budget: closed
+    assert registry.stats()["loaded"] == 0
+    assert not index_store._pinned
+    assert not [f for f in os.listdir(index_store.root) if ".pin." in f]
+
+
+def test_failed_load_leaves_no_pin(index_store, pdf_path):
+    def loader(path, **kw):
+        raise RuntimeError("download failed")
+
+    registry = VectorStoreRegistry(loader=loader)
+    with pytest.raises(RuntimeError):
+        registry.acquire(pdf_path)
+    assert not index_store._pinned
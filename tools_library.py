@@ -1,180 +1,790 @@
 import os
-import shutil
+import re
+import json
+import time
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 import praw
 import feedparser
 import urllib.parse
 import chromadb
 from bs4 import BeautifulSoup
-from rapidfuzz import process, fuzz
 from langchain_community.document_loaders import PyMuPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_groq import ChatGroq
 from langchain.chains.retrieval import create_retrieval_chain
 from langchain.chains.history_aware_retriever import create_history_aware_retriever
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from index_store import get_index_store, file_sha256, file_lock, CHUNK_SIZE, CHUNK_OVERLAP, VECTOR_BACKEND, VECTOR_DTYPE
+from vector_registry import VectorStoreRegistry, get_embeddings
+from ingest_pipeline import ingest_pdf, page_hash
+from ipo_listing import get_listing, BASE_URL, ASSETS_URL
+from http_client import SESSION, TIMEOUT
+from answer_cache import get_answer_cache
+from rhp_sections import detect_sections
+from peer_table import extract_peer_table, load_peer_table, PEER_TABLE_FILE
+from tracing import span, traced, bind, current, cache_event, LLM_CALLBACKS
+from lexical_index import LexicalIndexBuilder, HybridRetriever, load_lexical_index, merge_rankings, chunk_id, LEXICAL_FILE
+from numpy_store import NumpyVectorStore
+from ingest_filter import build_ingest_filter
+from incremental_index import clone_index, update_index, load_page_log, save_page_log
 
 
 # --- WORKER 1: IPO DETAILS ---
+def _details_from_row(d, name):
+    return {
+        "id": d.get("id"),
+        "slug": d.get("slug", ""),
+        "Company": name,
+        "GMP": d.get("premium", "N/A"),
+        "Price Band": d.get("price", "N/A"),
+        "Open Date": d.get("open", "N/A"),
+        "Close Date": d.get("close", "N/A"),
+        "Allotment Date": d.get("allotment", "N/A"),
+        "Listing Date": d.get("listing", "N/A"),
+        "Status": d.get("status", "N/A"),
+        "Issue Size": d.get("size", "N/A")
+    }
+
+
 def fetch_ipo_details(ipo_name: str):
+    return fetch_ipo_details_batch([ipo_name])[0]
+
+
+@traced("tool.ipo_details")
+def fetch_ipo_details_batch(ipo_names):
+    """
+    Resolves a whole list of names against the listing in one vectorized call.
+    Returns one details dict per name, in order ("error" key when unresolved).
+    """
     try:
-        r = requests.get("https://www.ipopremium.in/ipo", headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
-        data = r.json().get("data", [])
-        clean_names = [BeautifulSoup(d.get("name", ""), "html.parser").get_text(" ", strip=True) for d in data]
-        match = process.extractOne(ipo_name, clean_names, scorer=fuzz.QRatio)
-
-        if match and match[1] > 80:
-            target = match[0]
-            for d in data:
-                if BeautifulSoup(d.get("name", ""), "html.parser").get_text(" ", strip=True) == target:
-                    return {
-                        "id": d.get("id"),
-                        "slug": d.get("slug", ""),
-                        "Company": target,
-                        "GMP": d.get("premium", "N/A"),
-                        "Price Band": d.get("price", "N/A"),
-                        "Open Date": d.get("open", "N/A"),
-                        "Close Date": d.get("close", "N/A"),
-                        "Allotment Date": d.get("allotment", "N/A"),
-                        "Listing Date": d.get("listing", "N/A"),
-                        "Status": d.get("status", "N/A"),
-                        "Issue Size": d.get("size", "N/A")
-                    }
+        listing = get_listing()
+        resolutions = listing.resolver.resolve(ipo_names)
     except Exception as e:
-        return {"error": str(e)}
-    return {"error": "Not Found"}
+        return [{"error": str(e)} for _ in ipo_names]
+
+    results = []
+    for res in resolutions:
+        if res.name is None:
+            results.append({"error": "Not Found"})
+            continue
+        details = _details_from_row(listing.by_name[res.name], res.name)
+        if res.ambiguous:
+            details["Match Warning"] = f"Ambiguous match (also close to '{res.runner_up}')"
+        results.append(details)
+    return results
 
 
 # --- WORKER 2: SENTIMENT ---
+SENTIMENT_TTL = int(os.getenv("SENTIMENT_TTL", "600"))  # seconds
+SENTIMENT_MAX_WORKERS = int(os.getenv("SENTIMENT_MAX_WORKERS", "6"))
+SENTIMENT_SOURCES = tuple(s.strip() for s in os.getenv("SENTIMENT_SOURCES", "reddit,news").split(",") if s.strip())
+NEWS_RSS_URL = os.getenv("NEWS_RSS_URL", "https://news.google.com/rss/search")
+
+_REDDIT = threading.local()  # PRAW is not thread-safe: one long-lived client per pool thread
+_SENTIMENT_CACHE = {}
+_SENTIMENT_CACHE_LOCK = threading.Lock()
+# Shared, bounded pool: fan-out across sources and IPOs never exceeds this many fetches
+_SENTIMENT_POOL = ThreadPoolExecutor(max_workers=SENTIMENT_MAX_WORKERS, thread_name_prefix="sentiment")
+
+
+def _get_reddit():
+    client = getattr(_REDDIT, "client", None)
+    if client is None:
+        client = _REDDIT.client = praw.Reddit(
+            client_id=os.getenv("REDDIT_CLIENT_ID"),
+            client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+            user_agent=os.getenv("REDDIT_USER_AGENT", "Bot/1.0")
+        )
+    return client
+
+
+def _fetch_source(ipo_name, source):
+    if source == "reddit":
+        return [f"[Reddit]: {sub.title}" for sub in _get_reddit().subreddit("all").search(f"{ipo_name} IPO", limit=5)]
+
+    q = urllib.parse.quote(f"{ipo_name} IPO")
+    r = SESSION.get(f"{NEWS_RSS_URL}?q={q}&hl=en-IN&gl=IN&ceid=IN:en", timeout=TIMEOUT)
+    feed = feedparser.parse(r.content)
+    return [f"[News]: {e.title}" for e in feed.entries[:5]]
+
+
+def _cached_source(ipo_name, source):
+    key = (ipo_name.strip().lower(), source)
+    with _SENTIMENT_CACHE_LOCK:
+        hit = _SENTIMENT_CACHE.get(key)
+        if hit and time.time() - hit[0] < SENTIMENT_TTL:
+            cache_event("sentiment", "hit")
+            return hit[1]
+    cache_event("sentiment", "miss")
+    try:
+        with span(f"sentiment.{source}", ipo=ipo_name):
+            texts = _fetch_source(ipo_name, source)
+    except:
+        return []  # not cached, so the next call retries
+    with _SENTIMENT_CACHE_LOCK:
+        _SENTIMENT_CACHE[key] = (time.time(), texts)
+    return texts
+
+
+def _sources_for(source):
+    source = (source or "all").strip().lower()
+    return [s for s in SENTIMENT_SOURCES if source in (s, "all")]
+
+
 def fetch_sentiment(ipo_name: str, source: str = "all"):
-    texts = []
-    if source in ["reddit", "all"]:
-        try:
-            reddit = praw.Reddit(
-                client_id=os.getenv("REDDIT_CLIENT_ID"),
-                client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
-                user_agent=os.getenv("REDDIT_USER_AGENT", "Bot/1.0")
-            )
-            for sub in reddit.subreddit("all").search(f"{ipo_name} IPO", limit=5):
-                texts.append(f"[Reddit]: {sub.title}")
-        except:
-            pass
-
-    if source in ["news", "all"]:
-        try:
-            q = urllib.parse.quote(f"{ipo_name} IPO")
-            feed = feedparser.parse(f"https://news.google.com/rss/search?q={q}&hl=en-IN&gl=IN&ceid=IN:en")
-            texts.extend([f"[News]: {e.title}" for e in feed.entries[:5]])
-        except:
-            pass
+    return fetch_sentiment_batch([ipo_name], source=source)[0]
+
 
-    return "\n".join(texts) if texts else "No sentiment data found."
+@traced("tool.sentiment")
+def fetch_sentiment_batch(ipo_names, source="all"):
+    """
+    Sentiment for several IPOs in one parallel wave: every (IPO, source) pair is
+    fetched concurrently on the shared pool. Returns one summary string per name.
+    """
+    sources = _sources_for(source)
+    futures = [[_SENTIMENT_POOL.submit(bind(_cached_source), name, src) for src in sources] for name in ipo_names]
+
+    results = []
+    for per_name in futures:
+        texts = []
+        for f in per_name:
+            texts.extend(f.result())
+        results.append("\n".join(texts) if texts else "No sentiment data found.")
+    return results
 
 
 # --- WORKER 3: RHP DOCUMENT ---
+RHP_QA_MODEL = "llama-3.1-8b-instant"
+RHP_TOP_K = 5
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", "4"))  # fused BM25 + vector ranking is more precise, so fewer chunks
+MULTI_QUERY_MAX_CHUNKS = int(os.getenv("RHP_MULTI_MAX_CHUNKS", "8"))  # shared context of one multi-question call
+
+_ANSWER_HEADER = re.compile(r"^[ \t]*#*[ \t]*\**Answer[ \t]+(\d+)\**[ \t]*[:.)-]?\**[ \t]*", re.IGNORECASE | re.MULTILINE)
+
+_LLM_POOL = {}
+_LLM_POOL_LOCK = threading.Lock()
+
+
+def _groq_llm(model, temperature):
+    return ChatGroq(api_key=os.getenv("GROQ_API_KEY"), model=model, temperature=temperature)
+
+
+_LLM_FACTORY = _groq_llm
+
+
+def set_llm_factory(factory):
+    """Swap the chat model backend (e.g. the benchmark's fake model). Clears the pool."""
+    global _LLM_FACTORY
+    with _LLM_POOL_LOCK:
+        _LLM_FACTORY = factory or _groq_llm
+        _LLM_POOL.clear()
+
+
+def get_llm(model, temperature=0):
+    """ChatGroq clients are thread-safe and hold a connection pool, so keep one per config."""
+    key = (model, temperature)
+    with _LLM_POOL_LOCK:
+        if key not in _LLM_POOL:
+            llm = _LLM_FACTORY(model, temperature)
+            if LLM_CALLBACKS and not llm.callbacks:
+                llm.callbacks = LLM_CALLBACKS  # one 'llm' span per call, with token counts
+            _LLM_POOL[key] = llm
+        return _LLM_POOL[key]
+
+
+class RHPQueryEngine:
+    """
+    Retrieval QA over one RHP vector store. The chains are built once and reused
+    for every question; the rephrase step only runs when there is chat history.
+    Standalone questions go through the document's semantic answer cache.
+
+    Passing section= (a canonical name from rhp_sections, or a list of them)
+    restricts retrieval to chunks tagged with those sections. Sections the
+    document doesn't have are ignored, falling back to a global search.
+
+    When the store carries a BM25 index (built at ingest), retrieval is hybrid:
+    vector and lexical results are fused by reciprocal rank (see lexical_index).
+    """
+
+    def __init__(self, vector_store, k=None, model=RHP_QA_MODEL, use_cache=True):
+        self.vector_store = vector_store
+        self.lexical = getattr(vector_store, "lexical", None)
+        self.k = k or (HYBRID_TOP_K if self.lexical is not None else RHP_TOP_K)
+        self.doc_key = getattr(vector_store, "doc_key", None)
+        self.available_sections = set(getattr(vector_store, "sections", []) or [])
+        self.cache = get_answer_cache() if use_cache and self.doc_key else None
+        self.llm = get_llm(model)
+        self.retriever = self._retriever()
+
+        context_q_system_prompt = (
+            "Given a chat history and the latest user question, formulate a standalone question. "
+            "Do NOT answer the question, just reformulate it."
+        )
+        self._context_q_prompt = ChatPromptTemplate.from_messages(
+            [("system", context_q_system_prompt), MessagesPlaceholder("chat_history"), ("human", "{input}")]
+        )
+
+        qa_system_prompt = (
+            "You are an expert financial analyst reading an IPO RHP document. "
+            "Answer the question based strictly on the context. If not found, say 'I cannot find this information in the RHP document'.\n\n"
+            "Context:\n{context}"
+        )
+        qa_prompt = ChatPromptTemplate.from_messages(
+            [("system", qa_system_prompt), MessagesPlaceholder("chat_history"), ("human", "{input}")]
+        )
+        self._answer_chain = create_stuff_documents_chain(self.llm, qa_prompt)
+
+        multi_system_prompt = (
+            "You are an expert financial analyst reading an IPO RHP document. "
+            "Answer each numbered question based strictly on the context. If a question is not answered by the context, "
+            "say 'I cannot find this information in the RHP document' for that question. "
+            "Start the answer to question N with a line '### Answer N'.\n\n"
+            "Context:\n{context}"
+        )
+        multi_prompt = ChatPromptTemplate.from_messages([("system", multi_system_prompt), ("human", "{questions}")])
+        self._multi_answer_chain = create_stuff_documents_chain(self.llm, multi_prompt)
+
+        self._chain = create_retrieval_chain(self.retriever, self._answer_chain)
+        self._history_chain = create_retrieval_chain(
+            create_history_aware_retriever(self.llm, self.retriever, self._context_q_prompt), self._answer_chain
+        )
+        self._section_chains = {}
+        self._lock = threading.Lock()
+
+    def _scope(self, section):
+        if not section:
+            return ()
+        wanted = [section] if isinstance(section, str) else list(section)
+        return tuple(sorted(s for s in wanted if s in self.available_sections))
+
+    def _retriever(self, scope=()):
+        where = None
+        if scope:
+            where = {"section": scope[0]} if len(scope) == 1 else {"section": {"$in": list(scope)}}
+        if self.lexical is not None:
+            return HybridRetriever(vector_store=self.vector_store, lexical=self.lexical, k=self.k, where=where,
+                                   sections=scope or None, callbacks=LLM_CALLBACKS or None)
+        search_kwargs = {"k": self.k, "filter": where} if where else {"k": self.k}
+        return self.vector_store.as_retriever(search_kwargs=search_kwargs, callbacks=LLM_CALLBACKS or None)
+
+    def _chain_for(self, scope):
+        if not scope:
+            return self._chain
+        with self._lock:
+            if scope not in self._section_chains:
+                self._section_chains[scope] = create_retrieval_chain(self._retriever(scope), self._answer_chain)
+            return self._section_chains[scope]
+
+    def _cache_scope(self, scope):
+        # Answers drawn from a narrower search space are cached separately
+        return self.doc_key if not scope else f"{self.doc_key}:{'+'.join(scope)}"
+
+    @staticmethod
+    def _format(response):
+        if isinstance(response, Exception):
+            return f"Error querying RHP: {str(response)}"
+        return f"[Source: RHP Document]\n{response['answer']}"
+
+    def _remember(self, scope, question, answer, emb):
+        if self.cache and not answer.startswith("Error querying RHP"):
+            self.cache.store(self._cache_scope(scope), question, answer, emb)
+
+    @traced("rhp.query")
+    def query(self, question, chat_history=None, section=None):
+        if chat_history:
+            try:
+                return self._format(self._history_chain.invoke({"input": question, "chat_history": chat_history}))
+            except Exception as e:
+                return self._format(e)
+
+        scope = self._scope(section)
+        emb = None
+        if self.cache:
+            cached, emb = self.cache.lookup(self._cache_scope(scope), question)
+            if cached is not None:
+                return cached
+        try:
+            answer = self._format(self._chain_for(scope).invoke({"input": question, "chat_history": []}))
+        except Exception as e:
+            return self._format(e)
+        self._remember(scope, question, answer, emb)
+        return answer
+
+    @traced("rhp.batch")
+    def batch(self, questions, max_concurrency=4, section=None):
+        """Answers several standalone questions concurrently; one answer string per question, in order."""
+        scope = self._scope(section)
+        answers = [None] * len(questions)
+        embs = [None] * len(questions)
+        if self.cache:
+            for i, q in enumerate(questions):
+                answers[i], embs[i] = self.cache.lookup(self._cache_scope(scope), q)
+
+        todo = [i for i, a in enumerate(answers) if a is None]
+        inputs = [{"input": questions[i], "chat_history": []} for i in todo]
+        responses = self._chain_for(scope).batch(inputs, config={"max_concurrency": max_concurrency},
+                                                 return_exceptions=True)
+        for i, response in zip(todo, responses):
+            answers[i] = self._format(response)
+            self._remember(scope, questions[i], answers[i], emb=embs[i])
+        return answers
+
+    @traced("rhp.multi")
+    def multi_query(self, questions, section=None):
+        """
+        Several standalone questions answered from one retrieval pass and one LLM call:
+        each question is retrieved separately, the hits are merged into one deduplicated
+        context, and the model answers all questions in numbered sections.
+        Returns one answer string per question, in order.
+        """
+        scope = self._scope(section)
+        answers = [None] * len(questions)
+        embs = [None] * len(questions)
+        if self.cache:
+            for i, q in enumerate(questions):
+                answers[i], embs[i] = self.cache.lookup(self._cache_scope(scope), q)
+        todo = [i for i, a in enumerate(answers) if a is None]
+        if len(todo) <= 1:
+            for i in todo:
+                answers[i] = self.query(questions[i], section=section)
+            return answers
+
+        try:
+            retriever = self._retriever(scope) if scope else self.retriever
+            ranked = retriever.batch([questions[i] for i in todo], config={"max_concurrency": 4})
+            # Every question keeps its best chunks; hybrid hits are deduplicated by chunk id
+            context = merge_rankings(ranked, max(self.k, MULTI_QUERY_MAX_CHUNKS))
+            numbered = "\n".join(f"{n}. {questions[i]}" for n, i in enumerate(todo, 1))
+            reply = self._multi_answer_chain.invoke({"context": context, "questions": numbered})
+        except Exception as e:
+            for i in todo:
+                answers[i] = self._format(e)
+            return answers
+
+        parts = {}
+        headers = list(_ANSWER_HEADER.finditer(reply))
+        for h, nxt in zip(headers, headers[1:] + [None]):
+            parts[int(h.group(1))] = reply[h.end():nxt.start() if nxt else len(reply)].strip()
+        for n, i in enumerate(todo, 1):
+            if not parts.get(n):
+                answers[i] = self.query(questions[i], section=section)  # the model skipped or mangled this one
+                continue
+            answers[i] = self._format({"answer": parts[n]})
+            self._remember(scope, questions[i], answers[i], emb=embs[i])
+        return answers
+
+
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_rhp_engine(vector_store):
+    """One engine per loaded vector store, dropped together with the store."""
+    # Kept on the store itself: a map keyed by the store would keep it alive through the engine
+    with _ENGINES_LOCK:
+        engine = getattr(vector_store, "_rhp_engine", None)
+        if engine is None:
+            engine = vector_store._rhp_engine = RHPQueryEngine(vector_store)
+        return engine
+
+
 def query_rhp(ipo_name, query, vector_store=None):
     if not vector_store:
         return "⚠️ RHP Document is not loaded."
+    return get_rhp_engine(vector_store).query(query)
 
-    llm = ChatGroq(api_key=os.getenv("GROQ_API_KEY"), model="llama-3.1-8b-instant")
-    retriever = vector_store.as_retriever(search_kwargs={"k": 5})
-
-    context_q_system_prompt = (
-        "Given a chat history and the latest user question, formulate a standalone question. "
-        "Do NOT answer the question, just reformulate it."
-    )
-    context_q_prompt = ChatPromptTemplate.from_messages(
-        [("system", context_q_system_prompt), MessagesPlaceholder("chat_history"), ("human", "{input}")]
-    )
-    history_aware_retriever = create_history_aware_retriever(llm, retriever, context_q_prompt)
-
-    qa_system_prompt = (
-        "You are an expert financial analyst reading an IPO RHP document. "
-        "Answer the question based strictly on the context. If not found, say 'I cannot find this information in the RHP document'.\n\n"
-        "Context:\n{context}"
-    )
-    qa_prompt = ChatPromptTemplate.from_messages(
-        [("system", qa_system_prompt), MessagesPlaceholder("chat_history"), ("human", "{input}")]
-    )
-
-    chain = create_retrieval_chain(history_aware_retriever, create_stuff_documents_chain(llm, qa_prompt))
 
-    try:
-        response = chain.invoke({"input": query, "chat_history": []})
-        return f"[Source: RHP Document]\n{response['answer']}"
-    except Exception as e:
-        return f"Error querying RHP: {str(e)}"
+def query_rhp_multi(ipo_name, questions, vector_store=None):
+    """Several RHP questions for the price of one: one answer per question, in order."""
+    if not vector_store:
+        return ["⚠️ RHP Document is not loaded."] * len(questions)
+    return get_rhp_engine(vector_store).multi_query(list(questions))
 
 
 # --- PDF HELPERS ---
+PDF_DIR = "pdfs"
+DOWNLOAD_CHUNK = 1 << 16
+DOWNLOAD_ATTEMPTS = 4
+PREFETCH_WORKERS = 4
+VERSIONS_PATH = os.path.join(PDF_DIR, "versions.json")  # which document (DRHP/RHP) each cached PDF is
+DRHP_RECHECK_INTERVAL = int(os.getenv("DRHP_RECHECK_INTERVAL", "21600"))  # seconds between checks for a final RHP
+
+_DOWNLOAD_LOCKS = {}
+_DOWNLOAD_LOCKS_GUARD = threading.Lock()
+_VERSIONS_LOCK = threading.Lock()
+
+
+def _load_versions():
+    try:
+        with open(VERSIONS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _record_version(ipo_id, **fields):
+    # The ingest worker records versions too: read-modify-write under a cross-process lock
+    os.makedirs(PDF_DIR, exist_ok=True)
+    with _VERSIONS_LOCK, file_lock(VERSIONS_PATH + ".lock"):
+        versions = _load_versions()
+        entry = versions.setdefault(str(ipo_id), {})
+        if "sha256" in fields and entry.get("sha256") and fields["sha256"] != entry["sha256"]:
+            entry.setdefault("history", []).append(
+                {k: entry.get(k) for k in ("kind", "url", "sha256", "fetched")})
+        entry.update(fields)
+        tmp = f"{VERSIONS_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(versions, f, indent=2)
+        os.replace(tmp, VERSIONS_PATH)
+
+
+def pdf_version(ipo_id):
+    """{"kind": "rhp" | "drhp" | "guess", "url", "sha256", "fetched", "checked", "history"} or {}."""
+    with _VERSIONS_LOCK:
+        return dict(_load_versions().get(str(ipo_id), {}))
+
+
+def _looks_like_pdf(path):
+    """Magic bytes at the start and an EOF marker near the end (truncated files lack it)."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(4) != b"%PDF":
+                return False
+            f.seek(max(0, os.path.getsize(path) - 2048))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def _find_rhp_url(ipo_id, slug):
+    """(url, kind): the final RHP when the IPO page links one, else the DRHP, else a guessed asset URL."""
+    page_url = f"{BASE_URL}/view/ipo/{ipo_id}/{slug}"
+    r = SESSION.get(page_url, timeout=TIMEOUT)
+    soup = BeautifulSoup(r.content, "html.parser")
+
+    target_url = None
+    candidates = []
+    for a in soup.find_all("a", href=True):
+        text = a.get_text().lower()
+        if "rhp" in text or "drhp" in text or "anchor" in text:
+            candidates.append({"link": a["href"], "text": text})
+
+    kind = "rhp"
+    for c in candidates:
+        if "rhp" in c["text"] and "drhp" not in c["text"]: target_url = c["link"]; break
+    if not target_url:
+        kind = "drhp"
+        for c in candidates:
+            if "drhp" in c["text"]: target_url = c["link"]; break
+    if not target_url:
+        kind = "guess"
+        target_url = f"{ASSETS_URL}/images/ipo/{ipo_id}_rhp.pdf"
+
+    if not target_url.startswith("http"): target_url = BASE_URL + target_url
+    return target_url, kind
+
+
+def _validator(headers):
+    """Strong ETag, else Last-Modified: what If-Range needs to resume only the same document."""
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _discard_part(part_path):
+    for path in (part_path, part_path + ".json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _stream_to_file(url, save_path):
+    """
+    Streams url into save_path + '.part', resuming with HTTP Range after drops.
+    The file is only renamed into place once its size matches Content-Length
+    and it starts with the %PDF magic bytes.
+
+    A '.part.json' next to the part file records the URL and validator it was
+    downloaded with. A part from another URL, or without a validator, is discarded;
+    resumes send If-Range, so a changed document restarts from scratch (200).
+    """
+    part_path = save_path + ".part"
+    meta_path = part_path + ".json"
+    expected = None
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    if meta.get("url") != url or not meta.get("validator"):
+        _discard_part(part_path)  # left over from another document (e.g. the DRHP), can't be trusted
+        meta = {}
+
+    for _ in range(DOWNLOAD_ATTEMPTS):
+        have = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if have and not meta.get("validator"):
+            _discard_part(part_path)  # nothing to check a resume against
+            have = 0
+        headers = {"Range": f"bytes={have}-", "If-Range": meta["validator"]} if have else {}
+        try:
+            with SESSION.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+                if r.status_code == 416:
+                    # Content-Range: bytes */total; complete only if the part has exactly that size
+                    total = r.headers.get("Content-Range", "").rpartition("/")[2]
+                    if not total.isdigit() or int(total) != have:
+                        _discard_part(part_path)
+                        meta = {}
+                        continue
+                    expected = have
+                elif r.status_code == 206 and have:
+                    if _validator(r.headers) not in (None, meta["validator"]):
+                        _discard_part(part_path)  # served from a different version despite If-Range
+                        meta = {}
+                        continue
+                    # Content-Range: bytes start-end/total
+                    total = r.headers.get("Content-Range", "").rpartition("/")[2]
+                    expected = int(total) if total.isdigit() else expected
+                    with open(part_path, "ab") as f:
+                        for block in r.iter_content(DOWNLOAD_CHUNK):
+                            f.write(block)
+                elif r.status_code == 200:
+                    # Fresh download (the document changed, or the server ignored our Range header)
+                    length = r.headers.get("Content-Length")
+                    expected = int(length) if length and length.isdigit() else None
+                    meta = {"url": url, "validator": _validator(r.headers)}
+                    with open(meta_path, "w", encoding="utf-8") as f:
+                        json.dump(meta, f)
+                    with open(part_path, "wb") as f:
+                        for block in r.iter_content(DOWNLOAD_CHUNK):
+                            f.write(block)
+                else:
+                    return None
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+            continue
+
+        size = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if expected is not None and size < expected:
+            continue  # interrupted: resume from `size`
+        if (expected is not None and size != expected) or not _looks_like_pdf(part_path):
+            break
+        os.replace(part_path, save_path)
+        _discard_part(part_path)
+        return save_path
+
+    if os.path.exists(part_path) and (expected is None or os.path.getsize(part_path) >= expected):
+        _discard_part(part_path)  # complete but invalid: don't resume garbage next time
+    return None
+
+
+@traced("tool.download_pdf")
 def download_pdf_logic(details):
     ipo_id = details.get('id')
     slug = details.get('slug')
-    os.makedirs("pdfs", exist_ok=True)
-    save_path = os.path.join("pdfs", f"{ipo_id}.pdf")
+    os.makedirs(PDF_DIR, exist_ok=True)
+    save_path = os.path.join(PDF_DIR, f"{ipo_id}.pdf")
+
+    with _DOWNLOAD_LOCKS_GUARD:
+        lock = _DOWNLOAD_LOCKS.setdefault(save_path, threading.Lock())
+
+    # One download per file; concurrent callers (also in other processes) wait and then reuse it
+    with lock, file_lock(save_path + ".lock"):
+        if os.path.exists(save_path):
+            if _looks_like_pdf(save_path): return _refresh_draft(ipo_id, slug, save_path)
+            os.remove(save_path)  # truncated/corrupt file from an older download
+
+        try:
+            url, kind = _find_rhp_url(ipo_id, slug)
+            path = _stream_to_file(url, save_path)
+            if path:
+                _record_version(ipo_id, kind=kind, url=url, sha256=file_sha256(path), fetched=time.time(),
+                                checked=time.time())
+            return path
+        except Exception:
+            return None
 
-    if os.path.exists(save_path): return save_path
 
-    page_url = f"https://www.ipopremium.in/view/ipo/{ipo_id}/{slug}"
+def _refresh_draft(ipo_id, slug, save_path):
+    """
+    A cached draft (or a PDF of unknown kind) is swapped for the final RHP once the IPO
+    page links one. The index of the new file is then built incrementally from the draft's
+    (see incremental_index), because the replaced file keeps its path.
+    """
+    version = pdf_version(ipo_id)
+    if version.get("kind") == "rhp" or time.time() - version.get("checked", 0) < DRHP_RECHECK_INTERVAL:
+        return save_path
+    try:
+        url, kind = _find_rhp_url(ipo_id, slug)
+    except Exception:
+        return save_path
+    if kind != "rhp" or url == version.get("url"):
+        _record_version(ipo_id, checked=time.time())
+        return save_path
+
+    new_path = _stream_to_file(url, save_path + ".new")
+    if not new_path:
+        return save_path
+    digest = file_sha256(new_path)
+    if digest == (version.get("sha256") or file_sha256(save_path)):
+        os.remove(new_path)  # the cached file already was this document
+    else:
+        os.replace(new_path, save_path)
+    _record_version(ipo_id, kind=kind, url=url, sha256=digest, fetched=time.time(), checked=time.time())
+    return save_path
+
+
+def prefetch_pdfs(details_list, max_workers=PREFETCH_WORKERS):
+    """Downloads several RHPs concurrently. Returns {ipo_id: path or None}."""
+    details_list = [d for d in details_list if d.get("id")]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        paths = pool.map(download_pdf_logic, details_list)
+        return {d["id"]: path for d, path in zip(details_list, paths)}
+
+
+def _open_vector_store(backend, key, index_dir, emb, create=False):
+    if backend == "numpy":
+        if create:
+            return NumpyVectorStore(emb, path=index_dir, dtype=VECTOR_DTYPE)
+        return NumpyVectorStore.load(emb, index_dir)
+    client = chromadb.PersistentClient(path=index_dir)
+    return Chroma(client=client, collection_name=key, embedding_function=emb)
+
+
+@traced("tool.build_vs")
+def build_vs_logic(pdf_path, progress=None, pipelined=True, backend=None):
+    """
+    Returns a vector store for the PDF, reusing the persisted index when the same
+    document was already embedded with the same settings.
+    backend is "chroma" or "numpy" (default: VECTOR_BACKEND).
+    pipelined=True parses, splits and embeds concurrently (see ingest_pipeline);
+    progress(pages_done, total_pages, chunks) is reported from the calling thread.
+    When an earlier version of the same file (a DRHP replaced by the RHP) is indexed,
+    only the pages that changed are embedded (see incremental_index).
+    """
+    backend = backend or VECTOR_BACKEND
+    store = get_index_store()
+    with span("index.lookup", backend=backend):
+        key = store.key_for(pdf_path, backend=backend)
+        ready = store.is_ready(key)
+    emb = get_embeddings()
+
+    if not ready:
+        # The pre-ingestion worker (another process) may be building the same key: wait for it
+        with store.build_lock(key):
+            if not store.is_ready(key):
+                cache_event("index", "miss")
+                return _build_index(store, key, pdf_path, backend, emb, progress, pipelined)
+
+    cache_event("index", "hit")
+    store.touch(key)
+    vs = _open_vector_store(backend, key, store.path_for(key), emb)
+    vs.doc_key = key  # content-derived id, used to scope the answer cache
+    vs.sections = store.entry(key).get("sections", [])
+    vs.peer_table = load_peer_table(os.path.join(store.path_for(key), PEER_TABLE_FILE))
+    vs.lexical = load_lexical_index(os.path.join(store.path_for(key), LEXICAL_FILE))
+    return vs
+
+
+def _build_index(store, key, pdf_path, backend, emb, progress, pipelined):
+    base = store.base_for(pdf_path, key, backend)
+    old_log = load_page_log(store.path_for(base)) if base else None
+    index_dir = store.begin(key, pdf_path)
+    if old_log is not None:
+        store.pin(base)  # not evicted while it's being copied
+        try:
+            with span("ingest.clone", base=base):
+                clone_index(store.path_for(base), index_dir, base, key, backend)
+        finally:
+            store.unpin(base)
+        vs = _open_vector_store(backend, key, index_dir, emb)
+    else:
+        vs = _open_vector_store(backend, key, index_dir, emb, create=True)
+    with span("ingest.sections"):
+        section_map = detect_sections(pdf_path)
+    with span("ingest.boilerplate") as s:
+        chunk_filter = build_ingest_filter(pdf_path)
+        s.set(lines=len(chunk_filter.boilerplate))
+
+    lexical_builder = LexicalIndexBuilder()
+    page_log, diff = {}, None
+    if old_log is not None:
+        with span("ingest.incremental", base=base) as s:
+            pages, chunks, page_log, diff = update_index(pdf_path, vs, old_log, section_map, chunk_filter,
+                                                         lexical_builder, progress=progress)
+            s.set(**diff)
+    elif pipelined:
+        with span("ingest.pipeline") as s:
+            pages, chunks = ingest_pdf(pdf_path, vs, progress=progress, section_map=section_map,
+                                       lexical=lexical_builder, chunk_filter=chunk_filter, page_log=page_log)
+            s.set(pages=pages, chunks=chunks)
+    else:
+        loader = PyMuPDFLoader(pdf_path)
+        docs = loader.load()
+        for d in docs:
+            d.metadata["section"] = section_map.section_for(d.metadata.get("page", 0))
+            d.page_content = chunk_filter.clean_page(d.page_content)
+            page_log[d.metadata.get("page", 0)] = {"hash": page_hash(d.page_content), "chunks": []}
+        splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        splits = []
+        for d in docs:
+            for n, chunk in enumerate(splitter.split_documents([d])):
+                chunk.metadata["chunk"] = n  # same p{page}-c{chunk} ids as the pipeline
+                if chunk_filter.keep(chunk):
+                    splits.append(chunk)
+                    page_log[chunk.metadata.get("page", 0)]["chunks"].append(n)
+        vs.add_documents(splits, ids=[chunk_id(c.metadata) for c in splits])
+        lexical_builder.add(splits)
+        pages, chunks = len(docs), len(splits)
+
+    filter_stats = chunk_filter.summary()
+    current().set(**{f"filter.{k}": v for k, v in filter_stats.items()})
+    if backend == "numpy":
+        vs.save()  # rows are buffered until now; re-opens the vectors memory-mapped
+
+    # BM25 index over the same chunks, stored next to the vectors
+    with span("ingest.lexical"):
+        lexical = lexical_builder.build()
+        lexical.save(os.path.join(index_dir, LEXICAL_FILE))
+
+    # The peer ratio table is parsed once at ingest and stored next to the vectors
     try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        r = requests.get(page_url, headers=headers)
-        soup = BeautifulSoup(r.content, "html.parser")
+        with span("ingest.peer_table"):
+            peer_df = extract_peer_table(pdf_path, section_map)
+    except Exception:
+        peer_df = None
+    if peer_df is not None:
+        peer_df.to_csv(os.path.join(index_dir, PEER_TABLE_FILE), index=False)
 
-        target_url = None
-        candidates = []
-        for a in soup.find_all("a", href=True):
-            text = a.get_text().lower()
-            if "rhp" in text or "drhp" in text or "anchor" in text:
-                candidates.append({"link": a["href"], "text": text})
+    # Page hashes let the next version of this file be indexed incrementally
+    save_page_log(index_dir, page_log)
 
-        for c in candidates:
-            if "rhp" in c["text"] and "drhp" not in c["text"]: target_url = c["link"]; break
-        if not target_url:
-            for c in candidates:
-                if "drhp" in c["text"]: target_url = c["link"]; break
-        if not target_url:
-            target_url = f"https://assets.ipopremium.in/images/ipo/{ipo_id}_rhp.pdf"
-
-        if target_url:
-            if not target_url.startswith("http"): target_url = "https://www.ipopremium.in" + target_url
-            pdf_resp = requests.get(target_url, headers=headers, stream=True)
-            if pdf_resp.status_code == 200:
-                with open(save_path, "wb") as f: f.write(pdf_resp.content)
-                return save_path
-    except:
-        pass
-    return None
+    store.commit(key, chunks=chunks, pages=pages, sections=section_map.sections, section_source=section_map.source,
+                 peer_table=peer_df is not None, backend=backend, filter_stats=filter_stats,
+                 base=base if diff else None, diff=diff)
+    vs.doc_key = key
+    vs.sections = section_map.sections
+    vs.peer_table = peer_df
+    vs.lexical = lexical
+    return vs
 
 
-def build_vs_logic(pdf_path):
-    emb = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    loader = PyMuPDFLoader(pdf_path)
-    docs = loader.load()
-    splits = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100).split_documents(docs)
+# One registry per process: sessions on the same RHP share a single loaded store
+_VS_REGISTRY = VectorStoreRegistry(loader=build_vs_logic)
 
-    db_path = "./chroma_db_storage"
-    if os.path.exists(db_path):
-        try:
-            shutil.rmtree(db_path)
-        except:
-            pass
 
-    client = chromadb.PersistentClient(path=db_path)
-    return Chroma.from_documents(documents=splits, embedding=emb, client=client, collection_name="ipo_collection")
+def acquire_vs(pdf_path, progress=None):
+    """Returns a StoreHandle; use handle.vector_store and call handle.release() when done."""
+    return _VS_REGISTRY.acquire(pdf_path, progress=progress)
 
 
 # --- CATEGORIZATION HELPERS ---
 def get_all_ipo_names():
     categorized = {"Mainboard": [], "SME": []}
     try:
-        r = requests.get("https://www.ipopremium.in/ipo", headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
-        data = r.json().get("data", [])
-        for d in data:
-            name = BeautifulSoup(d.get("name", ""), "html.parser").get_text(" ", strip=True)
+        for name in get_listing().names:
             if "SME" in name:
                 categorized["SME"].append(name)
             else:
@@ -191,10 +801,9 @@ def get_concurrent_ipos(target_name, category_filter="All"):
     """
     peers = []
     try:
-        r = requests.get("https://www.ipopremium.in/ipo", headers={"User-Agent": "Mozilla/5.0"}, timeout=10)
-        for d in r.json().get("data", []):
-            name = BeautifulSoup(d.get("name", ""), "html.parser").get_text(" ", strip=True)
-            status = d.get("status", "").lower()
+        listing = get_listing()
+        for name in listing.names:
+            status = listing.by_name[name].get("status", "").lower()
 
             # 1. Skip if it is the target itself
             if name == target_name: continue
@@ -0,0 +1,339 @@
+"""
+Lightweight tracing: nested spans with wall time, LLM token counts and cache events.
+
+    with span("report.verdict", chapter="verdict"):
+        ...
+
+Spans nest through a context variable. Work handed to a thread pool keeps its parent
+when submitted through bind(). Finished root spans are kept in memory for the UI,
+aggregated into Prometheus-style metrics and, if TRACE_JSONL_PATH is set, appended
+to a JSON lines file (one line per span). TRACING=0 turns every call into a no-op.
+"""
+import os
+import json
+import time
+import uuid
+import functools
+import threading
+import contextvars
+from collections import deque
+
+from langchain_core.callbacks import BaseCallbackHandler
+from context_packer import count_tokens
+
+TRACING = os.getenv("TRACING", "1") != "0"
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "")
+TRACE_PROM_PATH = os.getenv("TRACE_PROM_PATH", "")  # e.g. a node_exporter textfile
+RECENT_TRACES = 50
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent", "attrs", "children", "start", "end", "status", "_lock")
+
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attrs = attrs
+        self.children = []
+        self.start = time.time()
+        self.end = None
+        self.status = "ok"
+        self._lock = threading.Lock()
+        if parent is not None:
+            with parent._lock:
+                parent.children.append(self)
+
+    @property
+    def duration(self):
+        return (self.end or time.time()) - self.start
+
+    def set(self, **attrs):
+        with self._lock:
+            self.attrs.update(attrs)
+
+    def add(self, key, value=1):
+        """Accumulates a numeric attribute (thread-safe), e.g. tokens or embed seconds."""
+        with self._lock:
+            self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def finish(self, status=None):
+        if self.end is not None:
+            return
+        self.end = time.time()
+        if status:
+            self.status = status
+        if self.parent is None:
+            _collector.record(self)
+
+    def walk(self, depth=0):
+        yield depth, self
+        for child in sorted(self.children, key=lambda c: c.start):
+            yield from child.walk(depth + 1)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name, "start": round(self.start, 6), "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status, "attrs": self.attrs,
+        }
+
+
+class _NoSpan:
+    """Stand-in used when tracing is off, or outside any span."""
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, key, value=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class span:
+    """Context manager opening a child of the current span (or a new trace)."""
+
+    __slots__ = ("_span", "_token", "_name", "_attrs")
+
+    def __new__(cls, name, **attrs):
+        if not TRACING:
+            return _NO_SPAN
+        return super().__new__(cls)
+
+    def __init__(self, name, **attrs):
+        self._name = name
+        self._attrs = attrs
+
+    def __enter__(self):
+        self._span = Span(self._name, _current.get(), **self._attrs)
+        self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is GeneratorExit:
+            self._span.finish("cancelled")
+        else:
+            self._span.finish("error" if exc_type else None)
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            # Closed from another context (an abandoned generator being collected)
+            _current.set(self._span.parent)
+        return False
+
+
+def traced(name=None):
+    """Decorator: runs the function inside a span named after it."""
+    def wrap(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not TRACING:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def current():
+    return (_current.get() if TRACING else None) or _NO_SPAN
+
+
+def bind(fn):
+    """Wraps fn so it runs in a copy of the caller's context (keeps the parent span in pool threads)."""
+    if not TRACING:
+        return fn
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+def cache_event(cache, result):
+    """Counts a cache lookup ('hit', 'semantic_hit', 'miss', ...) and tags the current span."""
+    if not TRACING:
+        return
+    _collector.count("ipo_cache_events_total", cache=cache, result=result)
+    current().add(f"cache.{cache}.{result}")
+
+
+def count(metric, value=1, **labels):
+    """Increments a labelled Prometheus counter, e.g. count("ipo_router_decisions_total", route="rule")."""
+    if TRACING:
+        _collector.count(metric, value, **labels)
+
+
+# --- LLM CALLBACKS ---
+class LLMTraceHandler(BaseCallbackHandler):
+    """
+    Opens an 'llm' span per chat model call and a 'retrieval' span per retriever call,
+    under whichever span is current when the call starts. Token counts come from the
+    provider's usage metadata, or are estimated when a stream doesn't report them.
+    """
+
+    def __init__(self):
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, name, **attrs):
+        parent = _current.get()
+        s = Span(name, parent, **attrs)
+        with self._lock:
+            self._open[run_id] = s
+
+    def _stop(self, run_id, status=None):
+        with self._lock:
+            s = self._open.pop(run_id, None)
+        if s is not None:
+            s.finish(status)
+        return s
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or (serialized or {}).get("name", "llm")
+        prompt_tokens = sum(count_tokens(str(m.content)) for batch in messages for m in batch)
+        self._start(run_id, "llm", model=model, prompt_tokens_est=prompt_tokens)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        s = self._stop(run_id)
+        if s is None:
+            return
+        prompt, completion = _usage(response)
+        if prompt is None:
+            prompt = s.attrs.get("prompt_tokens_est", 0)
+            completion = sum(count_tokens(g.text) for gens in response.generations for g in gens)
+            s.set(tokens_estimated=True)
+        s.set(prompt_tokens=prompt, completion_tokens=completion)
+        model = s.attrs.get("model", "llm")
+        _collector.count("ipo_llm_tokens_total", prompt, model=model, kind="prompt")
+        _collector.count("ipo_llm_tokens_total", completion, model=model, kind="completion")
+        if s.parent is not None:
+            s.parent.add("llm_calls")
+            s.parent.add("prompt_tokens", prompt)
+            s.parent.add("completion_tokens", completion)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._stop(run_id, "error")
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, "retrieval")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        s = self._stop(run_id)
+        if s is not None:
+            s.set(documents=len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._stop(run_id, "error")
+
+
+def _usage(response):
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage.get("prompt_tokens") is not None:
+        return usage["prompt_tokens"], usage.get("completion_tokens", 0)
+    prompt = completion = None
+    for gens in response.generations:
+        for g in gens:
+            meta = getattr(getattr(g, "message", None), "usage_metadata", None)
+            if meta:
+                prompt = (prompt or 0) + meta.get("input_tokens", 0)
+                completion = (completion or 0) + meta.get("output_tokens", 0)
+    return prompt, completion
+
+
+LLM_CALLBACKS = [LLMTraceHandler()] if TRACING else []
+
+
+# --- EXPORT ---
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in sorted(labels.items())) + "}"
+
+
+class _Collector:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.recent = deque(maxlen=RECENT_TRACES)
+        self._hist = {}      # span name -> [bucket counts..., +Inf count, sum]
+        self._counters = {}  # (metric, labels) -> value
+
+    def count(self, metric, value=1, **labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def record(self, root):
+        spans = [s for _, s in root.walk()]
+        with self._lock:
+            self.recent.append(root)
+            for s in spans:
+                h = self._hist.setdefault((s.name, s.status), [0] * (len(LATENCY_BUCKETS) + 2))
+                d = s.duration
+                for i, le in enumerate(LATENCY_BUCKETS):
+                    if d <= le:
+                        h[i] += 1
+                h[-2] += 1
+                h[-1] += d
+        if TRACE_JSONL_PATH:
+            lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in spans)
+            with self._lock, open(TRACE_JSONL_PATH, "a", encoding="utf-8") as f:
+                f.write(lines)
+        if TRACE_PROM_PATH:
+            tmp = TRACE_PROM_PATH + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+            os.replace(tmp, TRACE_PROM_PATH)
+
+    def prometheus(self):
+        out = ["# HELP ipo_span_seconds Wall time of traced spans.", "# TYPE ipo_span_seconds histogram"]
+        with self._lock:
+            for (name, status), h in sorted(self._hist.items()):
+                labels = {"span": name, "status": status}
+                for i, le in enumerate(LATENCY_BUCKETS):
+                    out.append(f"ipo_span_seconds_bucket{_labels({**labels, 'le': le})} {h[i]}")
+                out.append(f"ipo_span_seconds_bucket{_labels({**labels, 'le': '+Inf'})} {h[-2]}")
+                out.append(f"ipo_span_seconds_sum{_labels(labels)} {h[-1]:.6f}")
+                out.append(f"ipo_span_seconds_count{_labels(labels)} {h[-2]}")
+            seen = set()
+            for (metric, labels), value in sorted(self._counters.items()):
+                if metric not in seen:
+                    out.append(f"# TYPE {metric} counter")
+                    seen.add(metric)
+                out.append(f"{metric}{_labels(dict(labels))} {value}")
+        return "\n".join(out) + "\n"
+
+
+_collector = _Collector()
+
+
+def prometheus_text():
+    """All metrics so far, in the Prometheus text exposition format."""
+    return _collector.prometheus()
+
+
+def recent_traces():
+    with _collector._lock:
+        return list(_collector.recent)
+
+
+def breakdown(root):
+    """Flat rows (depth-first) for a timing table: depth, name, ms, share of the root, attrs."""
+    total = max(root.duration, 1e-9)
+    return [{
+        "depth": depth, "name": s.name, "ms": round(s.duration * 1000, 1),
+        "share": round(100 * s.duration / total, 1), "status": s.status, "attrs": dict(s.attrs),
+    } for depth, s in root.walk()]
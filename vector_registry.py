@@ -0,0 +1,155 @@
+import os
+import time
+import weakref
+import threading
+from langchain_huggingface import HuggingFaceEmbeddings
+from index_store import get_index_store, EMBED_MODEL, EMBED_DIM
+
+MEMORY_BUDGET_MB = int(os.getenv("VECTOR_MEMORY_BUDGET_MB", "1024"))
+
+# Rough resident cost of one chunk: float32 vector + text/metadata + HNSW links
+_BYTES_PER_CHUNK = EMBED_DIM * 4 + 1500
+
+_EMBEDDINGS = None
+_EMBEDDINGS_LOCK = threading.Lock()
+
+
+def get_embeddings():
+    """The MiniLM model is loaded once per process and shared by every session."""
+    global _EMBEDDINGS
+    with _EMBEDDINGS_LOCK:
+        if _EMBEDDINGS is None:
+            _EMBEDDINGS = HuggingFaceEmbeddings(model_name=EMBED_MODEL)
+        return _EMBEDDINGS
+
+
+def set_embeddings(embeddings):
+    """Use a different embedding model process-wide (benchmarks run with a fake one offline)."""
+    global _EMBEDDINGS
+    with _EMBEDDINGS_LOCK:
+        _EMBEDDINGS = embeddings
+
+
+def close_store(vector_store):
+    """Frees a store that is no longer used (the registry on eviction, the ingest worker after a build)."""
+    # chromadb keeps one System per persist path in a class-level cache;
+    # drop ours so the HNSW segments can actually be freed.
+    try:
+        from chromadb.api.client import SharedSystemClient
+        path = vector_store._client._system.settings.persist_directory
+        system = SharedSystemClient._identifier_to_system.pop(path, None)
+        if system is not None:
+            system.stop()
+    except Exception:
+        pass
+
+
+class _Loaded:
+    def __init__(self, key):
+        self.key = key
+        self.lock = threading.Lock()
+        self.vector_store = None
+        self.refs = 0
+        self.last_used = time.time()
+        self.mem_bytes = 0
+
+
+class StoreHandle:
+    """
+    A session's lease on a shared vector store. Call release() (or let the handle be
+    garbage collected with its Streamlit session) to give the store back.
+    """
+
+    def __init__(self, registry, key, vector_store):
+        self.key = key
+        self.vector_store = vector_store
+        self._finalizer = weakref.finalize(self, registry._release, key)
+
+    def release(self):
+        self._finalizer()
+
+    def __enter__(self):
+        return self.vector_store
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class VectorStoreRegistry:
+    """
+    Process-wide map of index key -> loaded vector store with reference counts.
+    Sessions on the same RHP share one store; idle stores are closed, least
+    recently used first, once the estimated memory budget is exceeded.
+    """
+
+    def __init__(self, loader, budget_mb=MEMORY_BUDGET_MB):
+        self._loader = loader
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._stores = {}
+
+    def acquire(self, pdf_path, **load_kwargs):
+        index_store = get_index_store()
+        key = index_store.key_for(pdf_path)
+
+        with self._lock:
+            loaded = self._stores.get(key)
+            if loaded is None:
+                loaded = self._stores[key] = _Loaded(key)
+                index_store.pin(key)  # one pin per registry entry, dropped when the entry is
+            loaded.refs += 1
+            loaded.last_used = time.time()
+
+        # Per-key lock: concurrent sessions on the same IPO wait for one build
+        with loaded.lock:
+            if loaded.vector_store is None:
+                try:
+                    loaded.vector_store = self._loader(pdf_path, **load_kwargs)
+                except Exception:
+                    with self._lock:
+                        loaded.refs -= 1
+                        if loaded.refs == 0:
+                            self._stores.pop(key, None)
+                            index_store.unpin(key)
+                    raise
+                chunks = index_store.entry(key).get("chunks", 0)
+                # Stores that know their footprint (numpy_store) report it; estimate the rest
+                loaded.mem_bytes = getattr(loaded.vector_store, "mem_bytes", None) or chunks * _BYTES_PER_CHUNK
+
+        self._enforce_budget()
+        return StoreHandle(self, key, loaded.vector_store)
+
+    def _release(self, key):
+        with self._lock:
+            loaded = self._stores.get(key)
+            if loaded is None:
+                return
+            loaded.refs = max(0, loaded.refs - 1)
+            loaded.last_used = time.time()
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        closed = []
+        with self._lock:
+            total = sum(l.mem_bytes for l in self._stores.values())
+            idle = sorted((l for l in self._stores.values() if l.refs == 0 and l.vector_store is not None),
+                          key=lambda l: l.last_used)
+            for loaded in idle:
+                if total <= self.budget_bytes:
+                    break
+                total -= loaded.mem_bytes
+                self._stores.pop(loaded.key, None)
+                closed.append(loaded)
+        index_store = get_index_store()
+        for loaded in closed:
+            index_store.unpin(loaded.key)
+            close_store(loaded.vector_store)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": len(self._stores),
+                "in_use": sum(1 for l in self._stores.values() if l.refs > 0),
+                "mem_bytes": sum(l.mem_bytes for l in self._stores.values()),
+                "budget_bytes": self.budget_bytes,
+            }